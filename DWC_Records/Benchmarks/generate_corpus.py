@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Synthetic DWC corpus generator
+
+Writes Patient Research and Payment Distribution workbooks with the same
+columns as the real exports, realistic cardinalities (a few hundred procedure
+codes, one account per ~20 visits), and the data-quality problems the
+normalization scripts fix: lowercase genders, 'person', misspelled tran types,
+padded ' None Entered ', duplicated provider text and code spelling variants.
+No real patient data is used, so the corpus can be shared and benchmarked.
+
+Rows are streamed to write-only workbooks, so 1M-row corpora fit in small
+memory. Output is deterministic for a given --seed.
+
+Usage:
+    python DWC_Records/Benchmarks/generate_corpus.py --size 10k
+    python DWC_Records/Benchmarks/generate_corpus.py --size 1m --output-dir /tmp/dwc_1m
+"""
+from openpyxl import Workbook
+from pathlib import Path
+from datetime import date, timedelta
+import argparse
+import json
+import random
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+ROWS_PER_FILE = 50_000  # the real exports were split at this size
+DEFAULT_OUTPUT_DIR = Path(__file__).resolve().parent / "corpus"
+MANIFEST_NAME = "corpus.json"
+
+PATIENT_RESEARCH_COLUMNS = [
+    'Account Number', 'First Name', 'Last Name', 'Address #1', 'Address #2', 'City', 'State',
+    'ZipCode', 'Telephone', 'Cell', 'Email', 'Date Of Birth', 'Age', 'Gender', 'Procedure',
+    'Description', 'Date Of Service', 'Amount', 'Provider', 'Location', 'Charge Dx #1',
+    'Charge Dx #2', 'Charge Dx #3', 'Charge Dx #4',
+]
+
+PAYMENT_DISTRIBUTION_COLUMNS = [
+    'Account Number', 'Patient Name', 'Procedure Code', 'Service Date', 'Charge', 'Applied',
+    'Pay Date', 'Check #', 'Description', 'Type', 'Carrier Name', 'Carrier Code', 'Tran Type',
+]
+
+# (code, description, typical price) - seeds for the procedure catalog
+BASE_PROCEDURES = [
+    ('1 MONTH', 'ONE MONTH PLAN', 299), ('2 MONTH', 'TWO MONTH PLAN', 319),
+    ('3 MONTH', 'THREE MONTH PLAN', 449), ('wkly', 'weekly injection', 15),
+    ('followup', 'Follow up visit', 39), ('new patient', 'New patient consultation', 89),
+    ('37.5 P 15', 'Phentermine 37.5mg 15 count', 69), ('37.5 P 30', 'Phentermine 37.5mg 30 count', 129),
+    ('B12', 'B-12 injection', 20), ('lipo', 'lipo shot with program', 25),
+    ('hctz', 'HCTZ 25mg with program', 10), ('NIP', 'Weight Loss  Plus', 35),
+    ('mv', 'Multivitamin & Mineral Formula', 18), ('Cholest', 'Cholesterol support', 22),
+    ('cleanse', 'Herbal cleanse', 30), ('bracelet', 'Magnetic bracelet', 12),
+    ('07 diet 75', 'Diethylpropion 75 with 10 charge', 55), ('nat 1', 'natural program month 1', 99),
+    ('exam', 'Physical exam', 49), ('Misc.', 'Miscellaneous', 5),
+]
+
+CODE_VARIANTS = {
+    'B12': ['B-12', 'B-12 shot', 'b12'], 'wkly': ['wkly 2', 'wkly2', 'Wkly'],
+    'Cholest': ['Cholest.T'], 'Misc.': ['Misc'], '1 MONTH': ['1month', '1 month +'],
+}
+
+GENDERS = [('female', 70), ('male', 25), ('person', 5)]
+PROVIDERS = [('Robert Bartemus', 60), ('Jessie Bennie', 20), ('Ocoee New Patient Bartemus', 10),
+             ('Robert Bartemus Ocoee office', 8), ('New Patient Clermont New Patient Clermont', 2)]
+TRAN_TYPES = [('Credit Card', 40), ('Cash', 25), ('Check', 8), ('Debit Card', 12), ('Coupon', 5),
+              (' None Entered ', 4), ('patient referrel', 2), ('empolyee discount', 2), ('transfer', 2)]
+PAYMENT_TYPES = [('P', 80), ('A', 15), ('R', 5)]
+FIRST_NAMES = ['Kelly', 'Luis', 'Maria', 'James', 'Linda', 'Robert', 'Patricia', 'Michael', 'Jennifer',
+               'David', 'Elizabeth', 'William', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor']
+CITIES = [('Winter Garden', '34787'), ('Ocoee', '34761'), ('Clermont', '34711'), ('Orlando', '32801'),
+          ('Apopka', '32703'), ('Windermere', '34786')]
+
+START_DATE = date(2000, 1, 1)
+END_DATE = date(2025, 10, 28)
+
+
+class SyntheticCorpus:
+    """Deterministic source of catalog, patients and visits"""
+
+    def __init__(self, total_rows, seed=42):
+        self.rng = random.Random(seed)
+        self.catalog = self._build_catalog()
+        self.patients = [self._patient(account) for account in range(100, 100 + max(10, total_rows // 20))]
+
+    def _build_catalog(self):
+        """Expand the base procedures to a few hundred codes with variants"""
+        catalog = []
+        for code, desc, price in BASE_PROCEDURES:
+            catalog.append((code, desc, price, 40))
+            for variant in CODE_VARIANTS.get(code, []):
+                catalog.append((variant, desc, price, 3))
+        # Long tail of rarely used, numbered codes (e.g. '#14 of 30', 'return35')
+        for i in range(1, 231):
+            code, desc, price = self.rng.choice(BASE_PROCEDURES)
+            catalog.append((f"{code.split()[0]}{i}", f"{desc} #{i}", price + self.rng.choice([0, 5, 10]), 1))
+        return catalog
+
+    def _patient(self, account):
+        city, zip_code = self.rng.choice(CITIES)
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        birth = date(self.rng.randint(1940, 2004), self.rng.randint(1, 12), self.rng.randint(1, 28))
+        phone = f"(407){self.rng.randint(200, 999)}-{self.rng.randint(1000, 9999)}"
+        return {
+            'account': account, 'first': first, 'last': last,
+            'address': f"{self.rng.randint(100, 9999)} {self.rng.choice(LAST_NAMES)} Avenue",
+            'city': city, 'zip': int(zip_code), 'phone': phone,
+            'email': f"{first.lower()}{account}@example.com", 'dob': birth,
+            'gender': self._weighted(GENDERS),
+        }
+
+    def _weighted(self, choices):
+        values, weights = zip(*choices)
+        return self.rng.choices(values, weights=weights)[0]
+
+    def procedure(self):
+        code, desc, price, _ = self.rng.choices(self.catalog, weights=[c[3] for c in self.catalog])[0]
+        # Occasional stray whitespace, as in the real exports
+        if self.rng.random() < 0.002:
+            code = f" {code}  "
+        return code, desc, price
+
+    def visit_date(self, start, end):
+        return start + timedelta(days=self.rng.randint(0, (end - start).days))
+
+    def patient_research_row(self, start, end):
+        p = self.rng.choice(self.patients)
+        code, desc, price = self.procedure()
+        service = self.visit_date(start, end)
+        return [
+            p['account'], p['first'], p['last'], p['address'], None, p['city'], 'FL', p['zip'],
+            p['phone'], p['phone'], p['email'], p['dob'].strftime('%m/%d/%Y'),
+            service.year - p['dob'].year, p['gender'], code, desc, service.strftime('%m/%d/%Y'),
+            float(price if self.rng.random() < 0.6 else 0), self._weighted(PROVIDERS),
+            "Doctor's Weight Control", None, None, None, None,
+        ]
+
+    def payment_distribution_row(self, start, end):
+        p = self.rng.choice(self.patients)
+        code, desc, price = self.procedure()
+        service = self.visit_date(start, end)
+        paid = service + timedelta(days=self.rng.choice([0, 0, 0, 1, 7]))
+        applied = float(price if self.rng.random() < 0.8 else round(price * 0.5, 2))
+        return [
+            p['account'], f"{p['last']}, {p['first']}", code, service.strftime('%m/%d/%Y'), price,
+            applied, paid.strftime('%m/%d/%Y'), str(self.rng.randint(1, 9999)) if self.rng.random() < 0.1 else None,
+            f"{self.rng.randint(1, 9)}appr{self.rng.randint(100000, 999999)}Visa/CLR",
+            self._weighted(PAYMENT_TYPES), 'Non-Insurance ', None, self._weighted(TRAN_TYPES),
+        ]
+
+
+def write_workbook(path, columns, rows):
+    """Stream rows to a write-only workbook"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def report_periods(total_rows, rows_per_file):
+    """Split a row budget into per-file (start, end, rows) chunks over 2000-2025"""
+    files = max(1, -(-total_rows // rows_per_file))
+    span = (END_DATE - START_DATE).days
+    periods = []
+    for i in range(files):
+        start = START_DATE + timedelta(days=span * i // files)
+        end = START_DATE + timedelta(days=span * (i + 1) // files)
+        rows = min(rows_per_file, total_rows - i * rows_per_file)
+        periods.append((start, end, rows))
+    return periods
+
+
+def report_name(prefix, start, end, part, parts):
+    """Real export naming, e.g. PatientResearchReportJan-1-2000-Jan-1-2005part_1.xlsx"""
+    def fmt(d):
+        return f"{d.strftime('%b')}-{d.day}-{d.year}"
+    suffix = f"part_{part}" if parts > 1 else ""
+    return f"{prefix}{fmt(start)}-{fmt(end)}{suffix}.xlsx"
+
+
+def generate_corpus(output_dir, total_rows, rows_per_file=ROWS_PER_FILE, seed=42, payment_ratio=0.5):
+    """Write a synthetic corpus plus its corpus.json row manifest; returns the written files"""
+    output_dir = Path(output_dir)
+    corpus = SyntheticCorpus(total_rows, seed)
+    written = []
+    row_counts = {}
+
+    families = [
+        ("Patient Research", "PatientResearchReport", PATIENT_RESEARCH_COLUMNS,
+         corpus.patient_research_row, total_rows),
+        ("Payment Distribution", "PaymentDistributionReport", PAYMENT_DISTRIBUTION_COLUMNS,
+         corpus.payment_distribution_row, int(total_rows * payment_ratio)),
+    ]
+    for folder, prefix, columns, make_row, family_rows in families:
+        family_dir = output_dir / folder
+        family_dir.mkdir(parents=True, exist_ok=True)
+        periods = report_periods(family_rows, rows_per_file)
+        for part, (start, end, rows) in enumerate(periods, 1):
+            path = family_dir / report_name(prefix, start, end, part, len(periods))
+            count = write_workbook(path, columns, (make_row(start, end) for _ in range(rows)))
+            print(f"  ✓ {folder}/{path.name} ({count} rows)")
+            written.append(path)
+            row_counts[f"{folder}/{path.name}"] = count
+
+    with open(output_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump({'seed': seed, 'total_rows': total_rows, 'rows_per_file': rows_per_file,
+                   'files': row_counts}, f, indent=2)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic DWC corpus for benchmarking")
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k",
+                        help="Patient Research rows (Payment Distribution gets half as many)")
+    parser.add_argument("--rows", type=int, help="exact Patient Research row count (overrides --size)")
+    parser.add_argument("--rows-per-file", type=int, default=ROWS_PER_FILE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output-dir", help="default: DWC_Records/Benchmarks/corpus/<size>")
+    args = parser.parse_args()
+
+    total_rows = args.rows or SIZES[args.size]
+    output_dir = Path(args.output_dir) if args.output_dir else DEFAULT_OUTPUT_DIR / (args.size if not args.rows else str(args.rows))
+
+    print("=" * 80)
+    print(f"GENERATING SYNTHETIC DWC CORPUS ({total_rows} patient research rows)")
+    print("=" * 80)
+    written = generate_corpus(output_dir, total_rows, args.rows_per_file, args.seed)
+    print(f"\n✅ {len(written)} workbooks written to: {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+DWC benchmark suite
+
+Times the main DWC entry points against a synthetic corpus (see
+generate_corpus.py) and records wall time and peak RSS for each:
+    process_file:patient_research      normalize_categories.process_file
+    process_file:payment_distribution  normalize_categories.process_file
+    analyze_procedures_for_migration   analyze_for_migration
+    extract_procedures.main            extract_procedures
+    split_workbook                     Utilities/split_excel
+
+Every run happens in a fresh subprocess with its own scratch directory, so
+peak RSS belongs to that benchmark alone and nothing touches the real
+DWC_Records folders. Results are written as JSON; pass --compare with an
+earlier results file to see the change per benchmark.
+
+Workbook cache modes (--cache):
+    cold  empty cache per run (default - includes the .xlsx parse)
+    warm  cache primed by an untimed run first
+    off   DWC_NO_CACHE=1
+
+Usage:
+    python DWC_Records/Benchmarks/run_benchmarks.py --size 10k
+    python DWC_Records/Benchmarks/run_benchmarks.py --size 100k --repeat 3 --compare results/before.json
+"""
+from pathlib import Path
+from contextlib import redirect_stdout
+from datetime import datetime
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = Path(__file__).resolve().parent
+DWC_DIR = BENCH_DIR.parent
+REPO_ROOT = DWC_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+sys.path.insert(0, str(BENCH_DIR))
+from generate_corpus import SIZES, DEFAULT_OUTPUT_DIR, MANIFEST_NAME, generate_corpus
+
+FAMILY_DIRS = {
+    'Patient Research': 'Patient_Research',
+    'Payment Distribution': 'Payment_Distribution',
+}
+
+
+def largest_workbook(corpus_dir, family):
+    files = [f for f in (Path(corpus_dir) / family).glob("*.xlsx") if not f.name.startswith('~$')]
+    return max(files, key=lambda f: (f.stat().st_size, f.name))
+
+
+def row_count(corpus_dir, file_path):
+    """Data rows in one corpus workbook, from corpus.json when available"""
+    manifest_path = Path(corpus_dir) / MANIFEST_NAME
+    if manifest_path.exists():
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            files = json.load(f)['files']
+        key = Path(file_path).relative_to(corpus_dir).as_posix()
+        if key in files:
+            return files[key]
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True)
+    rows = sum(1 for _ in workbook.worksheets[0].iter_rows(min_row=2, values_only=True))
+    workbook.close()
+    return rows
+
+
+def count_rows(corpus_dir, family=None, largest_only=False):
+    """Data rows in a corpus, one family, or that family's largest workbook"""
+    if largest_only:
+        return row_count(corpus_dir, largest_workbook(corpus_dir, family))
+    families = [family] if family else FAMILY_DIRS
+    return sum(row_count(corpus_dir, file_path)
+               for name in families
+               for file_path in (Path(corpus_dir) / name).glob("*.xlsx")
+               if not file_path.name.startswith('~$'))
+
+
+# Each benchmark takes (corpus_dir, workspace) and runs inside the child
+# process with the workspace as its cwd.
+
+def bench_process_file(family):
+    def run(corpus_dir, workspace):
+        from normalize_categories import process_file
+        file_path = largest_workbook(corpus_dir, family)
+        output_dir = workspace / "normalized"
+        output_dir.mkdir()
+        changes_log = {}
+        if not process_file(file_path, output_dir, changes_log):
+            raise RuntimeError(f"process_file failed on {file_path.name}")
+    return run
+
+
+def bench_analyze_procedures_for_migration(corpus_dir, workspace):
+    from analyze_for_migration import analyze_procedures_for_migration
+    # The script scans ./DWC RECORDS and writes the mapping into the cwd
+    (workspace / "DWC RECORDS").symlink_to(Path(corpus_dir).resolve(), target_is_directory=True)
+    analyze_procedures_for_migration()
+
+
+def bench_extract_procedures_main(corpus_dir, workspace):
+    import extract_procedures
+    # Mirror the DWC_Records/01_Original/<Family> layout the script expects
+    original = workspace / "DWC_Records" / "01_Original"
+    original.mkdir(parents=True)
+    (workspace / "DWC_Records" / "Documentation").mkdir()
+    for family, folder in FAMILY_DIRS.items():
+        (original / folder).symlink_to((Path(corpus_dir) / family).resolve(), target_is_directory=True)
+    extract_procedures.main()
+
+
+def bench_split_workbook(corpus_dir, workspace):
+    from split_excel import split_workbook
+    file_path = largest_workbook(corpus_dir, 'Payment Distribution')
+    split_workbook(file_path, workspace / "split", max_rows=10000)
+
+
+# name -> (benchmark, kwargs for count_rows giving the rows it reads)
+BENCHMARKS = {
+    'process_file:patient_research': (bench_process_file('Patient Research'),
+                                      {'family': 'Patient Research', 'largest_only': True}),
+    'process_file:payment_distribution': (bench_process_file('Payment Distribution'),
+                                          {'family': 'Payment Distribution', 'largest_only': True}),
+    'analyze_procedures_for_migration': (bench_analyze_procedures_for_migration, {}),
+    'extract_procedures.main': (bench_extract_procedures_main, {}),
+    'split_workbook': (bench_split_workbook, {'family': 'Payment Distribution', 'largest_only': True}),
+}
+
+
+def run_one(name, corpus_dir, workspace):
+    """Child process: run one benchmark and print its measurements as JSON"""
+    sys.path[:0] = [str(DWC_DIR), str(DWC_DIR / "Utilities"), str(REPO_ROOT)]
+    from stage_metrics import peak_rss_mb
+    func, _ = BENCHMARKS[name]
+    workspace = Path(workspace)
+    os.chdir(workspace)
+
+    baseline_rss = peak_rss_mb()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        func(Path(corpus_dir), workspace)
+    wall = time.perf_counter() - start
+    peak_rss = peak_rss_mb()
+
+    # Peak RSS is None where the platform cannot report it
+    print(json.dumps({
+        'wall_seconds': round(wall, 4),
+        'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+        'baseline_rss_mb': round(baseline_rss, 1) if baseline_rss is not None else None,
+    }))
+
+
+def spawn(name, corpus_dir, cache_mode, cache_dir):
+    """Run a benchmark in a fresh interpreter and return its measurements"""
+    env = dict(os.environ)
+    env.pop("DWC_NO_CACHE", None)
+    if cache_mode == "off":
+        env["DWC_NO_CACHE"] = "1"
+    else:
+        env["DWC_CACHE_DIR"] = str(cache_dir)
+
+    with tempfile.TemporaryDirectory(prefix="dwc_bench_") as workspace:
+        result = subprocess.run(
+            [sys.executable, str(Path(__file__).resolve()), "--run-one", name,
+             "--corpus", str(Path(corpus_dir).resolve()), "--workspace", workspace],
+            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_suite(corpus_dir, names, repeat=1, cache_mode="cold"):
+    """Run the selected benchmarks; returns a list of result records"""
+    results = []
+    for name in names:
+        _, row_scope = BENCHMARKS[name]
+        runs = []
+        with tempfile.TemporaryDirectory(prefix="dwc_bench_cache_") as shared_cache:
+            if cache_mode == "warm":
+                spawn(name, corpus_dir, cache_mode, shared_cache)
+            for _ in range(repeat):
+                if cache_mode == "cold":
+                    with tempfile.TemporaryDirectory(prefix="dwc_bench_cache_") as cold_cache:
+                        runs.append(spawn(name, corpus_dir, cache_mode, cold_cache))
+                else:
+                    runs.append(spawn(name, corpus_dir, cache_mode, shared_cache))
+
+        rows = count_rows(corpus_dir, **row_scope)
+        best = min(run['wall_seconds'] for run in runs)
+        record = {
+            'name': name,
+            'rows': rows,
+            'wall_seconds': best,
+            'rows_per_second': round(rows / best) if best else None,
+            'peak_rss_mb': max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None), default=None),
+            'baseline_rss_mb': min((run['baseline_rss_mb'] for run in runs if run['baseline_rss_mb'] is not None),
+                                   default=None),
+            'runs': runs,
+        }
+        results.append(record)
+        peak = f"{record['peak_rss_mb']:8.1f} MB peak" if record['peak_rss_mb'] is not None else "     n/a MB peak"
+        print(f"  ✓ {name:36} {best:8.2f}s  {peak}  ({rows} rows)")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info(corpus_dir, cache_mode, repeat):
+    import pandas as pd
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': str(corpus_dir),
+        'corpus_rows': count_rows(corpus_dir),
+        'cache_mode': cache_mode,
+        'repeat': repeat,
+    }
+
+
+def compare_results(current, baseline_path):
+    """Print the change of each benchmark against an earlier results file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+
+    print(f"\nCompared with {baseline_path}:")
+    print(f"  {'Benchmark':36} {'Wall':>10} {'Change':>8} {'Peak RSS':>10} {'Change':>8}")
+    for record in current:
+        before = baseline.get(record['name'])
+        if before is None:
+            print(f"  {record['name']:36} {'(new)':>10}")
+            continue
+        wall_change = (record['wall_seconds'] / before['wall_seconds'] - 1) * 100 if before['wall_seconds'] else 0
+        if record['peak_rss_mb'] is None or not before.get('peak_rss_mb'):
+            print(f"  {record['name']:36} {record['wall_seconds']:9.2f}s {wall_change:+7.1f}% {'n/a':>10}")
+            continue
+        rss_change = (record['peak_rss_mb'] / before['peak_rss_mb'] - 1) * 100
+        print(f"  {record['name']:36} {record['wall_seconds']:9.2f}s {wall_change:+7.1f}% "
+              f"{record['peak_rss_mb']:8.1f}MB {rss_change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the DWC scripts on a synthetic corpus")
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k",
+                        help="corpus size; generated under Benchmarks/corpus/<size> if missing")
+    parser.add_argument("--corpus", help="existing corpus directory (overrides --size)")
+    parser.add_argument("--benchmark", action="append", choices=sorted(BENCHMARKS),
+                        help="run only this benchmark (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per benchmark; the fastest is reported")
+    parser.add_argument("--cache", choices=["cold", "warm", "off"], default="cold",
+                        help="workbook cache mode (default: cold)")
+    parser.add_argument("--output", help="results JSON (default: Benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--workspace", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args.run_one, args.corpus, args.workspace)
+        return
+
+    corpus_dir = Path(args.corpus) if args.corpus else DEFAULT_OUTPUT_DIR / args.size
+    if not corpus_dir.exists():
+        if args.corpus:
+            parser.error(f"corpus directory not found: {corpus_dir}")
+        print(f"Generating {args.size} corpus in {corpus_dir}...")
+        generate_corpus(corpus_dir, SIZES[args.size])
+
+    print("=" * 80)
+    print(f"DWC BENCHMARKS - {corpus_dir} (cache: {args.cache}, repeat: {args.repeat})")
+    print("=" * 80)
+
+    names = args.benchmark or list(BENCHMARKS)
+    results = run_suite(corpus_dir, names, args.repeat, args.cache)
+
+    output_path = Path(args.output) if args.output else \
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump({'environment': environment_info(corpus_dir, args.cache, args.repeat),
+                   'results': results}, f, indent=2)
+
+    if args.compare:
+        compare_results(results, args.compare)
+
+    print(f"\n✅ Results saved to: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
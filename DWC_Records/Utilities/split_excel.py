@@ -1,19 +1,242 @@
-import pandas as pd
-import math
+#!/usr/bin/env python3
+"""
+Split a large DWC export into part_N workbooks in constant memory.
 
-input_file = "PaymentDistributionReportJan-1-2015-Jan-1-2020.xlsx"  # exact filename, include .xlsx
-max_rows = 50000  # adjust as needed
+Rows are streamed with openpyxl's read-only iterator and written with
+write-only workbooks, so peak memory does not grow with the input size.
 
-print("Loading workbook...")
-df = pd.read_excel(input_file)
-print(f"Total rows: {len(df)}")
+Split policies:
+    --rows N          start a new part every N data rows (default 50,000)
+    --max-mb N        start a new part once a part holds ~N MB of cell data
+    --by-date COLUMN  one part per --period (year/quarter/month) of COLUMN;
+                      rows are spooled to a temporary file per period first
+                      (at most MAX_OPEN_SPOOLS open at once), then each part
+                      is written in turn, so one workbook is open at a time
 
-n = math.ceil(len(df) / max_rows)
+Usage:
+    python split_excel.py PaymentDistributionReportJan-1-2015-Jan-1-2020.xlsx
+    python split_excel.py report.xlsx --max-mb 20
+    python split_excel.py report.xlsx --by-date "Service Date" --period year
+"""
+from openpyxl import Workbook, load_workbook
+from pathlib import Path
+from datetime import datetime, date
+from collections import OrderedDict
+import argparse
+import pickle
+import tempfile
 
-for i in range(n):
-    part = df.iloc[i * max_rows:(i + 1) * max_rows]
-    out = f"part_{i + 1}.xlsx"
-    part.to_excel(out, index=False)
-    print(f"Saved {out} ({len(part)} rows)")
+DEFAULT_MAX_ROWS = 50000
+# Per-cell overhead of the sheet XML (<c r="..." t="..."><v>...</v></c>)
+CELL_XML_OVERHEAD = 20
+# Spool files kept open while splitting by date; the least recently used is
+# closed (and reopened for append later) so month splits stay clear of EMFILE
+MAX_OPEN_SPOOLS = 32
 
-print("Done.")
+
+def parse_date(value):
+    """Return a date for a DWC date cell (datetime or 'MM/DD/YYYY' text), else None"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value is None:
+        return None
+    text = str(value).strip()
+    for fmt in ("%m/%d/%Y", "%Y-%m-%d", "%m/%d/%y"):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def period_key(value, period):
+    """Bucket a date into 'YYYY', 'YYYY-Qn' or 'YYYY-MM'"""
+    day = parse_date(value)
+    if day is None:
+        return "undated"
+    if period == "year":
+        return f"{day.year}"
+    if period == "quarter":
+        return f"{day.year}-Q{(day.month - 1) // 3 + 1}"
+    return f"{day.year}-{day.month:02d}"
+
+
+def estimate_row_bytes(row):
+    """Approximate uncompressed sheet XML size of a row"""
+    return sum(len(str(v)) + CELL_XML_OVERHEAD for v in row if v is not None)
+
+
+class PartWriter:
+    """A write-only workbook for one output part"""
+
+    def __init__(self, header):
+        self.path = None
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(header)
+        self.rows = 0
+        self.bytes = 0
+        self.first_date = None
+        self.last_date = None
+
+    def append(self, row, row_date=None):
+        self.sheet.append(row)
+        self.rows += 1
+        self.bytes += estimate_row_bytes(row)
+        if row_date is not None:
+            if self.first_date is None or row_date < self.first_date:
+                self.first_date = row_date
+            if self.last_date is None or row_date > self.last_date:
+                self.last_date = row_date
+
+    def close(self, path):
+        self.path = path
+        self.workbook.save(path)
+        date_range = ""
+        if self.first_date is not None:
+            date_range = f", {self.first_date:%m/%d/%Y} - {self.last_date:%m/%d/%Y}"
+        print(f"Saved {self.path.name} ({self.rows} rows{date_range})")
+
+
+class PeriodSpool:
+    """Rows bucketed by period in temporary files, with at most max_open files open"""
+
+    def __init__(self, directory, max_open=None):
+        self.directory = Path(directory)
+        self.max_open = max_open or MAX_OPEN_SPOOLS
+        self.paths = {}
+        self.open_files = OrderedDict()
+
+    def append(self, key, row):
+        spool = self.open_files.get(key)
+        if spool is None:
+            if len(self.open_files) >= self.max_open:
+                _, oldest = self.open_files.popitem(last=False)
+                oldest.close()
+            path = self.paths.setdefault(key, self.directory / f"period_{len(self.paths)}.pkl")
+            spool = self.open_files[key] = open(path, "ab")
+        else:
+            self.open_files.move_to_end(key)
+        pickle.dump(row, spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def keys(self):
+        return sorted(self.paths)
+
+    def rows(self, key):
+        """The rows spooled for key, in the order they were appended"""
+        self.close()
+        with open(self.paths[key], "rb") as spool:
+            while True:
+                try:
+                    yield pickle.load(spool)
+                except EOFError:
+                    return
+
+    def close(self):
+        for spool in self.open_files.values():
+            spool.close()
+        self.open_files.clear()
+
+
+def iter_sheet_rows(input_file):
+    """Open the first sheet read-only and return (workbook, header, row iterator)"""
+    workbook = load_workbook(input_file, read_only=True, data_only=True)
+    sheet = workbook.worksheets[0]
+    rows = sheet.iter_rows(values_only=True)
+    header = list(next(rows, []))
+    return workbook, header, rows
+
+
+def split_workbook(input_file, output_dir=None, max_rows=DEFAULT_MAX_ROWS,
+                   max_bytes=None, date_column=None, period="year"):
+    """Stream input_file into part_N workbooks and return the written paths"""
+    input_file = Path(input_file)
+    output_dir = Path(output_dir) if output_dir else input_file.parent
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"Streaming workbook: {input_file.name}")
+    workbook, header, rows = iter_sheet_rows(input_file)
+
+    date_index = None
+    if date_column is not None:
+        if date_column not in header:
+            workbook.close()
+            raise ValueError(f"Date column '{date_column}' not found in {input_file.name}; "
+                             f"available columns: {header}")
+        date_index = header.index(date_column)
+
+    written = []
+
+    def close_part(part):
+        path = output_dir / f"{input_file.stem}part_{len(written) + 1}.xlsx"
+        part.close(path)
+        written.append(path)
+
+    total_rows = 0
+    try:
+        if date_index is not None:
+            # Exports are not guaranteed to be date-sorted, and a write-only
+            # workbook cannot be reopened, so bucket the rows on disk first
+            with tempfile.TemporaryDirectory(prefix="split_excel_") as spool_dir:
+                spool = PeriodSpool(spool_dir)
+                try:
+                    for row in rows:
+                        if not any(v is not None for v in row):
+                            continue
+                        spool.append(period_key(row[date_index], period), row)
+                        total_rows += 1
+                    # Number parts chronologically regardless of row order
+                    for key in spool.keys():
+                        part = PartWriter(header)
+                        for row in spool.rows(key):
+                            part.append(row, parse_date(row[date_index]))
+                        close_part(part)
+                finally:
+                    spool.close()
+        else:
+            part = None
+            for row in rows:
+                if not any(v is not None for v in row):
+                    continue
+                if part is None:
+                    part = PartWriter(header)
+                elif (max_rows and part.rows >= max_rows) or (max_bytes and part.bytes >= max_bytes):
+                    close_part(part)
+                    part = PartWriter(header)
+                part.append(row)
+                total_rows += 1
+            if part is not None:
+                close_part(part)
+    finally:
+        workbook.close()
+
+    print(f"Total rows: {total_rows}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a large Excel export into part_N files")
+    parser.add_argument("input_file", help="exact filename, include .xlsx")
+    parser.add_argument("--output-dir", help="directory for part files (default: next to input)")
+    policy = parser.add_mutually_exclusive_group()
+    policy.add_argument("--rows", type=int,
+                        help=f"maximum data rows per part (default: {DEFAULT_MAX_ROWS})")
+    policy.add_argument("--max-mb", type=float,
+                        help="approximate maximum cell data per part, in MB")
+    policy.add_argument("--by-date", metavar="COLUMN",
+                        help="split on this date column, e.g. 'Service Date' or 'Date Of Service'")
+    parser.add_argument("--period", choices=["year", "quarter", "month"], default="year",
+                        help="date range covered by each part with --by-date (default: year)")
+    args = parser.parse_args()
+
+    max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb else None
+    max_rows = args.rows or (None if max_bytes else DEFAULT_MAX_ROWS)
+    split_workbook(args.input_file, args.output_dir, max_rows=max_rows,
+                   max_bytes=max_bytes, date_column=args.by_date, period=args.period)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
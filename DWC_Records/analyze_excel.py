@@ -5,6 +5,7 @@ Analyze Excel files to understand structure and identify categories for normaliz
 import pandas as pd
 import sys
 from pathlib import Path
+from workbook_cache import read_workbook
 
 def analyze_excel_file(file_path):
     """Analyze a single Excel file and return structure info"""
@@ -14,7 +15,7 @@ def analyze_excel_file(file_path):
 
     try:
         # Read the Excel file
-        df = pd.read_excel(file_path)
+        df = read_workbook(file_path)
 
         # Basic info
         print(f"\nRows: {len(df)}")
@@ -51,13 +52,18 @@ def analyze_excel_file(file_path):
         print(f"Error reading file: {e}")
         return None
 
+DEFAULT_FILES = [
+    ("PATIENT RESEARCH FILE ANALYSIS", "DWC RECORDS/Patient Research/PatientResearchReportJan-1-2000-Jan-1-2005.xlsx"),
+    ("PAYMENT DISTRIBUTION FILE ANALYSIS",
+     "DWC RECORDS/Payment Distribution/PaymentDistributionReportJan-1-2010-Jan-1-2015.xlsx"),
+]
+
+def main():
+    """Analyze the files named on the command line, or one Patient Research and one Payment Distribution file"""
+    files = [("FILE ANALYSIS", path) for path in sys.argv[1:]] or DEFAULT_FILES
+    for i, (title, file_path) in enumerate(files):
+        print(("\n\n" if i else "") + title)
+        analyze_excel_file(file_path)
+
 if __name__ == "__main__":
-    # Analyze Patient Research file
-    patient_file = "DWC RECORDS/Patient Research/PatientResearchReportJan-1-2000-Jan-1-2005.xlsx"
-    print("PATIENT RESEARCH FILE ANALYSIS")
-    df_patient = analyze_excel_file(patient_file)
-
-    # Analyze Payment Distribution file
-    payment_file = "DWC RECORDS/Payment Distribution/PaymentDistributionReportJan-1-2010-Jan-1-2015.xlsx"
-    print("\n\nPAYMENT DISTRIBUTION FILE ANALYSIS")
-    df_payment = analyze_excel_file(payment_file)
+    main()
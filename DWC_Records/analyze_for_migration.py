@@ -5,29 +5,19 @@ This will categorize procedures into products vs services and identify standardi
 """
 import pandas as pd
 from pathlib import Path
-from collections import defaultdict, Counter
+from collections import defaultdict
+import argparse
 import re
+from dataset_io import list_datasets
+from frame_loader import load_frame
+from row_dedup import RowDeduplicator
+from price_history import PriceHistory
+from procedure_classifier import load_classifier
+from memory_cache import memoize
 
 def categorize_procedure(procedure_str, description_str=""):
-    """Categorize procedures into service types"""
-    proc = str(procedure_str).lower()
-    desc = str(description_str).lower()
-
-    # Service patterns
-    if any(x in proc or x in desc for x in ['consultation', 'consult', 'visit', 'exam', 'follow', 'new patient']):
-        return 'CONSULTATION'
-    elif any(x in proc or x in desc for x in ['lipo', 'injection', 'shot', 'wkly', 'weekly']):
-        return 'INJECTION_SERVICE'
-    elif any(x in proc or x in desc for x in ['month', 'mo ', 'week', 'year', 'plan']):
-        return 'PROGRAM_SUBSCRIPTION'
-    elif any(x in proc or x in desc for x in ['phen', 'hctz', 'diet', 'natural', 'nat']):
-        return 'MEDICATION_PRODUCT'
-    elif any(x in proc or x in desc for x in ['nic', 'cleanse', 'mv', 'vitamin', 'supplement']):
-        return 'SUPPLEMENT_PRODUCT'
-    elif any(x in proc or x in desc for x in ['bracelet', 'jewelry', 'product']):
-        return 'RETAIL_PRODUCT'
-    else:
-        return 'UNCATEGORIZED'
+    """Categorize procedures into service types (keywords: procedure_categories.json)"""
+    return load_classifier().classify(procedure_str, description_str)
 
 def extract_price_from_code(code_str):
     """Try to extract pricing hints from procedure codes"""
@@ -35,8 +25,89 @@ def extract_price_from_code(code_str):
     matches = re.findall(r'\d+\.?\d*', str(code_str))
     return matches if matches else []
 
-def analyze_procedures_for_migration():
-    """Comprehensive procedure analysis for Square/Calendar migration"""
+def _as_text(series):
+    """Vectorized str(value).strip(), rendering missing values as 'nan' like str() does"""
+    return series.astype(object).where(series.notna(), 'nan').astype(str).str.strip()
+
+def _service_year(df, column):
+    """Year of each row's MM/DD/YYYY service date (NaN when missing or unparseable)"""
+    if column not in df.columns:
+        return float('nan')
+    return pd.to_datetime(df[column], format='%m/%d/%Y', errors='coerce').dt.year.to_numpy()
+
+def collect_procedure_rows(df):
+    """Extract code/description/amount/year/source rows from one report frame"""
+    # Patient Research files
+    if 'Procedure' in df.columns and 'Description' in df.columns:
+        frame = pd.DataFrame({
+            'code': _as_text(df['Procedure']),
+            'description': _as_text(df['Description']),
+            'amount': df['Amount'] if 'Amount' in df.columns else 0,
+            'year': _service_year(df, 'Date Of Service'),
+            'source': 'Patient Research',
+        })
+    # Payment Distribution files
+    elif 'Procedure Code' in df.columns:
+        frame = pd.DataFrame({
+            'code': _as_text(df['Procedure Code']),
+            'description': '',
+            'amount': df['Charge'] if 'Charge' in df.columns else 0,
+            'year': _service_year(df, 'Service Date'),
+            'source': 'Payment Distribution',
+        })
+    else:
+        return None
+
+    return frame[(frame['code'] != '') & (frame['code'] != 'nan')]
+
+def summarize_procedures(df_procedures):
+    """
+    Aggregate procedure rows per code in a single grouped pass.
+
+    Codes keep their order of first appearance. For each code this returns the
+    most common description (ties go to the one seen first), its distinct
+    positive prices, its usage count and a category. The category classifies
+    the code with the description on its first row, as the per-row analysis
+    did - not with the most common description returned beside it, so the
+    two can disagree when a code's rows carry different descriptions.
+    """
+    usage_counts = df_procedures.groupby('code', sort=False).size()
+
+    # Classified by the first row's code + description, not most_common below
+    first_rows = df_procedures.drop_duplicates('code')
+    categories = dict(zip(first_rows['code'],
+                          load_classifier().classify_frame(first_rows['code'], first_rows['description'])))
+
+    described = df_procedures[(df_procedures['description'] != '') &
+                              (df_procedures['description'] != 'nan')]
+    description_counts = (described.groupby(['code', 'description'], sort=False)
+                          .size().reset_index(name='count'))
+    most_common = (description_counts.sort_values('count', ascending=False, kind='stable')
+                   .drop_duplicates('code').set_index('code')['description'])
+
+    amounts = df_procedures[['code', 'amount']].dropna()
+    positive = amounts[amounts['amount'] > 0]
+    prices = positive.groupby('code', sort=False)['amount'].unique()
+
+    unique_procedures = {}
+    for code, usage_count in usage_counts.items():
+        unique_procedures[code] = {
+            'description': most_common.get(code, ''),
+            'category': categories[code],
+            'prices': sorted(prices[code]) if code in prices.index else [],
+            'usage_count': int(usage_count)
+        }
+    return unique_procedures
+
+def analyze_procedures_for_migration(dedupe=False):
+    """
+    Comprehensive procedure analysis for Square/Calendar migration
+
+    With dedupe, rows already present in an earlier file (overlapping
+    exports) are not counted again. Prices are streamed into a per-(code,
+    year) PriceHistory, saved as PRICE_HISTORY.xlsx, which picks each
+    code's suggested Square price.
+    """
 
     print("="*80)
     print("PROCEDURE CODE MIGRATION ANALYSIS")
@@ -45,76 +116,58 @@ def analyze_procedures_for_migration():
 
     # Collect all procedures
     dwc_path = Path("DWC RECORDS")
-    excel_files = [f for f in dwc_path.rglob("*.xlsx") if not f.name.startswith('~$')]
+    excel_files = list_datasets(dwc_path)
 
-    procedure_data = []
+    procedure_frames = []
+    deduplicator = RowDeduplicator() if dedupe else None
+    price_history = PriceHistory()
 
     print(f"\nAnalyzing {len(excel_files)} files...")
 
     for file_path in excel_files:
         try:
-            df = pd.read_excel(file_path)
-
-            # Patient Research files
-            if 'Procedure' in df.columns and 'Description' in df.columns:
-                for _, row in df.iterrows():
-                    proc = str(row['Procedure']).strip()
-                    desc = str(row['Description']).strip()
-                    amount = row.get('Amount', 0) if 'Amount' in df.columns else 0
-
-                    if proc and proc != 'nan':
-                        procedure_data.append({
-                            'code': proc,
-                            'description': desc,
-                            'amount': amount,
-                            'category': categorize_procedure(proc, desc),
-                            'source': 'Patient Research'
-                        })
-
-            # Payment Distribution files
-            elif 'Procedure Code' in df.columns:
-                for _, row in df.iterrows():
-                    proc = str(row['Procedure Code']).strip()
-                    charge = row.get('Charge', 0) if 'Charge' in df.columns else 0
-
-                    if proc and proc != 'nan':
-                        procedure_data.append({
-                            'code': proc,
-                            'description': '',
-                            'amount': charge,
-                            'category': categorize_procedure(proc, ''),
-                            'source': 'Payment Distribution'
-                        })
+            if deduplicator is not None:
+                frame = collect_procedure_rows(deduplicator.filter(load_frame(file_path), file_path))
+            else:
+                # Inside the dwc daemon a file's rows are kept in memory until it changes
+                frame = memoize(('procedure_rows', str(file_path)), [file_path],
+                                lambda: collect_procedure_rows(load_frame(file_path)))
+            if frame is not None:
+                procedure_frames.append(frame)
+                price_history.update(frame)
         except Exception as e:
             print(f"  Skipping {file_path.name}: {e}")
 
+    if deduplicator is not None:
+        deduplicator.finish()
+        deduplicator.print_summary()
+
     # Create DataFrame for analysis
-    df_procedures = pd.DataFrame(procedure_data)
+    df_procedures = pd.concat(procedure_frames, ignore_index=True)
 
     # Get unique procedures with most common description and pricing
-    unique_procedures = {}
-    for code in df_procedures['code'].unique():
-        code_data = df_procedures[df_procedures['code'] == code]
+    unique_procedures = summarize_procedures(df_procedures)
 
-        # Get most common description
-        descriptions = [d for d in code_data['description'] if d and d != 'nan']
-        most_common_desc = Counter(descriptions).most_common(1)[0][0] if descriptions else ''
+    df_migration = build_migration_mapping(unique_procedures, price_history=price_history)
+    price_history.write('PRICE_HISTORY.xlsx')
+    print(f"✅ Price history ({len(price_history.stats)} code-years) saved to: PRICE_HISTORY.xlsx\n")
 
-        # Get pricing info
-        amounts = code_data['amount'].dropna()
-        prices = amounts[amounts > 0].tolist()
+    return df_migration, unique_procedures
 
-        unique_procedures[code] = {
-            'description': most_common_desc,
-            'category': code_data['category'].iloc[0],
-            'prices': list(set(prices)),
-            'usage_count': len(code_data)
-        }
+def build_migration_mapping(unique_procedures, output_file='SQUARE_MIGRATION_MAPPING.xlsx', price_history=None,
+                            verbose=True):
+    """
+    Save the Square migration mapping, printing the categorized analysis
+    unless verbose is False
 
+    With a PriceHistory, each code also gets a Suggested Price (the median of
+    its recent prices) and the Price Basis it was taken from.
+    """
     # Print categorized analysis
-    print(f"\n{'='*80}")
-    print(f"FOUND {len(unique_procedures)} UNIQUE PROCEDURES")
-    print(f"{'='*80}\n")
+    if verbose:
+        print(f"\n{'='*80}")
+        print(f"FOUND {len(unique_procedures)} UNIQUE PROCEDURES")
+        print(f"{'='*80}\n")
 
     categories = defaultdict(list)
     for code, data in unique_procedures.items():
@@ -139,15 +192,17 @@ def analyze_procedures_for_migration():
 
         items = sorted(categories[category], key=lambda x: x[1]['usage_count'], reverse=True)
 
-        print(f"\n{category}")
-        print("="*80)
+        if verbose:
+            print(f"\n{category}")
+            print("="*80)
 
         for code, data in items[:15]:  # Show top 15 per category
             prices_str = ', '.join([f"${p:.2f}" for p in sorted(data['prices'])[:5]]) if data['prices'] else 'No price'
-            print(f"  {code:20} | {data['description'][:40]:40} | {prices_str:30} | Used {data['usage_count']:5}x")
+            if verbose:
+                print(f"  {code:20} | {data['description'][:40]:40} | {prices_str:30} | Used {data['usage_count']:5}x")
 
             # Add to migration recommendations
-            migration_recommendations.append({
+            recommendation = {
                 'Current Code': code,
                 'Description': data['description'],
                 'Category': category,
@@ -156,22 +211,27 @@ def analyze_procedures_for_migration():
                 'Pricing': prices_str,
                 'Usage Count': data['usage_count'],
                 'Migration Priority': 'HIGH' if data['usage_count'] > 100 else 'MEDIUM' if data['usage_count'] > 10 else 'LOW'
-            })
-
-        if len(items) > 15:
+            }
+            if price_history is not None:
+                price, basis = price_history.suggested_price(code)
+                recommendation['Suggested Price'] = price
+                recommendation['Price Basis'] = basis
+            migration_recommendations.append(recommendation)
+
+        if verbose and len(items) > 15:
             print(f"  ... and {len(items) - 15} more")
 
     # Save migration mapping
     df_migration = pd.DataFrame(migration_recommendations)
     df_migration = df_migration.sort_values(['Migration Priority', 'Usage Count'], ascending=[True, False])
 
-    output_file = 'SQUARE_MIGRATION_MAPPING.xlsx'
     df_migration.to_excel(output_file, index=False)
-    print(f"\n{'='*80}")
-    print(f"✅ Migration mapping saved to: {output_file}")
-    print(f"{'='*80}\n")
+    if verbose:
+        print(f"\n{'='*80}")
+        print(f"✅ Migration mapping saved to: {output_file}")
+        print(f"{'='*80}\n")
 
-    return df_migration, unique_procedures
+    return df_migration
 
 def get_square_category(internal_category):
     """Map internal categories to Square categories"""
@@ -186,8 +246,13 @@ def get_square_category(internal_category):
     }
     return mapping.get(internal_category, 'NEEDS REVIEW')
 
-if __name__ == "__main__":
-    df_migration, procedures = analyze_procedures_for_migration()
+def main():
+    parser = argparse.ArgumentParser(description="Build the Square migration mapping from DWC RECORDS")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="count rows repeated across overlapping exports once")
+    args = parser.parse_args()
+
+    df_migration, procedures = analyze_procedures_for_migration(dedupe=args.dedupe)
 
     print("\n" + "="*80)
     print("MIGRATION STATISTICS")
@@ -198,3 +263,6 @@ if __name__ == "__main__":
     print(df_migration['Suggested Square Category'].value_counts())
     print(f"\nCalendar Booking Required:")
     print(df_migration['Calendar Booking Required'].value_counts())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Procedure catalog lookup service
+
+Serves the Square migration mapping (SQUARE_MIGRATION_MAPPING.xlsx from
+analyze_for_migration.py) over local HTTP so the n8n Consult_Booking and
+Billing_Payments workflows can look codes up while they run. The mapping
+is held in memory as:
+    - an exact index (as written, then case/punctuation-insensitive)
+    - a sorted key list for prefix search, plus the group_procedure_codes groups
+    - a trigram CodeIndex (fuzzy_codes.py) for fuzzy matches
+
+The mapping file is re-read by a background thread when its mtime changes
+(checked every RELOAD_CHECK_SECONDS); a failed reload, e.g. while the file is still being
+written, keeps serving the previous catalog.
+
+Endpoints (JSON):
+    GET  /lookup?code=LIPO%201          exact match
+    GET  /prefix?q=lipo&limit=20        codes starting with q
+    GET  /group/LIPO                    a group_procedure_codes group
+    GET  /fuzzy?q=lipo1&limit=5         closest codes with scores
+    GET  /search?q=...                  exact, else prefix, else fuzzy
+    POST /batch  {"codes": [...], "mode": "exact|fuzzy|search"}
+    GET  /health
+
+Usage:
+    python DWC_Records/catalog_service.py
+    python DWC_Records/catalog_service.py --port 8765 --mapping DWC_Records/SQUARE_MIGRATION_MAPPING.xlsx
+"""
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+from datetime import datetime
+import argparse
+import bisect
+import json
+import re
+import sys
+import threading
+
+DWC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DWC_DIR.parent))
+
+from dataset_io import read_dataset
+from fuzzy_codes import CodeIndex, compact_key
+from extract_procedures import group_procedure_codes
+
+DEFAULT_MAPPING_PATH = DWC_DIR / "SQUARE_MIGRATION_MAPPING.xlsx"
+DEFAULT_PORT = 8765
+RELOAD_CHECK_SECONDS = 0.5
+MAX_BATCH_SIZE = 1000
+
+# Mapping column -> record key
+COLUMN_KEYS = {
+    'Current Code': 'code',
+    'Description': 'description',
+    'Category': 'category',
+    'Suggested Square Category': 'square_category',
+    'Calendar Booking Required': 'booking_required',
+    'Pricing': 'pricing',
+    'Usage Count': 'usage_count',
+    'Migration Priority': 'priority',
+    'Suggested Price': 'suggested_price',
+    'Price Basis': 'price_basis',
+}
+
+
+def parse_prices(pricing):
+    """'$10.00, $12.00' -> [10.0, 12.0]; 'No price' -> []"""
+    return [float(p) for p in re.findall(r'\$(\d+(?:\.\d+)?)', str(pricing))]
+
+
+def mapping_records(df):
+    """Mapping rows as JSON-ready dicts"""
+    records = []
+    for row in df.to_dict('records'):
+        record = {}
+        for column, key in COLUMN_KEYS.items():
+            value = row.get(column)
+            record[key] = None if value != value else value  # NaN -> None
+        record['code'] = str(record['code']).strip()
+        record['booking_required'] = str(record['booking_required']).strip().lower() == 'yes'
+        record['prices'] = parse_prices(record['pricing'])
+        if record['usage_count'] is not None:
+            record['usage_count'] = int(record['usage_count'])
+        records.append(record)
+    return records
+
+
+class ProcedureCatalog:
+    """Immutable in-memory index over mapping records"""
+
+    def __init__(self, records):
+        self.records = {}
+        for record in records:
+            self.records.setdefault(record['code'], record)
+        self.codes = sorted(self.records)
+
+        self.by_key = {}
+        for code in self.codes:
+            self.by_key.setdefault(compact_key(code), code)
+
+        self.groups = {}
+        for group, members in group_procedure_codes(self.codes).items():
+            self.groups[group] = sorted(members)
+            for code in members:
+                self.records[code]['group'] = group
+
+        # (lowercased code, code) pairs sorted for bisect prefix search
+        self.prefix_keys = sorted((code.lower(), code) for code in self.codes)
+        self.fuzzy_index = CodeIndex(self.codes)
+
+    def __len__(self):
+        return len(self.records)
+
+    def exact(self, code):
+        """Record for a code as written, else by compact key ('lipo-1' finds 'LIPO 1')"""
+        code = str(code).strip()
+        if code in self.records:
+            return self.records[code]
+        match = self.by_key.get(compact_key(code))
+        return self.records[match] if match else None
+
+    def prefix(self, query, limit=20):
+        """Records whose code starts with query (case-insensitive)"""
+        query = str(query).strip().lower()
+        start = bisect.bisect_left(self.prefix_keys, (query,))
+        results = []
+        for key, code in self.prefix_keys[start:]:
+            if not key.startswith(query) or len(results) >= limit:
+                break
+            results.append(self.records[code])
+        return results
+
+    def group(self, name):
+        return [self.records[code] for code in self.groups.get(str(name).upper(), [])]
+
+    def fuzzy(self, query, limit=5):
+        """[(score, record)] best first"""
+        return [(score, self.records[self.codes[i]])
+                for score, i in self.fuzzy_index.lookup(query, limit=limit)]
+
+    def search(self, query, limit=5):
+        """Exact match, else prefix matches, else fuzzy matches"""
+        record = self.exact(query)
+        if record is not None:
+            return {'match': 'exact', 'results': [record]}
+        records = self.prefix(query, limit)
+        if records:
+            return {'match': 'prefix', 'results': records}
+        return {'match': 'fuzzy', 'results': [dict(r, score=s) for s, r in self.fuzzy(query, limit)]}
+
+
+class CatalogStore:
+    """Holds the current catalog and swaps in a new one when the mapping file changes"""
+
+    def __init__(self, mapping_path):
+        self.mapping_path = Path(mapping_path)
+        self.catalog = None
+        self.loaded_mtime_ns = None
+        self.loaded_at = None
+        self.last_error = None
+        self.reloads = 0
+        self._stop = threading.Event()
+        self.reload(force=True)
+
+    def reload(self, force=False):
+        """Re-read the mapping if it changed; returns True when a new catalog was installed"""
+        try:
+            mtime_ns = self.mapping_path.stat().st_mtime_ns
+        except OSError as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        if not force and mtime_ns == self.loaded_mtime_ns:
+            return False
+        try:
+            catalog = ProcedureCatalog(mapping_records(read_dataset(self.mapping_path)))
+        except Exception as e:
+            # Probably caught mid-write; keep serving the old catalog and retry later
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.catalog is None:
+                raise
+            return False
+        # Readers take self.catalog once per request, so this swap is atomic for them
+        self.catalog = catalog
+        self.loaded_mtime_ns = mtime_ns
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.last_error = None
+        self.reloads += 1
+        print(f"✓ Loaded {len(catalog)} procedures from {self.mapping_path.name}")
+        return True
+
+    def watch(self, interval=RELOAD_CHECK_SECONDS):
+        """Poll the mapping file on a daemon thread so requests never wait on a reload"""
+        def poll():
+            while not self._stop.wait(interval):
+                self.reload()
+        thread = threading.Thread(target=poll, name="catalog-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def current(self):
+        """The catalog to answer a request with"""
+        return self.catalog
+
+
+class CatalogRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DWCCatalog/1.0"
+    # Keep-alive, so a workflow making many lookups skips the TCP handshake;
+    # without TCP_NODELAY each keep-alive response waits on a delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    store = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        catalog = self.store.current()
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        limit = int(params.get('limit', 20)) if params.get('limit', '').isdigit() else 20
+
+        if url.path == '/health':
+            self.send_json({
+                'status': 'ok',
+                'procedures': len(catalog),
+                'mapping': str(self.store.mapping_path),
+                'loaded_at': self.store.loaded_at,
+                'reloads': self.store.reloads,
+                'last_error': self.store.last_error,
+            })
+        elif url.path == '/lookup':
+            record = catalog.exact(params.get('code', ''))
+            if record is None:
+                self.send_json({'error': 'not found', 'code': params.get('code', '')}, 404)
+            else:
+                self.send_json(record)
+        elif url.path == '/prefix':
+            self.send_json({'results': catalog.prefix(params.get('q', ''), limit)})
+        elif url.path.startswith('/group/'):
+            name = unquote(url.path[len('/group/'):])
+            self.send_json({'group': name.upper(), 'results': catalog.group(name)})
+        elif url.path == '/fuzzy':
+            self.send_json({'results': [dict(r, score=s) for s, r in
+                                        catalog.fuzzy(params.get('q', ''), min(limit, 20))]})
+        elif url.path == '/search':
+            self.send_json(catalog.search(params.get('q', ''), min(limit, 20)))
+        else:
+            self.send_json({'error': 'unknown endpoint'}, 404)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/batch':
+            self.send_json({'error': 'unknown endpoint'}, 404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            codes = request.get('codes', [])
+        except (ValueError, TypeError, AttributeError):
+            self.send_json({'error': 'body must be JSON like {"codes": [...]}'}, 400)
+            return
+        # list() would split a lone "99213" into characters
+        if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+            self.send_json({'error': '"codes" must be a list of strings'}, 400)
+            return
+        if len(codes) > MAX_BATCH_SIZE:
+            self.send_json({'error': f'at most {MAX_BATCH_SIZE} codes per batch'}, 400)
+            return
+
+        catalog = self.store.current()
+        mode = request.get('mode', 'exact')
+        if mode == 'search':
+            results = {str(code): catalog.search(code) for code in codes}
+        elif mode == 'fuzzy':
+            results = {str(code): [dict(r, score=s) for s, r in catalog.fuzzy(code)] for code in codes}
+        else:
+            results = {str(code): catalog.exact(code) for code in codes}
+        self.send_json({'mode': mode, 'results': results})
+
+
+def make_server(mapping_path=DEFAULT_MAPPING_PATH, host="127.0.0.1", port=DEFAULT_PORT, verbose=False):
+    """Build (but do not start) the HTTP server; call server.store.watch() for hot reload"""
+    store = CatalogStore(mapping_path)
+    handler = type("BoundCatalogRequestHandler", (CatalogRequestHandler,),
+                   {'store': store, 'verbose': verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.store = store
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Square migration mapping over local HTTP")
+    parser.add_argument("--mapping", default=str(DEFAULT_MAPPING_PATH), help="mapping workbook (or columnar copy)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("DWC PROCEDURE CATALOG SERVICE")
+    print("=" * 80)
+    server = make_server(args.mapping, args.host, args.port, args.verbose)
+    server.store.watch()
+    print(f"Listening on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.store.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
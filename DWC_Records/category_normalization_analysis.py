@@ -7,6 +7,8 @@ import pandas as pd
 from pathlib import Path
 from collections import defaultdict
 import re
+from dataset_io import list_datasets
+from frame_loader import load_frame
 
 def clean_string(s):
     """Basic string cleaning"""
@@ -17,6 +19,21 @@ def clean_string(s):
     s = re.sub(r'\s+', ' ', s)
     return s
 
+# Category columns collected per report type -> key in the analysis result
+CATEGORY_COLUMNS = {
+    'Patient Research': {
+        'Procedure': 'patient_procedures',
+        'Description': 'patient_descriptions',
+        'Provider': 'patient_providers',
+        'Gender': 'patient_genders',
+    },
+    'Payment Distribution': {
+        'Procedure Code': 'payment_procedure_codes',
+        'Tran Type': 'payment_tran_types',
+        'Type': 'payment_types',
+    },
+}
+
 def analyze_all_files():
     """Analyze all Excel files and identify normalization opportunities"""
 
@@ -24,58 +41,50 @@ def analyze_all_files():
     print("CATEGORY NORMALIZATION ANALYSIS - DWC RECORDS")
     print("="*80)
 
-    # Find all Excel files
+    # Find all data files (columnar copies preferred over workbooks)
     dwc_path = Path("DWC RECORDS")
-    excel_files = list(dwc_path.rglob("*.xlsx"))
-    # Filter out temp files
-    excel_files = [f for f in excel_files if not f.name.startswith('~$')]
+    excel_files = list_datasets(dwc_path)
 
     print(f"\nFound {len(excel_files)} Excel files to analyze\n")
 
     # Collect all unique values for key columns across all files
-    patient_procedures = set()
-    patient_descriptions = set()
-    patient_providers = set()
-    patient_genders = set()
-
-    payment_procedure_codes = set()
-    payment_tran_types = set()
-    payment_types = set()
+    values = new_category_values()
 
     print("Reading all files...")
     for file_path in excel_files:
         try:
-            df = pd.read_excel(file_path)
+            df = load_frame(file_path)
 
             if 'Patient Research' in str(file_path):
-                if 'Procedure' in df.columns:
-                    patient_procedures.update(df['Procedure'].apply(clean_string).unique())
-                if 'Description' in df.columns:
-                    patient_descriptions.update(df['Description'].apply(clean_string).unique())
-                if 'Provider' in df.columns:
-                    patient_providers.update(df['Provider'].apply(clean_string).unique())
-                if 'Gender' in df.columns:
-                    patient_genders.update(df['Gender'].apply(clean_string).unique())
-
+                collect_category_values(df, 'Patient Research', values)
             elif 'Payment Distribution' in str(file_path):
-                if 'Procedure Code' in df.columns:
-                    payment_procedure_codes.update(df['Procedure Code'].apply(clean_string).unique())
-                if 'Tran Type' in df.columns:
-                    payment_tran_types.update(df['Tran Type'].apply(clean_string).unique())
-                if 'Type' in df.columns:
-                    payment_types.update(df['Type'].apply(clean_string).unique())
+                collect_category_values(df, 'Payment Distribution', values)
 
         except Exception as e:
             print(f"  Error reading {file_path}: {e}")
 
+    return report_normalization_opportunities(values)
+
+def new_category_values():
+    """Empty value sets keyed like the analysis result"""
+    return {key: set() for columns in CATEGORY_COLUMNS.values() for key in columns.values()}
+
+def collect_category_values(df, report_type, values):
+    """Add the cleaned distinct values of one report frame's category columns to values"""
+    for column, key in CATEGORY_COLUMNS.get(report_type, {}).items():
+        if column in df.columns:
+            values[key].update(df[column].drop_duplicates().apply(clean_string))
+
+def report_normalization_opportunities(values):
+    """Print the normalization analysis for collected value sets and return them"""
     # Remove empty strings
-    patient_procedures = {p for p in patient_procedures if p}
-    patient_descriptions = {d for d in patient_descriptions if d}
-    patient_providers = {p for p in patient_providers if p}
-    patient_genders = {g for g in patient_genders if g}
-    payment_procedure_codes = {c for c in payment_procedure_codes if c}
-    payment_tran_types = {t for t in payment_tran_types if t}
-    payment_types = {t for t in payment_types if t}
+    patient_procedures = {p for p in values['patient_procedures'] if p}
+    patient_descriptions = {d for d in values['patient_descriptions'] if d}
+    patient_providers = {p for p in values['patient_providers'] if p}
+    patient_genders = {g for g in values['patient_genders'] if g}
+    payment_procedure_codes = {c for c in values['payment_procedure_codes'] if c}
+    payment_tran_types = {t for t in values['payment_tran_types'] if t}
+    payment_types = {t for t in values['payment_types'] if t}
 
     print("\n" + "="*80)
     print("NORMALIZATION OPPORTUNITIES")
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Lazy, date-pruned queries over the DWC corpus
+
+The exports say in their names which service dates they cover
+(PatientResearchReportJan-1-2005-Jan-1-2010.xlsx,
+PatientResearchReportOcoeeJan-1-2000toOct-28-2025part_4.xlsx).
+CorpusCatalog parses those ranges, and the report type, without opening a
+file. A Query is built up lazily and nothing is read until collect():
+    - files whose type or date range cannot match are never opened
+    - only the selected and filtered columns are read
+    - where() filters are pushed into the Parquet read (a columnar copy or
+      the workbook cache entry) and applied again to the frame, so formats
+      without pushdown give the same answer; both keep a missing value for
+      != and 'not in', as pandas does
+    - the service-date range is applied to the rows of the files that remain
+
+A filename's range is a promise about its rows, and both ends count as
+covered. When a query reads a file's whole date column, the dates it
+actually holds are remembered (date_ranges.json next to the workbook cache,
+keyed by size and mtime) and prune later queries more tightly.
+
+Usage:
+    python DWC_Records/corpus_query.py plan --since 2020
+    python DWC_Records/corpus_query.py codes --since 2020                  # codes billed since 2020
+    python DWC_Records/corpus_query.py codes --report "Patient Research" --since 2012 --until 2013
+    python DWC_Records/corpus_query.py rows --since 2024-06 --columns "Procedure Code,Charge" \\
+        --where "Tran Type=Credit Card" --output /tmp/rows.csv
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from datetime import date
+import argparse
+import calendar
+import json
+import os
+import re
+from dataset_io import list_datasets, preferred_copy, read_dataset, dataset_header, mixed_type_columns
+from workbook_cache import CACHE_DIR, fresh_entry, cache_enabled, read_header
+from frame_loader import compact_frame
+
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+DWC_DIR = Path(__file__).resolve().parent
+
+DEFAULT_ROOTS = [DWC_DIR / "02_Normalized"]
+DATE_RANGES_PATH = CACHE_DIR / "date_ranges.json"
+
+# "Jan-1-2005-Jan-1-2010" or "Jan-1-2000toOct-28-2025"
+FILENAME_RANGE = re.compile(r'([A-Z][a-z]{2})-(\d{1,2})-(\d{4})(?:-|to)([A-Z][a-z]{2})-(\d{1,2})-(\d{4})')
+MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+
+# Report type -> (text identifying it in a path, service date column)
+REPORT_TYPES = {
+    'Patient Research': ('patientresearch', 'Date Of Service'),
+    'Payment Distribution': ('paymentdistribution', 'Service Date'),
+}
+
+OPERATORS = {
+    '==': lambda s, v: s == v,
+    '!=': lambda s, v: s != v,
+    '<': lambda s, v: s < v,
+    '<=': lambda s, v: s <= v,
+    '>': lambda s, v: s > v,
+    '>=': lambda s, v: s >= v,
+    'in': lambda s, v: s.isin(list(v)),
+    'not in': lambda s, v: ~s.isin(list(v)),
+}
+
+
+def parse_date_range(name):
+    """(start, end) dates a filename says it covers, or (None, None)"""
+    match = FILENAME_RANGE.search(str(name))
+    if not match:
+        return None, None
+    try:
+        start = date(int(match[3]), MONTHS[match[1]], int(match[2]))
+        end = date(int(match[6]), MONTHS[match[4]], int(match[5]))
+    except (KeyError, ValueError):
+        return None, None
+    return start, end
+
+
+def report_type_of(path):
+    """Report type named in a path (file or folder name), or None"""
+    text = re.sub(r'[\s_]', '', str(path)).lower()
+    for report_type, (marker, _) in REPORT_TYPES.items():
+        if marker in text:
+            return report_type
+    return None
+
+
+def parse_bound(text, end=False):
+    """'2020', '2020-06' or '2020-06-15' as a date: the first day, or the last with end=True"""
+    if text is None or isinstance(text, date):
+        return text
+    parts = [int(p) for p in str(text).split('-')]
+    year, month = parts[0], parts[1] if len(parts) > 1 else (12 if end else 1)
+    if len(parts) > 2:
+        return date(year, month, parts[2])
+    return date(year, month, calendar.monthrange(year, month)[1] if end else 1)
+
+
+def _load_observed():
+    try:
+        with open(DATE_RANGES_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_observed(observed):
+    DATE_RANGES_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = DATE_RANGES_PATH.with_name(f"{DATE_RANGES_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(observed, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, DATE_RANGES_PATH)
+
+
+class CorpusFile:
+    """One dataset with the report type and date range known before it is opened"""
+
+    def __init__(self, path, observed=None):
+        self.path = Path(path)
+        self.report_type = report_type_of(self.path)
+        self.start, self.end = parse_date_range(self.path.name)
+        stat = preferred_copy(self.path).stat()
+        self.stamp = [stat.st_size, stat.st_mtime_ns]
+        # Dates a previous query found in the file, if it has not changed since
+        if observed and observed.get('stamp') == self.stamp:
+            self.start, self.end = date.fromisoformat(observed['min']), date.fromisoformat(observed['max'])
+            self.observed = True
+        else:
+            self.observed = False
+
+    @property
+    def key(self):
+        return str(preferred_copy(self.path).resolve())
+
+    @property
+    def date_column(self):
+        return REPORT_TYPES[self.report_type][1] if self.report_type else None
+
+    def may_contain(self, report_type=None, start=None, end=None):
+        """False only when the file certainly has no rows of that type in [start, end]"""
+        if report_type is not None and self.report_type != report_type:
+            return False
+        if start is not None and self.end is not None and self.end < start:
+            return False
+        if end is not None and self.start is not None and self.start > end:
+            return False
+        return True
+
+    def describe(self):
+        if self.start is None:
+            return "dates unknown"
+        return f"{self.start} .. {self.end} ({'observed' if self.observed else 'filename'})"
+
+
+class CorpusCatalog:
+    """Every dataset under the roots, with filename metadata"""
+
+    def __init__(self, roots=None):
+        self.roots = [Path(root) for root in (roots or DEFAULT_ROOTS)]
+        observed = _load_observed()
+        self.files = []
+        for root in self.roots:
+            for path in sorted(list_datasets(root)):
+                key = str(preferred_copy(path).resolve())
+                self.files.append(CorpusFile(path, observed.get(key)))
+
+    def __len__(self):
+        return len(self.files)
+
+    def prune(self, report_type=None, start=None, end=None):
+        """(files that may match, files skipped)"""
+        kept, skipped = [], []
+        for corpus_file in self.files:
+            (kept if corpus_file.may_contain(report_type, start, end) else skipped).append(corpus_file)
+        return kept, skipped
+
+    def remember(self, corpus_file, dates):
+        """Record the service dates a file was found to hold"""
+        dates = dates.dropna()
+        if not len(dates):
+            return
+        observed = _load_observed()
+        observed[corpus_file.key] = {'stamp': corpus_file.stamp,
+                                     'min': dates.min().date().isoformat(),
+                                     'max': dates.max().date().isoformat()}
+        _save_observed(observed)
+
+
+def _file_header(path):
+    """Column names of a dataset without reading its rows"""
+    path = preferred_copy(path)
+    if path.suffix != '.xlsx':
+        return dataset_header(path)
+    entry = fresh_entry(path) if cache_enabled() else None
+    if entry is not None and entry.suffix == '.parquet':
+        return pq.read_schema(entry).names
+    return [name for name in read_header(path) if name is not None]
+
+
+def _parquet_source(path):
+    """The Parquet file a dataset can be read from with pushdown, or None"""
+    if not HAVE_PYARROW:
+        return None
+    path = preferred_copy(path)
+    if path.suffix == '.parquet':
+        # Mixed-type columns are stored as text; read_dataset rebuilds them
+        return None if mixed_type_columns(path) else path
+    if path.suffix == '.xlsx' and cache_enabled():
+        entry = fresh_entry(path)
+        if entry is not None and entry.suffix == '.parquet':
+            return entry
+    return None
+
+
+def _pushdown_filter(filters):
+    """
+    where() filters as a pyarrow expression that keeps what OPERATORS keeps.
+
+    Arrow drops null rows from != and 'not in' where pandas keeps them (a
+    missing Check # is not 'zzz'), so those terms also keep nulls. Membership
+    tests against a missing value are left to pandas. None when nothing can
+    be pushed down.
+    """
+    expression = None
+    for column, op, value in filters:
+        field = pc.field(column)
+        if op in ('in', 'not in'):
+            value = list(value)
+            if any(pd.isna(v) for v in value):
+                continue
+            term = field.isin(value)
+            if op == 'not in':
+                term = ~term | field.is_null(nan_is_null=True)
+        else:
+            term = {
+                '==': lambda: field == value,
+                '!=': lambda: (field != value) | field.is_null(nan_is_null=True),
+                '<': lambda: field < value,
+                '<=': lambda: field <= value,
+                '>': lambda: field > value,
+                '>=': lambda: field >= value,
+            }[op]()
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def _apply_filters(df, filters):
+    if not filters or not len(df):
+        return df
+    keep = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        keep &= OPERATORS[op](df[column], value).to_numpy(dtype=bool)
+    return df[keep]
+
+
+class Query:
+    """
+    A lazy question about the corpus. Each method returns a new Query; nothing
+    is read until collect(), iter_frames() or distinct().
+    """
+
+    def __init__(self, catalog=None, report_type=None, start=None, end=None, columns=None, filters=()):
+        self.catalog = catalog if catalog is not None else CorpusCatalog()
+        self.report_type = report_type
+        self.start = start
+        self.end = end
+        self.columns = columns
+        self.filters = tuple(filters)
+        self.files_read = []
+        self.rows_read = 0
+
+    def _with(self, **changes):
+        options = dict(catalog=self.catalog, report_type=self.report_type, start=self.start,
+                       end=self.end, columns=self.columns, filters=self.filters)
+        options.update(changes)
+        return Query(**options)
+
+    def report(self, report_type):
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Unknown report type: {report_type}")
+        return self._with(report_type=report_type)
+
+    def between(self, start=None, end=None):
+        """Rows whose service date is in [start, end]; either end may be open"""
+        return self._with(start=parse_bound(start), end=parse_bound(end, end=True))
+
+    def since(self, start):
+        return self.between(start, self.end)
+
+    def select(self, *columns):
+        return self._with(columns=list(columns))
+
+    def where(self, column, op, value):
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        if op in ('in', 'not in'):
+            value = tuple(value)
+        return self._with(filters=self.filters + ((column, op, value),))
+
+    def plan(self):
+        """(files to read, files pruned) for this query"""
+        return self.catalog.prune(self.report_type, self.start, self.end)
+
+    def _read(self, corpus_file):
+        """One file's matching rows, or None when it cannot have any"""
+        header = _file_header(corpus_file.path)
+        date_column = corpus_file.date_column if (self.start or self.end) else None
+        needed = list(self.columns) if self.columns is not None else list(header)
+        needed += [column for column, _, _ in self.filters]
+        if date_column:
+            needed.append(date_column)
+        # A file without a filtered column has no rows the filter can keep
+        if any(column not in header for column, _, _ in self.filters):
+            return None
+        columns = [column for column in dict.fromkeys(needed) if column in header]
+
+        df, pushed = None, False
+        source = _parquet_source(corpus_file.path)
+        pushdown = _pushdown_filter(self.filters) if source is not None and self.filters else None
+        if pushdown is not None:
+            try:
+                df = pq.read_table(source, columns=columns, filters=pushdown).to_pandas()
+                pushed = True
+            except (pyarrow.lib.ArrowException, TypeError, ValueError):
+                df = None  # e.g. comparing a text column to a number; filter in pandas instead
+        if df is None:
+            df = read_dataset(corpus_file.path, columns)
+        self.files_read.append(corpus_file)
+        self.rows_read += len(df)
+
+        if date_column and date_column in df.columns:
+            dates = pd.to_datetime(df[date_column], format='%m/%d/%Y', errors='coerce')
+            if not pushed:
+                self.catalog.remember(corpus_file, dates)
+            keep = dates.notna()
+            if self.start:
+                keep &= dates >= pd.Timestamp(self.start)
+            if self.end:
+                keep &= dates <= pd.Timestamp(self.end)
+            df = df[keep.to_numpy(dtype=bool)]
+        df = _apply_filters(df, self.filters)
+        if self.columns is not None:
+            df = df[[column for column in self.columns if column in df.columns]]
+        return df
+
+    def iter_frames(self, compact=True):
+        """(CorpusFile, frame) for each file that has matching rows"""
+        files, _ = self.plan()
+        for corpus_file in files:
+            df = self._read(corpus_file)
+            if df is not None and len(df):
+                yield corpus_file, (compact_frame(df) if compact else df)
+
+    def collect(self, compact=True):
+        """All matching rows as one frame"""
+        frames = [df for _, df in self.iter_frames(compact=False)]
+        if not frames:
+            return pd.DataFrame(columns=self.columns or [])
+        df = pd.concat(frames, ignore_index=True)
+        return compact_frame(df) if compact else df
+
+    def distinct(self, column):
+        """Sorted distinct text values of a column over the matching rows"""
+        query = self.select(column)
+        values = set()
+        for _, df in query.iter_frames(compact=False):
+            values.update(str(v).strip() for v in df[column].dropna().unique())
+        self.files_read += query.files_read
+        self.rows_read += query.rows_read
+        values.discard('')
+        return sorted(values)
+
+
+def scan(roots=None):
+    """A Query over every dataset under roots (default: 02_Normalized)"""
+    return Query(CorpusCatalog(roots))
+
+
+def _parse_where(text):
+    """'Tran Type=Credit Card', 'Charge>=100', 'Type in P,C' -> (column, op, value)"""
+    match = re.match(r'^(.+?)\s+(not in|in)\s+(.+)$', text)
+    if match:
+        return match[1].strip(), match[2], [v.strip() for v in match[3].split(',')]
+    match = re.match(r'^(.+?)\s*(==|!=|<=|>=|=|<|>)\s*(.*)$', text)
+    if not match:
+        raise argparse.ArgumentTypeError(f"Cannot parse filter: {text}")
+    column, op, value = match[1].strip(), match[2], match[3].strip()
+    try:
+        value = float(value) if op not in ('=', '==', '!=') else value
+    except ValueError:
+        pass
+    return column, '==' if op == '=' else op, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Date-pruned queries over the DWC corpus")
+    parser.add_argument("command", choices=["plan", "codes", "rows"],
+                        help="plan: which files a query reads; codes: distinct procedure codes; rows: matching rows")
+    parser.add_argument("--root", action="append", help="directory of datasets (repeatable; default: 02_Normalized)")
+    parser.add_argument("--report", choices=list(REPORT_TYPES),
+                        help="report type (codes defaults to Payment Distribution)")
+    parser.add_argument("--since", help="first service date: YYYY, YYYY-MM or YYYY-MM-DD")
+    parser.add_argument("--until", help="last service date: YYYY, YYYY-MM or YYYY-MM-DD")
+    parser.add_argument("--columns", help="comma-separated columns to return (rows)")
+    parser.add_argument("--where", action="append", type=_parse_where, default=[],
+                        help="row filter such as 'Tran Type=Credit Card' or 'Charge>=100' (repeatable)")
+    parser.add_argument("--output", help="write rows to this .csv or .xlsx instead of printing them")
+    args = parser.parse_args()
+
+    query = scan(args.root).between(args.since, args.until)
+    report_type = args.report or ('Payment Distribution' if args.command == 'codes' else None)
+    if report_type:
+        query = query.report(report_type)
+    for column, op, value in args.where:
+        query = query.where(column, op, value)
+
+    print("=" * 80)
+    print("DWC CORPUS QUERY")
+    print("=" * 80)
+    files, skipped = query.plan()
+    print(f"📁 {len(files)} of {len(query.catalog)} files can match; {len(skipped)} pruned without opening")
+
+    if args.command == "plan":
+        for corpus_file in files:
+            print(f"  ✓ {corpus_file.path.name}: {corpus_file.describe()}")
+        for corpus_file in skipped:
+            print(f"  ✗ {corpus_file.path.name}: {corpus_file.report_type}, {corpus_file.describe()}")
+    elif args.command == "codes":
+        column = 'Procedure Code' if report_type == 'Payment Distribution' else 'Procedure'
+        codes = query.distinct(column)
+        print(f"📊 {len(codes)} distinct codes ({query.rows_read} rows read from {len(query.files_read)} files)\n")
+        for code in codes:
+            print(f"  {code}")
+    else:
+        if args.columns:
+            query = query.select(*[c.strip() for c in args.columns.split(',')])
+        df = query.collect(compact=False)
+        print(f"📊 {len(df)} matching rows ({query.rows_read} rows read from {len(query.files_read)} files)")
+        if args.output:
+            output = Path(args.output)
+            df.to_excel(output, index=False) if output.suffix == '.xlsx' else df.to_csv(output, index=False)
+            print(f"✅ Saved to: {output}")
+        else:
+            print(df.head(20).to_string(index=False))
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Single-pass corpus scanner for the DWC analysis reports
+
+extract_procedures.py, category_normalization_analysis.py and
+analyze_for_migration.py each walk the same folders and re-read the same
+workbooks. The scanner reads every workbook once, detects its report type
+from the header row, and feeds the frame to pluggable aggregators. One run
+produces:
+    Documentation/Procedure codes.txt
+    Documentation/Procedure List for normalization.txt
+    Documentation/CATEGORY_NORMALIZATION_ANALYSIS.txt
+    SQUARE_MIGRATION_MAPPING.xlsx
+    PRICE_HISTORY.xlsx
+
+Usage:
+    python DWC_Records/corpus_scanner.py
+    python DWC_Records/corpus_scanner.py --root DWC_Records/02_Normalized
+    python DWC_Records/corpus_scanner.py --memory-budget 512   # chunk files over 512 MB
+"""
+import pandas as pd
+from pathlib import Path
+from contextlib import redirect_stdout
+from abc import ABC, abstractmethod
+import argparse
+import sys
+
+DWC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DWC_DIR.parent))
+
+from dataset_io import list_datasets
+from frame_loader import iter_frames, MemoryReport
+from row_dedup import RowDeduplicator
+from price_history import PriceHistory
+from extract_procedures import (codes_from_frame, add_procedure_pairs,
+                                write_procedure_codes_report, write_procedure_list_report)
+from category_normalization_analysis import (new_category_values, collect_category_values,
+                                             report_normalization_opportunities)
+from analyze_for_migration import collect_procedure_rows, summarize_procedures, build_migration_mapping
+
+DEFAULT_ROOTS = [DWC_DIR / "01_Original", DWC_DIR / "02_Normalized"]
+DOCUMENTATION_DIR = DWC_DIR / "Documentation"
+
+REPORT_TYPES = ('Patient Research', 'Payment Distribution')
+
+
+def detect_report_type(df):
+    """Identify a DWC export from its header row"""
+    if 'Procedure' in df.columns and 'Description' in df.columns:
+        return 'Patient Research'
+    if 'Procedure Code' in df.columns:
+        return 'Payment Distribution'
+    return None
+
+
+class ReportAggregator(ABC):
+    """
+    Consumes the frames of the report types it cares about.
+
+    path_filter restricts the aggregator to files whose path contains the
+    given text (e.g. '02_Normalized'), so reports that must not double-count
+    original and normalized copies can share a scan with those that want both.
+    """
+    name = "report"
+    report_types = REPORT_TYPES
+
+    def __init__(self, path_filter=None):
+        self.path_filter = path_filter
+
+    def wants_path(self, file_path):
+        return self.path_filter is None or self.path_filter in str(file_path)
+
+    def wants(self, file_path, report_type):
+        return report_type in self.report_types and self.wants_path(file_path)
+
+    @abstractmethod
+    def update(self, df, file_path, report_type):
+        """Take in one frame (a whole file or a chunk of one)"""
+
+    @abstractmethod
+    def finalize(self):
+        """Write the report and return the path(s) it produced"""
+
+
+class ProcedureCodesAggregator(ReportAggregator):
+    """Distinct Payment Distribution procedure codes -> 'Procedure codes.txt'"""
+    name = "procedure codes"
+    report_types = ('Payment Distribution',)
+
+    def __init__(self, output_path, path_filter=None):
+        super().__init__(path_filter)
+        self.output_path = output_path
+        self.procedure_codes = set()
+
+    def update(self, df, file_path, report_type):
+        self.procedure_codes.update(codes_from_frame(df))
+
+    def finalize(self):
+        write_procedure_codes_report(sorted(self.procedure_codes), self.output_path)
+        return [self.output_path]
+
+
+class ProcedureListAggregator(ReportAggregator):
+    """Patient Research procedure/description pairs -> 'Procedure List for normalization.txt'"""
+    name = "procedure list"
+    report_types = ('Patient Research',)
+
+    def __init__(self, output_path, path_filter=None):
+        super().__init__(path_filter)
+        self.output_path = output_path
+        self.procedure_pairs = {}
+
+    def update(self, df, file_path, report_type):
+        add_procedure_pairs(df, self.procedure_pairs)
+
+    def finalize(self):
+        write_procedure_list_report(self.procedure_pairs, self.output_path)
+        return [self.output_path]
+
+
+class NormalizationAnalysisAggregator(ReportAggregator):
+    """Distinct category values -> normalization analysis text report"""
+    name = "normalization analysis"
+
+    def __init__(self, output_path, path_filter=None):
+        super().__init__(path_filter)
+        self.output_path = output_path
+        self.values = new_category_values()
+
+    def update(self, df, file_path, report_type):
+        collect_category_values(df, report_type, self.values)
+
+    def finalize(self):
+        with open(self.output_path, "w", encoding="utf-8") as f, redirect_stdout(f):
+            report_normalization_opportunities(self.values)
+        return [self.output_path]
+
+
+class MigrationMappingAggregator(ReportAggregator):
+    """Per-code procedure rows -> SQUARE_MIGRATION_MAPPING.xlsx (+ PRICE_HISTORY.xlsx)"""
+    name = "migration mapping"
+
+    def __init__(self, output_path, path_filter=None, dedupe=False, price_history_path=None):
+        super().__init__(path_filter)
+        self.output_path = output_path
+        self.price_history_path = price_history_path
+        self.frames = []
+        self.unique_procedures = None
+        self.price_history = PriceHistory()
+        # Usage counts must not double-count rows that overlapping exports share
+        self.deduplicator = RowDeduplicator() if dedupe else None
+
+    def update(self, df, file_path, report_type):
+        if self.deduplicator is not None:
+            df = self.deduplicator.filter(df, file_path)
+        frame = collect_procedure_rows(df)
+        if frame is not None:
+            self.frames.append(frame)
+            self.price_history.update(frame)
+
+    def finalize(self):
+        if self.deduplicator is not None:
+            self.deduplicator.finish()
+        if not self.frames:
+            return []
+        df_procedures = pd.concat(self.frames, ignore_index=True)
+        self.frames = []
+        self.unique_procedures = summarize_procedures(df_procedures)
+        # The console breakdown is the standalone script's concern
+        build_migration_mapping(self.unique_procedures, self.output_path, self.price_history, verbose=False)
+        if self.price_history_path is None:
+            return [self.output_path]
+        return [self.output_path, self.price_history.write(self.price_history_path)]
+
+
+class CorpusScanner:
+    """Read each workbook under roots once and dispatch it to aggregators"""
+
+    def __init__(self, roots, aggregators, memory_budget_mb=None):
+        self.roots = [Path(root) for root in roots]
+        self.aggregators = list(aggregators)
+        self.memory_budget_mb = memory_budget_mb
+        self.memory = MemoryReport()
+        self.files_read = 0
+        self.rows_read = 0
+
+    def iter_files(self):
+        for root in self.roots:
+            yield from sorted(list_datasets(root))
+
+    def run(self):
+        """Scan the corpus and finalize every aggregator; returns the written paths"""
+        for file_path in self.iter_files():
+            # Skip files no aggregator could want before paying for the read
+            if not any(agg.wants_path(file_path) for agg in self.aggregators):
+                continue
+
+            print(f"Scanning: {file_path.name}")
+            try:
+                self.scan_file(file_path)
+            except Exception as e:
+                print(f"  Error reading {file_path.name}: {e}")
+
+        written = []
+        for agg in self.aggregators:
+            written.extend(agg.finalize())
+        return written
+
+    def scan_file(self, file_path):
+        """Feed one file to its aggregators, a chunk at a time when it is over the memory budget"""
+        report_type, consumers, rows = None, [], 0
+        for df in iter_frames(file_path, memory_budget_mb=self.memory_budget_mb, report=self.memory):
+            if report_type is None:
+                report_type = detect_report_type(df)
+                if report_type is None:
+                    print(f"  Skipping {file_path.name}: unrecognized report layout")
+                    return
+                consumers = [agg for agg in self.aggregators if agg.wants(file_path, report_type)]
+            for agg in consumers:
+                agg.update(df, file_path, report_type)
+            rows += len(df)
+        if report_type is None:
+            return
+
+        self.files_read += 1
+        self.rows_read += rows
+        print(f"  {report_type}: {rows} rows -> {', '.join(a.name for a in consumers) or 'no reports'}")
+
+
+def default_aggregators(output_dir=DOCUMENTATION_DIR, mapping_path=DWC_DIR / "SQUARE_MIGRATION_MAPPING.xlsx",
+                        analysis_filter="01_Original", migration_filter="02_Normalized", dedupe=False,
+                        price_history_path=DWC_DIR / "PRICE_HISTORY.xlsx"):
+    """The aggregators behind the nightly reports"""
+    output_dir = Path(output_dir)
+    return [
+        ProcedureCodesAggregator(output_dir / "Procedure codes.txt"),
+        ProcedureListAggregator(output_dir / "Procedure List for normalization.txt"),
+        NormalizationAnalysisAggregator(output_dir / "CATEGORY_NORMALIZATION_ANALYSIS.txt",
+                                        path_filter=analysis_filter),
+        MigrationMappingAggregator(Path(mapping_path), path_filter=migration_filter, dedupe=dedupe,
+                                   price_history_path=Path(price_history_path) if price_history_path else None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build all DWC analysis reports in one pass")
+    parser.add_argument("--root", action="append",
+                        help="directory to scan recursively (repeatable; default: 01_Original and 02_Normalized)")
+    parser.add_argument("--output-dir", default=str(DOCUMENTATION_DIR),
+                        help="directory for the text reports")
+    parser.add_argument("--mapping", default=str(DWC_DIR / "SQUARE_MIGRATION_MAPPING.xlsx"),
+                        help="output path for the Square migration mapping")
+    parser.add_argument("--price-history", default=str(DWC_DIR / "PRICE_HISTORY.xlsx"),
+                        help="output path for the per-code, per-year price table ('' to skip)")
+    parser.add_argument("--analysis-filter", default="01_Original",
+                        help="only files whose path contains this feed the normalization analysis ('' for all)")
+    parser.add_argument("--migration-filter", default="02_Normalized",
+                        help="only files whose path contains this feed the migration mapping ('' for all)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="count rows repeated across overlapping exports once in the migration mapping")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="read files estimated to need more than this in chunks")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("DWC RECORDS - SINGLE-PASS REPORT SCAN")
+    print("=" * 80)
+
+    scanner = CorpusScanner(
+        args.root or DEFAULT_ROOTS,
+        default_aggregators(args.output_dir, args.mapping,
+                            analysis_filter=args.analysis_filter or None,
+                            migration_filter=args.migration_filter or None,
+                            dedupe=args.dedupe, price_history_path=args.price_history or None),
+        memory_budget_mb=args.memory_budget)
+    written = scanner.run()
+
+    print("\n" + "=" * 80)
+    print(f"✅ Read {scanner.files_read} files once ({scanner.rows_read} rows) for {len(scanner.aggregators)} reports")
+    for path in written:
+        print(f"  - {path}")
+    scanner.memory.print_summary()
+    for agg in scanner.aggregators:
+        if getattr(agg, 'deduplicator', None) is not None:
+            agg.deduplicator.print_summary()
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Output formats for normalized DWC data and format-aware readers
+
+normalize_categories.py can write each normalized file as .xlsx, .parquet,
+.feather (Arrow IPC) or .csv, optionally alongside an Excel copy for people
+to open. A "dataset" is one logical file: every copy with the same stem in the
+same folder. Readers go through read_dataset / read_dataset_columns, which
+take the copy preferred_copy picks: Parquet, then Feather, then the workbook
+(via workbook_cache), then CSV. A CSV keeps no cell types - reading it back
+re-infers them - so a workbook copy at least as new as the CSV wins over it.
+The Excel copy is otherwise an export: edits made to it are not picked up
+while a Parquet or Feather copy exists.
+
+Arrow stores one type per column, so an object column mixing types (int and
+str procedure codes) is written as text plus a hidden column naming each
+non-text value's type (MIXED_TYPE_PREFIX + name), listed in the schema
+metadata. read_dataset converts the values back, so 123 stays 123 and '123'
+stays '123' whatever the --format; dataset_header hides the type columns.
+
+Excel copies are written by BackgroundExcelWriter on a worker thread so the
+next file does not wait for to_excel.
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time
+import json
+import os
+from workbook_cache import read_workbook, read_columns, resolve_columns
+from memory_cache import memoize
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+OUTPUT_FORMATS = {
+    'xlsx': '.xlsx',
+    'parquet': '.parquet',
+    'feather': '.feather',
+    'csv': '.csv',
+}
+
+COLUMNAR_SUFFIXES = ('.parquet', '.feather', '.csv')
+# Preferred first when a dataset has several copies (see preferred_copy)
+DATASET_SUFFIXES = ('.parquet', '.feather', '.xlsx', '.csv')
+
+MIXED_TYPES_KEY = b'dwc_mixed_type_columns'
+MIXED_TYPE_PREFIX = '__type__ '
+# Non-text values of mixed columns, rebuilt from their str() text
+RESTORE_TYPES = {
+    'int': int,
+    'int64': int,
+    'float': float,
+    'float64': float,
+    'bool': lambda text: text == 'True',
+    'datetime': datetime.fromisoformat,
+    'Timestamp': pd.Timestamp,
+    'date': date.fromisoformat,
+    'time': time.fromisoformat,
+}
+
+
+def output_path_for(file_path, output_dir, output_format='xlsx'):
+    """Where a source file's normalized copy goes in a given format"""
+    return Path(output_dir) / (Path(file_path).stem + OUTPUT_FORMATS[output_format])
+
+
+def preferred_copy(path):
+    """
+    The copy of a dataset readers should use: Parquet, Feather, the workbook,
+    then CSV - but a CSV newer than the workbook (a stale Excel copy) wins.
+    Returns path itself when no copy exists.
+    """
+    path = Path(path)
+    for suffix in DATASET_SUFFIXES:
+        candidate = path.with_suffix(suffix)
+        if not candidate.exists():
+            continue
+        if suffix == '.xlsx':
+            csv_copy = path.with_suffix('.csv')
+            if csv_copy.exists() and csv_copy.stat().st_mtime_ns > candidate.stat().st_mtime_ns:
+                return csv_copy
+        return candidate
+    return path
+
+
+def list_datasets(root, recursive=True):
+    """
+    One path per dataset under root, in discovery order, preferring columnar copies.
+
+    Temp files ('~$...') are skipped. For a folder of plain workbooks this is
+    the same list as root.rglob('*.xlsx').
+    """
+    root = Path(root)
+    if not root.exists():
+        return []
+    found = {}
+    for path in (root.rglob("*") if recursive else root.glob("*")):
+        if path.suffix not in DATASET_SUFFIXES or path.name.startswith('~$') or not path.is_file():
+            continue
+        found.setdefault(path.with_suffix(''), path)
+    return [preferred_copy(path) for path in found.values()]
+
+
+def read_dataset(path, columns=None):
+    """Read a dataset (any supported format) as a DataFrame"""
+    path = preferred_copy(path)
+    if path.suffix == '.xlsx':
+        return read_workbook(path, columns)
+    key = ('dataset', str(path.resolve()), tuple(columns) if columns is not None else None)
+    return memoize(key, [path], lambda: _read_columnar(path, columns))
+
+
+def _arrow_schema(path):
+    if path.suffix == '.parquet':
+        return pq.read_schema(path)
+    return pyarrow.ipc.open_file(pyarrow.memory_map(str(path))).schema
+
+
+def mixed_type_columns(path):
+    """Columns of a Parquet/Feather dataset stored as text plus a type column"""
+    path = Path(path)
+    if path.suffix not in ('.parquet', '.feather') or not HAVE_PYARROW:
+        return []
+    raw = (_arrow_schema(path).metadata or {}).get(MIXED_TYPES_KEY)
+    return json.loads(raw) if raw else []
+
+
+def _restore_mixed(df, mixed):
+    """Turn mixed columns stored as text back into their original values"""
+    for column in mixed:
+        type_column = MIXED_TYPE_PREFIX + column
+        if type_column not in df.columns:
+            continue
+        if column in df.columns:
+            values = df[column].astype(object).to_numpy(copy=True)
+            types = df[type_column].astype(object).to_numpy()
+            for type_name in pd.unique(types[pd.notna(types)]):
+                rows = np.flatnonzero(types == type_name)
+                values[rows] = [RESTORE_TYPES[type_name](text) for text in values[rows]]
+            df[column] = pd.Series(values, index=df.index, dtype=object)
+        df = df.drop(columns=type_column)
+    return df
+
+
+def _read_columnar(path, columns=None):
+    if path.suffix in ('.parquet', '.feather'):
+        mixed = mixed_type_columns(path)
+        read = columns
+        if columns is not None:
+            read = list(columns) + [MIXED_TYPE_PREFIX + c for c in mixed if c in columns]
+        reader = pd.read_parquet if path.suffix == '.parquet' else pd.read_feather
+        return _restore_mixed(reader(path, columns=read), mixed)
+    return pd.read_csv(path, usecols=columns, low_memory=False)
+
+
+def dataset_header(path):
+    """Column names of a columnar dataset without reading its rows"""
+    path = Path(path)
+    if path.suffix in ('.parquet', '.feather'):
+        hidden = {MIXED_TYPE_PREFIX + c for c in mixed_type_columns(path)}
+        return [name for name in _arrow_schema(path).names if name not in hidden]
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_dataset_columns(path, specs):
+    """Like workbook_cache.read_columns, for any dataset format"""
+    path = preferred_copy(path)
+    if path.suffix == '.xlsx':
+        return read_columns(path, specs)
+    header = dataset_header(path)
+    positions = resolve_columns(header, specs, path.name)
+    df = read_dataset(path, columns=list(dict.fromkeys(header[i] for i in positions)))
+    df = df[[header[i] for i in positions]]
+    df.columns = [spec[0] if isinstance(spec, tuple) else spec for spec in specs]
+    return df
+
+
+def _mixed_type_columns(df):
+    """Object columns holding more than one Python type (e.g. int and str codes)"""
+    mixed = []
+    for column in df.columns[df.dtypes == object]:
+        types = {type(value) for value in df[column].dropna()}
+        if len(types) > 1:
+            mixed.append(column)
+    return mixed
+
+
+def _type_name(value):
+    if isinstance(value, str) or pd.isna(value):
+        return None
+    return type(value).__name__
+
+
+def _write_columnar(df, path, writer):
+    try:
+        writer(pyarrow.Table.from_pandas(df, preserve_index=False), path)
+    except (TypeError, ValueError, pyarrow.lib.ArrowException):
+        # Arrow needs one type per column; store mixed code columns as text
+        # with each value's type alongside (see the module docstring)
+        mixed = _mixed_type_columns(df)
+        if not mixed:
+            raise
+        df = df.copy()
+        for column in mixed:
+            types = df[column].map(_type_name)
+            unknown = set(types.dropna()) - set(RESTORE_TYPES)
+            if unknown:
+                raise TypeError(f"Column '{column}' mixes types that cannot be stored: {sorted(unknown)}")
+            df[MIXED_TYPE_PREFIX + column] = types
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        table = pyarrow.Table.from_pandas(df, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[MIXED_TYPES_KEY] = json.dumps(mixed).encode('utf-8')
+        writer(table.replace_schema_metadata(metadata), path)
+
+
+def write_dataset(df, output_path, output_format=None, remove_stale=True):
+    """
+    Write a frame in the format given (or implied by the suffix), atomically.
+
+    With remove_stale, other columnar copies of the dataset are removed so
+    readers never prefer a stale one; an existing Excel copy is left in place.
+    """
+    output_path = Path(output_path)
+    output_format = output_format or output_path.suffix.lstrip('.')
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format in ('parquet', 'feather') and not HAVE_PYARROW:
+        raise RuntimeError(f"{output_format} output requires pyarrow (pip install pyarrow)")
+
+    tmp_path = output_path.with_name(f"{output_path.name}.{os.getpid()}.tmp")
+    if output_format == 'parquet':
+        _write_columnar(df, tmp_path, pq.write_table)
+    elif output_format == 'feather':
+        _write_columnar(df.reset_index(drop=True), tmp_path, feather.write_feather)
+    elif output_format == 'csv':
+        df.to_csv(tmp_path, index=False)
+    else:
+        df.to_excel(tmp_path, index=False, engine='openpyxl')
+    os.replace(tmp_path, output_path)
+
+    for suffix in COLUMNAR_SUFFIXES if remove_stale else ():
+        sibling = output_path.with_suffix(suffix)
+        if sibling != output_path and sibling.exists():
+            sibling.unlink()
+    return output_path
+
+
+class BackgroundExcelWriter:
+    """
+    Writes Excel copies of datasets on a single worker thread.
+
+    At most max_pending frames are held at once; submitting beyond that
+    waits for the oldest copy to finish. Failures are collected in errors
+    ({path: message}) rather than raised, since the primary copy is already
+    on disk. Call close() before reporting.
+    """
+
+    def __init__(self, max_pending=2):
+        self.max_pending = max_pending
+        self.errors = {}
+        self.written = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="excel-copy")
+        self._pending = []
+
+    def _reap(self, block):
+        while self._pending and (block or self._pending[0][1].done()):
+            path, future = self._pending.pop(0)
+            try:
+                future.result()
+                self.written.append(path)
+            except Exception as e:
+                self.errors[str(path)] = f"{type(e).__name__}: {e}"
+            block = False
+
+    def submit(self, df, xlsx_path):
+        """Queue df to be written to xlsx_path"""
+        self._reap(block=False)
+        while len(self._pending) >= self.max_pending:
+            self._reap(block=True)
+        future = self._executor.submit(write_dataset, df, xlsx_path, 'xlsx', False)
+        self._pending.append((Path(xlsx_path), future))
+
+    def copy(self, dataset_path):
+        """Queue an Excel copy of a columnar dataset unless an up-to-date one exists"""
+        dataset_path = Path(dataset_path)
+        xlsx_path = dataset_path.with_suffix('.xlsx')
+        if dataset_path.suffix == '.xlsx' or not dataset_path.exists():
+            return
+        if xlsx_path.exists() and xlsx_path.stat().st_mtime_ns >= dataset_path.stat().st_mtime_ns:
+            return
+        self.submit(read_dataset(dataset_path), xlsx_path)
+
+    def close(self):
+        """Wait for every queued copy; returns the errors dict"""
+        while self._pending:
+            self._reap(block=True)
+        self._executor.shutdown(wait=True)
+        return self.errors
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+dwc - one command line for the DWC Records scripts
+
+Each subcommand runs an existing script's main() with the remaining
+arguments, so `dwc migrate --dedupe` is `analyze_for_migration.py --dedupe`.
+Only the chosen script is imported: `dwc --help` and `dwc daemon status`
+never load pandas.
+
+Warm-cache daemon: `dwc daemon start` keeps one process running with the
+scripts imported and a memory_cache.FrameCache installed, so parsed frames
+and per-file derived rows stay in memory between commands (least recently
+used evicted beyond --memory-mb, anything whose source file changed rebuilt).
+While it runs, dwc sends commands to it - run in the caller's working
+directory, output streamed back - instead of starting a new interpreter;
+--no-daemon (or DWC_NO_DAEMON=1) runs a command locally anyway. The daemon
+listens on 127.0.0.1 only and requires the token it writes to DAEMON_FILE.
+Commands run one at a time.
+
+Usage:
+    python DWC_Records/dwc.py --help
+    python DWC_Records/dwc.py migrate --dedupe
+    python DWC_Records/dwc.py split report.xlsx --by-date "Service Date"
+    python DWC_Records/dwc.py daemon start --memory-mb 4096 &
+    python DWC_Records/dwc.py daemon status
+    python DWC_Records/dwc.py daemon stop
+"""
+from pathlib import Path
+from contextlib import redirect_stdout, redirect_stderr
+import argparse
+import importlib
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+
+DWC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DWC_DIR.parent))
+sys.path.insert(0, str(DWC_DIR / "Utilities"))
+
+DAEMON_FILE = Path(os.environ.get("DWC_DAEMON_FILE", DWC_DIR / ".cache" / "daemon.json"))
+DEFAULT_DAEMON_PORT = 8767
+DEFAULT_MEMORY_MB = 2048
+SWEEP_SECONDS = 2.0
+CONNECT_TIMEOUT = 2.0
+STREAM_FLUSH_BYTES = 8192
+
+# Subcommand -> (module with a main(), help)
+COMMANDS = {
+    'extract': ('extract_procedures', "procedure code and procedure list reports"),
+    'analyze': ('analyze_excel', "column structure of report workbooks"),
+    'normalize': ('normalize_categories', "normalize categories into the output directory"),
+    'migrate': ('analyze_for_migration', "build SQUARE_MIGRATION_MAPPING.xlsx"),
+    'split': ('split_excel', "split a large export into part files"),
+    'scan': ('corpus_scanner', "all analysis reports in one pass over the corpus"),
+    'query': ('corpus_query', "date-pruned queries over the corpus"),
+    'prices': ('price_history', "per-code, per-year price statistics"),
+    'visits': ('visit_payments', "link payments to visits, patient timelines"),
+    'dedupe': ('row_dedup', "rows repeated across overlapping exports"),
+    'diff': ('workbook_diff', "verify what changed between Original and Normalized"),
+    'fuzzy': ('fuzzy_codes', "near-duplicate procedure codes"),
+    'memory': ('frame_loader', "memory saved by the compact column schema"),
+    'warehouse': ('warehouse', "SQLite warehouse of the corpus"),
+    'serve': ('catalog_service', "procedure catalog lookup service"),
+    'export': ('square_export', "upload the mapping to the Square catalog"),
+}
+
+# Long-running servers would hold the daemon forever
+LOCAL_ONLY = {'serve'}
+
+
+def run_command(name, args):
+    """Run a subcommand's main() in this process; returns its exit status"""
+    module = importlib.import_module(COMMANDS[name][0])
+    saved_argv = sys.argv
+    sys.argv = [f"dwc {name}"] + list(args)
+    try:
+        module.main()
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    finally:
+        sys.argv = saved_argv
+
+
+class _SocketStream:
+    """File-like stdout/stderr that forwards text to a daemon client as JSON lines"""
+
+    def __init__(self, wfile, stream):
+        self.wfile = wfile
+        self.stream = stream
+        self.buffer = []
+        self.size = 0
+        self.encoding = 'utf-8'
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if '\n' in text or self.size >= STREAM_FLUSH_BYTES:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        if self.buffer:
+            text, self.buffer, self.size = ''.join(self.buffer), [], 0
+            self.wfile.write((json.dumps({self.stream: text}) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+    def isatty(self):
+        return False
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, JSON lines out: {'out'|'err': text}... then {'exit': n} or {'status': {...}}"""
+
+    def send(self, message):
+        self.wfile.write((json.dumps(message) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline() or b'{}')
+        except ValueError:
+            return
+        server = self.server
+        if not secrets.compare_digest(str(request.get('token', '')), server.token):
+            self.send({'err': "dwc daemon: bad token\n"})
+            self.send({'exit': 1})
+            return
+
+        op = request.get('op', 'run')
+        if op == 'status':
+            self.send({'status': server.status()})
+        elif op == 'clear':
+            self.send({'status': dict(server.status(), cleared=server.cache.clear())})
+        elif op == 'stop':
+            self.send({'status': server.status()})
+            threading.Thread(target=server.shutdown, daemon=True).start()
+        elif request.get('command') in COMMANDS:
+            self.run(request)
+        else:
+            self.send({'err': f"dwc daemon: unknown request {op!r}\n"})
+            self.send({'exit': 2})
+
+    def run(self, request):
+        server = self.server
+        out, err = _SocketStream(self.wfile, 'out'), _SocketStream(self.wfile, 'err')
+        saved_cwd = os.getcwd()
+        start = time.perf_counter()
+        try:
+            os.chdir(request.get('cwd') or saved_cwd)
+            with redirect_stdout(out), redirect_stderr(err):
+                try:
+                    status = run_command(request['command'], request.get('args', []))
+                except Exception:
+                    traceback.print_exc()
+                    status = 1
+            out.flush()
+            err.flush()
+            self.send({'exit': status})
+        except OSError:
+            pass  # client went away
+        finally:
+            os.chdir(saved_cwd)
+            server.commands += 1
+            server.last_command = f"{request['command']} ({time.perf_counter() - start:.2f}s)"
+
+
+class DaemonServer(socketserver.TCPServer):
+    """Single-threaded: commands share cwd, sys.argv and stdout, so they run one at a time"""
+    allow_reuse_address = True
+
+    def __init__(self, port, cache):
+        super().__init__(("127.0.0.1", port), DaemonRequestHandler)
+        self.cache = cache
+        self.token = secrets.token_hex(16)
+        self.started = time.time()
+        self.commands = 0
+        self.last_command = None
+
+    def status(self):
+        loaded = sorted(name for name, (module, _) in COMMANDS.items() if module in sys.modules)
+        return {
+            'pid': os.getpid(),
+            'port': self.server_address[1],
+            'uptime_seconds': round(time.time() - self.started),
+            'commands': self.commands,
+            'last_command': self.last_command,
+            'loaded': loaded,
+            'cache': self.cache.stats(),
+        }
+
+
+def serve_daemon(port=DEFAULT_DAEMON_PORT, memory_mb=DEFAULT_MEMORY_MB):
+    """Run the warm-cache daemon in the foreground until `dwc daemon stop`"""
+    from memory_cache import FrameCache, install
+
+    cache = install(FrameCache(memory_mb))
+    server = DaemonServer(port, cache)
+    DAEMON_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = DAEMON_FILE.with_name(f"{DAEMON_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'port': server.server_address[1], 'token': server.token, 'pid': os.getpid()}, f)
+    os.replace(tmp_path, DAEMON_FILE)
+
+    stop = threading.Event()
+
+    def sweep():
+        # Frees memory held for changed files; reads re-check the files anyway
+        while not stop.wait(SWEEP_SECONDS):
+            cache.sweep()
+    threading.Thread(target=sweep, name="dwc-cache-sweep", daemon=True).start()
+
+    print(f"dwc daemon listening on 127.0.0.1:{server.server_address[1]} "
+          f"(pid {os.getpid()}, {memory_mb:g} MB cache)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        try:
+            if json.loads(DAEMON_FILE.read_text(encoding='utf-8')).get('pid') == os.getpid():
+                DAEMON_FILE.unlink()
+        except (OSError, ValueError):
+            pass
+        print("dwc daemon stopped")
+
+
+def daemon_info():
+    """{'port', 'token', 'pid'} of the running daemon, or None"""
+    try:
+        return json.loads(DAEMON_FILE.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def call_daemon(info, request):
+    """Send a request; streams command output to stdout/stderr and returns the final message"""
+    with socket.create_connection(("127.0.0.1", info['port']), timeout=CONNECT_TIMEOUT) as sock:
+        sock.settimeout(None)
+        sock.sendall((json.dumps(dict(request, token=info['token'])) + '\n').encode('utf-8'))
+        with sock.makefile('r', encoding='utf-8') as f:
+            for line in f:
+                message = json.loads(line)
+                if 'out' in message:
+                    sys.stdout.write(message['out'])
+                    sys.stdout.flush()
+                elif 'err' in message:
+                    sys.stderr.write(message['err'])
+                    sys.stderr.flush()
+                else:
+                    return message
+    raise ConnectionError("dwc daemon closed the connection")
+
+
+def print_status(status):
+    cache = status['cache']
+    print(f"dwc daemon pid {status['pid']} on 127.0.0.1:{status['port']}, up {status['uptime_seconds']}s")
+    print(f"  Commands run: {status['commands']}" +
+          (f" (last: {status['last_command']})" if status['last_command'] else ""))
+    print(f"  Loaded: {', '.join(status['loaded']) or 'nothing yet'}")
+    print(f"  Cache: {cache['entries']} entries, {cache['mb']} / {cache['budget_mb']} MB, "
+          f"{cache['hits']} hits, {cache['misses']} misses, {cache['evictions']} evicted, "
+          f"{cache['invalidations']} invalidated")
+
+
+def daemon_main(args):
+    parser = argparse.ArgumentParser(prog="dwc daemon", description="Warm-cache daemon for dwc commands")
+    parser.add_argument("action", choices=["start", "status", "stop", "clear"])
+    parser.add_argument("--port", type=int, default=DEFAULT_DAEMON_PORT, help="with start (0: any free port)")
+    parser.add_argument("--memory-mb", type=float, default=DEFAULT_MEMORY_MB,
+                        help="with start: memory for cached frames before LRU eviction")
+    args = parser.parse_args(args)
+
+    if args.action == "start":
+        serve_daemon(args.port, args.memory_mb)
+        return 0
+    info = daemon_info()
+    try:
+        if info is None:
+            raise ConnectionRefusedError
+        reply = call_daemon(info, {'op': args.action})
+    except OSError:
+        print("✗ No dwc daemon running (start one with: dwc daemon start)")
+        return 1
+    if 'status' not in reply:
+        return reply.get('exit', 1)
+    print_status(reply['status'])
+    if args.action == "clear":
+        print(f"✓ Cleared {reply['status']['cleared']} cached entries")
+    elif args.action == "stop":
+        print("✓ Stopping")
+    return 0
+
+
+def main():
+    argv = sys.argv[1:]
+    # Options before the subcommand are dwc's own; everything after goes to the script
+    split = next((i for i, arg in enumerate(argv) if not arg.startswith('-')), len(argv))
+    commands = '\n'.join(f"  {name:10} {help}" for name, (_, help) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="dwc", description="DWC Records command line",
+        epilog=f"commands:\n{commands}\n  {'daemon':10} start|status|stop|clear the warm-cache daemon\n\n"
+               f"`dwc <command> --help` shows a command's own options.",
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-daemon", action="store_true", help="run locally even when a daemon is running")
+    options = parser.parse_args(argv[:split])
+    if split == len(argv):
+        parser.print_help()
+        return 2
+    command, args = argv[split], argv[split + 1:]
+
+    if command == 'daemon':
+        return daemon_main(args)
+    if command not in COMMANDS:
+        parser.error(f"unknown command '{command}' (choose from {', '.join(COMMANDS)}, daemon)")
+
+    use_daemon = not (options.no_daemon or command in LOCAL_ONLY or
+                      os.environ.get("DWC_NO_DAEMON", "") in ("1", "true", "yes"))
+    info = daemon_info() if use_daemon else None
+    if info is not None:
+        try:
+            reply = call_daemon(info, {'command': command, 'args': args, 'cwd': os.getcwd()})
+            return reply.get('exit', 1)
+        except (ConnectionRefusedError, socket.timeout):
+            pass  # stale DAEMON_FILE: the daemon is gone, run locally
+    return run_command(command, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
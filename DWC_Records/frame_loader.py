@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory frames for the DWC reports
+
+Gender, Tran Type, Provider, Procedure and the other category columns hold a
+handful to a few hundred distinct values, but are loaded as one Python string
+object per cell. load_frame / iter_frames apply COLUMN_SCHEMA after the read:
+    category  text becomes a pandas categorical (left alone when most values
+              are distinct, where a categorical would be larger)
+    numeric   whole numbers become int32 (int64 when they do not fit) - never
+              narrower, so arithmetic on amounts and account numbers cannot
+              wrap around; floats become float32 only when every value
+              survives the round trip (37.5 does, 12.99 does not), so amounts
+              never change
+
+With a memory budget, iter_frames estimates a file's loaded size from a sample
+of rows and, when it would not fit, yields the file in chunks sized to half
+the budget instead of loading it whole. Callers must then aggregate frame by
+frame, as corpus_scanner.py's aggregators and warehouse.py's loader do.
+Every chunk gets the dtypes a whole-file read would give (see _xlsx_chunks).
+
+Usage (memory report only, nothing is written):
+    python DWC_Records/frame_loader.py DWC_Records/02_Normalized
+    python DWC_Records/frame_loader.py DWC_Records/01_Original --memory-budget 256
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import argparse
+import pickle
+import tempfile
+from pandas.io.parsers import TextParser
+from openpyxl import load_workbook
+from dataset_io import list_datasets, read_dataset, preferred_copy, mixed_type_columns
+from workbook_cache import fresh_entry, cache_enabled
+
+try:
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+COLUMN_SCHEMA = {
+    # Patient Research
+    'Gender': 'category',
+    'Procedure': 'category',
+    'Provider': 'category',
+    'Location': 'category',
+    'City': 'category',
+    'State': 'category',
+    'Age': 'numeric',
+    'Amount': 'numeric',
+    # Payment Distribution
+    'Procedure Code': 'category',
+    'Type': 'category',
+    'Tran Type': 'category',
+    'Carrier Name': 'category',
+    'Charge': 'numeric',
+    'Applied': 'numeric',
+    # Both
+    'Account Number': 'numeric',
+}
+
+# A categorical only pays off when values repeat
+MAX_CATEGORY_RATIO = 0.5
+SAMPLE_ROWS = 2000
+MIN_CHUNK_ROWS = 1000
+MB = 1024 * 1024
+# Narrower integers overflow silently in element-wise arithmetic (int8 100 + 100 = -56)
+MIN_INT_DTYPE = np.int32
+# Text the parsers treat specially (missing values, booleans); any other
+# text counts as numeric or not when inferring a column's dtype
+SPECIAL_TEXT = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+    'True', 'TRUE', 'true', 'False', 'FALSE', 'false',
+])
+
+
+class MemoryReport:
+    """Bytes per column before and after compaction, summed over frames"""
+
+    def __init__(self):
+        self.columns = {}
+        self.frames = 0
+        self.rows = 0
+        self.chunked = []
+
+    def add_frame(self, before, after, rows):
+        self.frames += 1
+        self.rows += rows
+        for column in before.index:
+            totals = self.columns.setdefault(column, [0, 0])
+            totals[0] += int(before[column])
+            totals[1] += int(after[column])
+
+    @property
+    def before_mb(self):
+        return sum(b for b, _ in self.columns.values()) / MB
+
+    @property
+    def after_mb(self):
+        return sum(a for _, a in self.columns.values()) / MB
+
+    def summary_lines(self, top=5):
+        if not self.columns:
+            return ["📊 Memory: nothing loaded"]
+        saved = self.before_mb - self.after_mb
+        percent = 100 * saved / self.before_mb if self.before_mb else 0
+        lines = [f"📊 Memory: {self.before_mb:.1f} MB as loaded -> {self.after_mb:.1f} MB compacted "
+                 f"({saved:.1f} MB, {percent:.0f}% saved; {self.rows} rows)"]
+        biggest = sorted(self.columns.items(), key=lambda item: item[1][1] - item[1][0])[:top]
+        for column, (before, after) in biggest:
+            if after < before:
+                lines.append(f"  {column:20} {before / MB:8.1f} MB -> {after / MB:8.1f} MB")
+        if self.chunked:
+            lines.append(f"  Read in chunks (over the memory budget): {len(self.chunked)} files")
+        return lines
+
+    def print_summary(self, top=5):
+        for line in self.summary_lines(top):
+            print(line)
+
+
+def _to_int(series):
+    """Integers as MIN_INT_DTYPE when they fit, else int64"""
+    limits = np.iinfo(MIN_INT_DTYPE)
+    if not len(series) or (series.min() >= limits.min and series.max() <= limits.max):
+        return series.astype(MIN_INT_DTYPE)
+    return series.astype(np.int64)
+
+
+def _downcast(series):
+    """Narrowest safe numeric dtype that holds every value exactly, else the series unchanged"""
+    if series.dtype.kind in 'iu':
+        return _to_int(series) if series.dtype.itemsize > np.dtype(MIN_INT_DTYPE).itemsize else series
+    if series.dtype.kind != 'f' or series.dtype == np.float32:
+        return series
+    values = series.to_numpy()
+    finite = values[~np.isnan(values)]
+    if len(finite) == len(values) and np.array_equal(finite, np.round(finite)) and len(finite):
+        if finite.min() >= np.iinfo(np.int64).min and finite.max() <= np.iinfo(np.int64).max:
+            return _to_int(series.astype(np.int64))
+    narrowed = series.astype(np.float32)
+    if np.array_equal(narrowed.to_numpy(dtype=np.float64), values, equal_nan=True):
+        return narrowed
+    return series
+
+
+def compact_frame(df, schema=None, report=None):
+    """Apply the column schema to a frame; columns it does not name are untouched"""
+    schema = COLUMN_SCHEMA if schema is None else schema
+    before = df.memory_usage(deep=True, index=False)
+    df = df.copy()
+    for column in df.columns:
+        kind = schema.get(column)
+        series = df[column]
+        if kind == 'category' and not isinstance(series.dtype, pd.CategoricalDtype):
+            present = series.count()
+            if present and series.nunique() <= present * MAX_CATEGORY_RATIO:
+                df[column] = series.astype('category')
+        elif kind == 'numeric':
+            df[column] = _downcast(series)
+    if report is not None:
+        report.add_frame(before, df.memory_usage(deep=True, index=False), len(df))
+    return df
+
+
+def count_rows(path):
+    """Data rows in a dataset, read from metadata where the format has it"""
+    path = preferred_copy(path)
+    if path.suffix == '.parquet':
+        return pq.ParquetFile(path).metadata.num_rows
+    if path.suffix == '.feather':
+        return feather.read_table(path, memory_map=True).num_rows
+    if path.suffix == '.csv':
+        with open(path, 'rb') as f:
+            return max(sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(MB), b'')) - 1, 0)
+    entry = fresh_entry(path) if cache_enabled() else None
+    if entry is not None and entry.suffix == '.parquet':
+        return pq.ParquetFile(entry).metadata.num_rows
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        if sheet.max_row:
+            return max(sheet.max_row - 1, 0)
+        return max(sum(1 for _ in sheet.iter_rows(values_only=True)) - 1, 0)
+    finally:
+        workbook.close()
+
+
+def _read_sample(path, columns=None, rows=SAMPLE_ROWS):
+    path = preferred_copy(path)
+    if path.suffix == '.csv':
+        return pd.read_csv(path, usecols=columns, nrows=rows, low_memory=False)
+    if path.suffix == '.xlsx':
+        entry = fresh_entry(path) if cache_enabled() else None
+        if entry is None or entry.suffix != '.parquet':
+            return pd.read_excel(path, usecols=columns, nrows=rows)
+        path = entry
+    if path.suffix == '.parquet' and not mixed_type_columns(path):
+        batch = next(pq.ParquetFile(path).iter_batches(batch_size=rows, columns=columns), None)
+        return batch.to_pandas() if batch is not None else pd.DataFrame(columns=columns)
+    return read_dataset(path, columns).head(rows)
+
+
+def estimate_memory(path, columns=None):
+    """(rows, bytes per row) of a dataset once loaded, from a sample of its rows"""
+    sample = _read_sample(path, columns)
+    if not len(sample):
+        return 0, 0.0
+    return count_rows(path), sample.memory_usage(deep=True, index=False).sum() / len(sample)
+
+
+def _value_kind(value):
+    """Class of a raw cell value for dtype inference: values of one kind infer alike"""
+    if isinstance(value, str):
+        text = value.strip()
+        if value in SPECIAL_TEXT or text in SPECIAL_TEXT:
+            return str, value
+        for parse in (int, float):
+            try:
+                parse(text)
+                return str, parse.__name__
+            except ValueError:
+                pass
+        return str, 'text'
+    if isinstance(value, bool) or value is None:
+        return type(value), None
+    if isinstance(value, int):
+        return int, -2 ** 63 <= value < 2 ** 63
+    if isinstance(value, float):
+        return float, value.is_integer() if value == value else None
+    return type(value), None
+
+
+class ColumnTypes:
+    """
+    The dtypes a whole-file parse gives each column, found from one example
+    per kind of value rather than from every row
+    """
+
+    def __init__(self, width):
+        self.examples = [{} for _ in range(width)]
+
+    def add(self, rows):
+        for row in rows:
+            for examples, value in zip(self.examples, row):
+                examples.setdefault(_value_kind(value), value)
+
+    def dtypes(self):
+        return [TextParser([[value, 0] for value in examples.values()] or [[None, 0]],
+                           header=None).read()[0].dtype
+                for examples in self.examples]
+
+
+def _is_text(dtype):
+    return dtype == object or isinstance(dtype, pd.StringDtype)
+
+
+def _conform(df, dtypes):
+    """Cast a chunk's columns (text ones parsed as object) to the whole-file dtypes"""
+    for position, dtype in enumerate(dtypes):
+        series = df.iloc[:, position]
+        if dtype == object:
+            df.isetitem(position, series.astype(object).where(series.notna(), np.nan))
+        elif series.dtype != dtype:
+            df.isetitem(position, series.astype(dtype))
+    return df
+
+
+def _xlsx_chunks(path, columns, chunk_rows):
+    """
+    Stream a workbook's first sheet in frames of chunk_rows without parsing it
+    whole, with the values and dtypes of a whole-file read_excel.
+
+    Parsed chunk by chunk, a column's dtype would depend on which rows land in
+    the chunk (codes 99213 and blanks -> float64 99213.0, but object where an
+    'A1' is in the same chunk). So a first pass spools the rows to a
+    temporary file while collecting each column's kinds of values, and the
+    second parses every chunk with the dtypes those give for the whole file.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    with tempfile.TemporaryFile(prefix="dwc_chunks_") as spool:
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = list(next(rows, ()))
+            keep = [i for i, name in enumerate(header) if columns is None or name in columns]
+            names = [header[i] for i in keep]
+            types = ColumnTypes(len(keep))
+
+            batch = []
+            for row in rows:
+                batch.append([row[i] if i < len(row) else None for i in keep])
+                if len(batch) >= chunk_rows:
+                    types.add(batch)
+                    pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                    batch = []
+            if batch:
+                types.add(batch)
+                pickle.dump(batch, spool, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            workbook.close()
+
+        dtypes = types.dtypes()
+        # The parser's names for the columns (duplicates become 'Name.1')
+        parsed_names = TextParser([names], header=0).read().columns
+        as_text = {name: object for name, dtype in zip(parsed_names, dtypes) if _is_text(dtype)}
+        spool.seek(0)
+        while True:
+            try:
+                batch = pickle.load(spool)
+            except EOFError:
+                return
+            yield _conform(TextParser([names] + batch, header=0, dtype=as_text).read(), dtypes)
+
+
+def _csv_chunks(path, columns, chunk_rows):
+    """A CSV file in frames of chunk_rows with the dtypes of a whole-file read_csv (see _xlsx_chunks)"""
+    types = None
+    for raw in pd.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=object, na_filter=False):
+        types = types or ColumnTypes(raw.shape[1])
+        types.add(raw.itertuples(index=False))
+    if types is None:
+        return
+    dtypes = types.dtypes()
+    header = list(pd.read_csv(path, usecols=columns, nrows=0).columns)
+    as_text = {name: object for name, dtype in zip(header, dtypes) if _is_text(dtype)}
+    for df in pd.read_csv(path, usecols=columns, chunksize=chunk_rows, dtype=as_text, low_memory=False):
+        yield _conform(df, dtypes)
+
+
+def iter_chunks(path, columns=None, chunk_rows=100000):
+    """A dataset as consecutive frames of at most chunk_rows rows"""
+    path = preferred_copy(path)
+    if path.suffix == '.xlsx':
+        entry = fresh_entry(path) if cache_enabled() else None
+        if entry is None or entry.suffix != '.parquet':
+            yield from _xlsx_chunks(path, columns, chunk_rows)
+            return
+        path = entry
+    # Mixed-type columns are rebuilt by read_dataset, which reads the whole file
+    if path.suffix == '.parquet' and not mixed_type_columns(path):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    elif path.suffix == '.csv':
+        yield from _csv_chunks(path, columns, chunk_rows)
+    else:
+        df = read_dataset(path, columns)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def iter_frames(path, columns=None, memory_budget_mb=None, compact=True, report=None):
+    """
+    Yield a dataset as compacted frames: the whole file, or chunks when its
+    estimated loaded size exceeds memory_budget_mb.
+    """
+    frames = None
+    if memory_budget_mb:
+        rows, row_bytes = estimate_memory(path, columns)
+        if rows * row_bytes > memory_budget_mb * MB:
+            # Half the budget per chunk leaves room for the caller's own copies
+            chunk_rows = max(int(memory_budget_mb * MB / 2 / row_bytes), MIN_CHUNK_ROWS)
+            frames = iter_chunks(path, columns, chunk_rows)
+            if report is not None:
+                report.chunked.append(Path(path).name)
+    if frames is None:
+        frames = [read_dataset(path, columns)]
+    for df in frames:
+        yield compact_frame(df, report=report) if compact else df
+
+
+def load_frame(path, columns=None, report=None):
+    """read_dataset with the column schema applied"""
+    return compact_frame(read_dataset(path, columns), report=report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report how much memory the compact column schema saves")
+    parser.add_argument("roots", nargs="+", help="files or directories of datasets")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="read files estimated above this size in chunks")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("DWC FRAME MEMORY REPORT")
+    print("=" * 80)
+    total = MemoryReport()
+    for root in args.roots:
+        root = Path(root)
+        for path in ([root] if root.is_file() else list_datasets(root)):
+            report = MemoryReport()
+            for _ in iter_frames(path, memory_budget_mb=args.memory_budget, report=report):
+                pass
+            print(f"\n{path.name}")
+            for line in report.summary_lines(top=3):
+                print(f"  {line}")
+            for column, (before, after) in report.columns.items():
+                totals = total.columns.setdefault(column, [0, 0])
+                totals[0] += before
+                totals[1] += after
+            total.rows += report.rows
+            total.chunked.extend(report.chunked)
+
+    print("\n" + "=" * 80)
+    total.print_summary(top=8)
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Indexed fuzzy deduplication of procedure codes
+
+Finds spelling variants of the same procedure code (e.g. 'B-12' vs 'B12',
+'Cholest' vs 'Cholest.T') without comparing every pair of codes:
+1. Each code gets a compact key (lowercase, no whitespace/hyphens/dots), but
+   decimal points stay: '1.5 P 15' and '15 P 15' are different codes.
+2. Codes with identical keys are always candidates. A character trigram
+   index over the keys proposes the other pairs that share enough trigrams;
+   very common trigrams are skipped as stop-grams.
+3. Only candidates are scored (fuzz.ratio on keys, blended with the
+   description similarity when both codes have descriptions).
+
+Outputs:
+    Documentation/PROCEDURE_CODE_MERGE_CANDIDATES.csv - ranked pairs for review
+    procedure_code_canonical.json - variant -> canonical code, applied by the
+                                    canonical_codes step of normalization_rules.json
+
+Only pairs whose code score is at or above --auto-threshold (default 100,
+i.e. identical compact keys) go into the canonical mapping; everything else
+is a suggestion for manual review.
+
+Usage:
+    python DWC_Records/fuzzy_codes.py
+    python DWC_Records/fuzzy_codes.py --min-score 75 --auto-threshold 95
+"""
+import pandas as pd
+from pathlib import Path
+from collections import defaultdict, Counter
+from fuzzywuzzy import fuzz
+import argparse
+import json
+import math
+import re
+from dataset_io import list_datasets, read_dataset
+
+DWC_DIR = Path(__file__).resolve().parent
+CANONICAL_MAP_PATH = DWC_DIR / "procedure_code_canonical.json"
+CANDIDATES_PATH = DWC_DIR / "Documentation" / "PROCEDURE_CODE_MERGE_CANDIDATES.csv"
+
+NGRAM_SIZE = 3
+# Trigrams shared by more codes than this carry no blocking signal
+MAX_POSTING_SIZE = 1000
+CODE_WEIGHT = 0.7
+DESCRIPTION_WEIGHT = 0.3
+
+_canonical_cache = {}
+
+
+# Dropped from compact keys; a dot between two digits is a decimal point and stays
+SEPARATORS = re.compile(r'[\s\-_]+')
+NON_DECIMAL_DOTS = re.compile(r'(?<!\d)\.|\.(?!\d)')
+
+
+def compact_key(code):
+    """Lowercase a code and drop whitespace, hyphens, underscores and dots other than decimal points"""
+    return NON_DECIMAL_DOTS.sub('', SEPARATORS.sub('', str(code).lower()))
+
+
+def compact_keys(series):
+    """compact_key for a whole column at once; missing values become ''"""
+    text = series.astype(object).where(series.notna(), '').astype(str).str.lower()
+    text = text.str.replace(SEPARATORS.pattern, '', regex=True)
+    return text.str.replace(NON_DECIMAL_DOTS.pattern, '', regex=True)
+
+
+def ngrams(key, n=NGRAM_SIZE):
+    """Padded character n-grams of a key ('b12' -> {'##b', '#b1', 'b12', '12#', '2##'})"""
+    padded = '#' * (n - 1) + key + '#' * (n - 1)
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class CodeIndex:
+    """Exact-key buckets plus a trigram inverted index over compact code keys"""
+
+    def __init__(self, codes, max_posting_size=MAX_POSTING_SIZE):
+        self.codes = list(codes)
+        self.keys = [compact_key(c) for c in self.codes]
+        self.grams = [ngrams(k) for k in self.keys]
+        self.max_posting_size = max_posting_size
+        self.by_key = defaultdict(list)
+        self.postings = defaultdict(list)
+        for i, (key, grams) in enumerate(zip(self.keys, self.grams)):
+            self.by_key[key].append(i)
+            for gram in grams:
+                self.postings[gram].append(i)
+
+    def candidates(self, i, min_overlap=0.5):
+        """
+        Indices j > i with the same key, then those sharing at least
+        min_overlap of the smaller trigram set. Stop-grams are skipped, so
+        only the key bucket finds identical keys made of common trigrams.
+        """
+        same_key = [j for j in self.by_key[self.keys[i]] if j > i]
+        yield from same_key
+        same_key = set(same_key)
+        shared = Counter()
+        for gram in self.grams[i]:
+            posting = self.postings[gram]
+            if len(posting) > self.max_posting_size:
+                continue
+            for j in posting:
+                if j > i:
+                    shared[j] += 1
+        size_i = len(self.grams[i])
+        for j, count in shared.items():
+            needed = max(1, math.ceil(min_overlap * min(size_i, len(self.grams[j]))))
+            if count >= needed and j not in same_key:
+                yield j
+
+    def lookup(self, query, limit=5, min_overlap=0.3):
+        """Indices of the codes most similar to an arbitrary query string"""
+        query_key = compact_key(query)
+        query_grams = ngrams(query_key)
+        shared = Counter()
+        for gram in query_grams:
+            posting = self.postings.get(gram, ())
+            if len(posting) > self.max_posting_size:
+                continue
+            for j in posting:
+                shared[j] += 1
+        exact = self.by_key.get(query_key, ())
+        scored = [(100, j) for j in exact]
+        for j, count in shared.items():
+            if j in exact:
+                continue
+            if count >= max(1, math.ceil(min_overlap * min(len(query_grams), len(self.grams[j])))):
+                scored.append((fuzz.ratio(query_key, self.keys[j]), j))
+        scored.sort(key=lambda x: (-x[0], self.codes[x[1]]))
+        return scored[:limit]
+
+
+def score_pair(key_a, key_b, desc_a="", desc_b=""):
+    """Return (score, code_score, description_score or None) for two codes"""
+    code_score = 100 if key_a == key_b else fuzz.ratio(key_a, key_b)
+    if desc_a and desc_b:
+        desc_score = fuzz.token_set_ratio(desc_a, desc_b)
+        return round(CODE_WEIGHT * code_score + DESCRIPTION_WEIGHT * desc_score, 1), code_score, desc_score
+    return float(code_score), code_score, None
+
+
+def find_merge_candidates(code_stats, min_score=80, min_overlap=0.5):
+    """
+    Rank likely duplicate pairs.
+
+    code_stats maps code -> {'usage_count': int, 'description': str}.
+    Returns a DataFrame sorted by score (best first).
+    """
+    codes = sorted(code_stats)
+    index = CodeIndex(codes)
+    rows = []
+    for i, code_a in enumerate(codes):
+        for j in index.candidates(i, min_overlap):
+            code_b = codes[j]
+            score, code_score, desc_score = score_pair(
+                index.keys[i], index.keys[j],
+                code_stats[code_a].get('description', ''), code_stats[code_b].get('description', ''))
+            if score < min_score:
+                continue
+            rows.append({
+                'Code A': code_a,
+                'Code B': code_b,
+                'Score': score,
+                'Code Score': code_score,
+                'Description Score': desc_score,
+                'Usage A': code_stats[code_a].get('usage_count', 0),
+                'Usage B': code_stats[code_b].get('usage_count', 0),
+                'Suggested Canonical': pick_canonical([code_a, code_b], code_stats),
+            })
+    columns = ['Code A', 'Code B', 'Score', 'Code Score', 'Description Score',
+               'Usage A', 'Usage B', 'Suggested Canonical']
+    candidates = pd.DataFrame(rows, columns=columns)
+    if len(candidates):
+        candidates = candidates.sort_values(['Score', 'Usage A', 'Usage B'],
+                                            ascending=[False, False, False], kind='stable')
+        candidates.insert(0, 'Rank', range(1, len(candidates) + 1))
+    return candidates
+
+
+def pick_canonical(codes, code_stats):
+    """Most used code wins; ties go to the shorter, then alphabetically first"""
+    return min(codes, key=lambda c: (-code_stats[c].get('usage_count', 0), len(c), c))
+
+
+def build_canonical_mapping(candidates, code_stats, auto_threshold=100):
+    """Union pairs whose code score reaches auto_threshold; map each variant to its cluster's canonical code"""
+    parent = {}
+
+    def find(code):
+        parent.setdefault(code, code)
+        while parent[code] != code:
+            parent[code] = parent[parent[code]]
+            code = parent[code]
+        return code
+
+    for code_a, code_b, score in zip(candidates.get('Code A', []), candidates.get('Code B', []),
+                                     candidates.get('Code Score', [])):
+        if score >= auto_threshold:
+            parent[find(code_a)] = find(code_b)
+
+    clusters = defaultdict(list)
+    for code in parent:
+        clusters[find(code)].append(code)
+
+    mapping = {}
+    for members in clusters.values():
+        canonical = pick_canonical(members, code_stats)
+        for code in members:
+            if code != canonical:
+                mapping[code] = canonical
+    return dict(sorted(mapping.items()))
+
+
+def collect_code_stats(roots):
+    """Usage counts and most common description per code across Patient Research and Payment Distribution files"""
+    usage = Counter()
+    descriptions = defaultdict(Counter)
+    for root in roots:
+        for file_path in sorted(list_datasets(root)):
+            print(f"Reading: {file_path.name}")
+            try:
+                df = read_dataset(file_path)
+            except Exception as e:
+                print(f"  Error reading {file_path.name}: {e}")
+                continue
+            if 'Procedure' in df.columns and 'Description' in df.columns:
+                pairs = df[['Procedure', 'Description']].dropna(subset=['Procedure'])
+                pairs = pairs.astype(object).fillna('').astype(str).apply(lambda col: col.str.strip())
+                for (code, desc), count in pairs.value_counts().items():
+                    usage[code] += count
+                    if desc:
+                        descriptions[code][desc] += count
+            elif 'Procedure Code' in df.columns:
+                counts = df['Procedure Code'].dropna().astype(str).str.strip().value_counts()
+                for code, count in counts.items():
+                    usage[code] += count
+
+    return {
+        code: {
+            'usage_count': int(count),
+            'description': descriptions[code].most_common(1)[0][0] if descriptions[code] else '',
+        }
+        for code, count in usage.items() if code
+    }
+
+
+def load_canonical_mapping(path=CANONICAL_MAP_PATH):
+    """Return the variant -> canonical mapping (empty if none has been generated)"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    mtime_ns = path.stat().st_mtime_ns
+    cached = _canonical_cache.get(path)
+    if cached is None or cached[0] != mtime_ns:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = (mtime_ns, json.load(f).get('mapping', {}))
+        _canonical_cache[path] = cached
+    return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and map near-duplicate procedure codes")
+    parser.add_argument("--root", action="append",
+                        help="directory to scan (repeatable; default: 02_Normalized)")
+    parser.add_argument("--min-score", type=float, default=80,
+                        help="lowest score listed as a merge candidate (default: 80)")
+    parser.add_argument("--auto-threshold", type=float, default=100,
+                        help="score at which pairs go into the canonical mapping (default: 100)")
+    parser.add_argument("--candidates", default=str(CANDIDATES_PATH), help="output CSV of ranked candidates")
+    parser.add_argument("--mapping", default=str(CANONICAL_MAP_PATH), help="output canonical mapping JSON")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("PROCEDURE CODE FUZZY DEDUPLICATION")
+    print("=" * 80)
+
+    code_stats = collect_code_stats(args.root or [DWC_DIR / "02_Normalized"])
+    print(f"\nDistinct codes: {len(code_stats)}")
+
+    candidates = find_merge_candidates(code_stats, min_score=args.min_score)
+    candidates.to_csv(args.candidates, index=False)
+    print(f"Merge candidates (score >= {args.min_score:g}): {len(candidates)}")
+
+    mapping = build_canonical_mapping(candidates, code_stats, auto_threshold=args.auto_threshold)
+    with open(args.mapping, "w", encoding="utf-8") as f:
+        json.dump({'auto_threshold': args.auto_threshold, 'mapping': mapping}, f, indent=2, sort_keys=True)
+    print(f"Canonical mappings (score >= {args.auto_threshold:g}): {len(mapping)}")
+
+    for _, row in candidates.head(20).iterrows():
+        print(f"  {row['Score']:5.1f}  {row['Code A']:20} ~ {row['Code B']:20} -> {row['Suggested Canonical']}")
+
+    print(f"\n✅ Candidates saved to: {args.candidates}")
+    print(f"✅ Canonical mapping saved to: {args.mapping}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+In-process LRU cache of parsed frames and values derived from files
+
+The on-disk workbook cache (workbook_cache.py) saves the .xlsx parse, but
+every run still reads, compacts and indexes each file again. The dwc daemon
+(dwc.py daemon start) installs a FrameCache so repeated commands skip that
+too: while one is installed, the dataset readers (read_workbook,
+read_columns, read_dataset) serve an unchanged file from memory, and
+memoize() keeps derived values such as a file's procedure rows.
+
+Every entry records the size and mtime_ns of the files it was built from
+and is rebuilt as soon as one of them changes. Entries beyond the memory
+budget are evicted least recently used first.
+
+Without an installed cache - every normal script run - memoize() just calls
+its builder. Frames are handed out as shallow copies (copy-on-write in
+pandas 3), so a caller modifying its frame does not touch the cached one;
+other memoized values must not be modified by callers.
+"""
+from collections import OrderedDict
+from pathlib import Path
+import os
+import sys
+import threading
+
+DEFAULT_BUDGET_MB = 2048
+MB = 1024 * 1024
+
+_installed = None
+
+
+def file_signature(path):
+    """(resolved path, size, mtime_ns) of a file, or (path, None, None) when missing"""
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return str(path), None, None
+    return str(path.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def sizeof(value):
+    """Approximate memory held by a cached value"""
+    if hasattr(value, 'memory_usage'):  # DataFrame / Series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def _detach(value):
+    return value.copy(deep=False) if hasattr(value, 'memory_usage') else value
+
+
+class FrameCache:
+    """LRU of values keyed by name, each valid while its source files are unchanged"""
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget = int(budget_mb * MB)
+        self.entries = OrderedDict()  # key -> (signatures, value, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.RLock()
+
+    def _drop(self, key):
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def get_or_build(self, key, paths, build):
+        """The cached value for key if its files are unchanged, else build() (and cache it)"""
+        # Taken before the build: a file changing meanwhile shows up on the next access
+        signatures = tuple(file_signature(p) for p in paths)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] == signatures:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return _detach(entry[1])
+                self._drop(key)
+                self.invalidations += 1
+            self.misses += 1
+
+        value = build()
+        size = sizeof(value)
+        with self._lock:
+            if key in self.entries:
+                self._drop(key)
+            if size <= self.budget:
+                self.entries[key] = (signatures, value, size)
+                self.bytes += size
+                while self.bytes > self.budget:
+                    self._drop(next(iter(self.entries)))
+                    self.evictions += 1
+        return _detach(value)
+
+    def sweep(self):
+        """Drop entries whose files changed (frees their memory before the next access would)"""
+        with self._lock:
+            stale = [key for key, (signatures, _, _) in self.entries.items()
+                     if tuple(file_signature(s[0]) for s in signatures) != signatures]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            removed = len(self.entries)
+            self.entries.clear()
+            self.bytes = 0
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'mb': round(self.bytes / MB, 1),
+                'budget_mb': round(self.budget / MB, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+def install(cache):
+    """Make cache the one memoize() and the dataset readers use (None to remove it)"""
+    global _installed
+    _installed = cache
+    return cache
+
+
+def current():
+    return _installed
+
+
+def memoize(key, paths, build):
+    """build(), served from the installed FrameCache while the files in paths are unchanged"""
+    cache = _installed
+    if cache is None or os.environ.get("DWC_NO_CACHE", "") in ("1", "true", "yes"):
+        return build()
+    return cache.get_or_build(key, paths, build)
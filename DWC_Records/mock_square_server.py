@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Square Catalog API
+
+Implements just enough of Square's catalog endpoints for square_export.py
+to be tested offline, including its failure modes:
+    POST /v2/catalog/batch-upsert   Square's limits (1,000 objects per batch,
+                                    10,000 per request), idempotency keys,
+                                    '#' client ids -> ids, version checks
+    GET  /v2/catalog/list?types=ITEM,CATEGORY
+    GET  /health                    request and object counters
+
+Failures are injected per request: --fail-rate answers 500 without applying
+the batch, --throttle-rate answers 429 with Retry-After, and --lost-rate
+applies the batch but answers 503, as when a response is lost on the way
+back - a retry with the same idempotency key then gets the original
+response instead of a second copy of every object.
+
+Usage:
+    python DWC_Records/mock_square_server.py
+    python DWC_Records/mock_square_server.py --port 8766 --latency-ms 50 --fail-rate 0.1 --throttle-rate 0.1
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, timezone
+import argparse
+import copy
+import hashlib
+import json
+import random
+import threading
+import time
+
+DEFAULT_PORT = 8766
+MAX_BATCH_OBJECTS = 1000
+MAX_REQUEST_OBJECTS = 10000
+RETRY_AFTER_SECONDS = 0.1
+
+
+def square_error(code, detail, category='INVALID_REQUEST_ERROR'):
+    return {'errors': [{'category': category, 'code': code, 'detail': detail}]}
+
+
+class MockCatalog:
+    """In-memory catalog objects plus the idempotency-key response cache"""
+
+    def __init__(self, token=None, fail_rate=0.0, throttle_rate=0.0, lost_rate=0.0, latency_ms=0, seed=None):
+        self.token = token
+        self.fail_rate = fail_rate
+        self.throttle_rate = throttle_rate
+        self.lost_rate = lost_rate
+        self.latency = latency_ms / 1000
+        self.random = random.Random(seed)
+        self.objects = {}  # id -> CatalogObject
+        self.responses = {}  # idempotency key -> (body digest, response)
+        self.counters = {'requests': 0, 'upserted': 0, 'replayed': 0, 'failed': 0, 'throttled': 0, 'lost': 0}
+        self._next_id = 0
+        self._version = int(time.time() * 1000)
+        self._lock = threading.Lock()
+
+    def _new_id(self):
+        self._next_id += 1
+        return hashlib.sha1(f"mock-{self._next_id}".encode('utf-8')).hexdigest()[:24].upper()
+
+    def _next_version(self):
+        self._version += 1
+        return self._version
+
+    def _roll(self):
+        """Injected outcome for one request: None, 'fail', 'throttle' or 'lost'"""
+        r = self.random.random()
+        for outcome, rate in (('fail', self.fail_rate), ('throttle', self.throttle_rate), ('lost', self.lost_rate)):
+            if r < rate:
+                return outcome
+            r -= rate
+        return None
+
+    def _apply(self, batches):
+        """Validate and apply every batch (all or nothing); returns (status, response)"""
+        objects = [obj for batch in batches for obj in batch.get('objects', [])]
+        ids = {}
+        for obj in objects:
+            nested = obj.get('item_data', {}).get('variations', [])
+            for o in [obj] + nested:
+                if not o.get('id') or not o.get('type'):
+                    return 400, square_error('MISSING_REQUIRED_PARAMETER', 'every object needs a type and an id')
+                if o['id'].startswith('#'):
+                    ids.setdefault(o['id'], self._new_id())
+                elif o['id'] not in self.objects:
+                    return 404, square_error('NOT_FOUND', f"object {o['id']} does not exist")
+                elif o.get('version') is not None and o['version'] != self.objects[o['id']].get('version'):
+                    return 409, square_error('VERSION_MISMATCH', f"object {o['id']} has changed")
+
+        def resolve(value):
+            return ids.get(value, value)
+
+        now = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+        stored = []
+        for obj in copy.deepcopy(objects):
+            obj['id'] = resolve(obj['id'])
+            obj['version'] = self._next_version()
+            obj['updated_at'] = now
+            item_data = obj.get('item_data')
+            if item_data:
+                for category in item_data.get('categories', []):
+                    category['id'] = resolve(category['id'])
+                for variation in item_data.get('variations', []):
+                    variation['id'] = resolve(variation['id'])
+                    variation['version'] = obj['version']
+                    variation['item_variation_data']['item_id'] = obj['id']
+                    self.objects[variation['id']] = variation
+            self.objects[obj['id']] = obj
+            stored.append(obj)
+        self.counters['upserted'] += len(stored)
+        return 200, {
+            'objects': stored,
+            'id_mappings': [{'client_object_id': client, 'object_id': real} for client, real in ids.items()],
+            'updated_at': now,
+        }
+
+    def batch_upsert(self, request, raw_body):
+        """(status, response, extra headers) for one batch-upsert call"""
+        key = request.get('idempotency_key')
+        batches = request.get('batches')
+        if not key or not isinstance(batches, list):
+            return 400, square_error('MISSING_REQUIRED_PARAMETER', 'idempotency_key and batches are required'), {}
+        if any(len(batch.get('objects', [])) > MAX_BATCH_OBJECTS for batch in batches):
+            return 400, square_error('TOO_MANY_OBJECTS', f'at most {MAX_BATCH_OBJECTS} objects per batch'), {}
+        if sum(len(batch.get('objects', [])) for batch in batches) > MAX_REQUEST_OBJECTS:
+            return 400, square_error('TOO_MANY_OBJECTS', f'at most {MAX_REQUEST_OBJECTS} objects per request'), {}
+
+        digest = hashlib.sha256(raw_body).hexdigest()
+        with self._lock:
+            self.counters['requests'] += 1
+            outcome = self._roll()
+            if outcome == 'fail':
+                self.counters['failed'] += 1
+                return 500, square_error('INTERNAL_SERVER_ERROR', 'injected failure', 'API_ERROR'), {}
+            if outcome == 'throttle':
+                self.counters['throttled'] += 1
+                return 429, square_error('RATE_LIMITED', 'injected throttle', 'RATE_LIMIT_ERROR'), \
+                    {'Retry-After': str(RETRY_AFTER_SECONDS)}
+            if key in self.responses:
+                seen_digest, response = self.responses[key]
+                if seen_digest != digest:
+                    return 400, square_error('IDEMPOTENCY_KEY_REUSED',
+                                             'idempotency key was used with a different request'), {}
+                self.counters['replayed'] += 1
+                return 200, response, {}
+            status, response = self._apply(batches)
+            if status == 200:
+                self.responses[key] = (digest, response)
+            if outcome == 'lost' and status == 200:
+                self.counters['lost'] += 1
+                return 503, square_error('SERVICE_UNAVAILABLE', 'injected lost response', 'API_ERROR'), {}
+            return status, response, {}
+
+    def list_objects(self, types=None):
+        with self._lock:
+            return [obj for obj in self.objects.values() if not types or obj['type'] in types]
+
+
+class MockSquareRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MockSquare/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    catalog = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorized(self):
+        if self.catalog.token is None:
+            return True
+        if self.headers.get('Authorization') == f"Bearer {self.catalog.token}":
+            return True
+        self.send_json(square_error('UNAUTHORIZED', 'bad or missing access token', 'AUTHENTICATION_ERROR'), 401)
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self.send_json({'status': 'ok', 'objects': len(self.catalog.objects), **self.catalog.counters})
+            return
+        if not self.authorized():
+            return
+        if url.path == '/v2/catalog/list':
+            types = parse_qs(url.query).get('types', [''])[-1]
+            types = {t.strip().upper() for t in types.split(',') if t.strip()}
+            self.send_json({'objects': self.catalog.list_objects(types)})
+        else:
+            self.send_json(square_error('NOT_FOUND', 'unknown endpoint'), 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        raw_body = self.rfile.read(length)
+        if urlparse(self.path).path != '/v2/catalog/batch-upsert':
+            self.send_json(square_error('NOT_FOUND', 'unknown endpoint'), 404)
+            return
+        if not self.authorized():
+            return
+        try:
+            request = json.loads(raw_body or b'{}')
+        except ValueError:
+            self.send_json(square_error('INVALID_JSON', 'body must be JSON'), 400)
+            return
+        if self.catalog.latency:
+            time.sleep(self.catalog.latency)
+        status, response, headers = self.catalog.batch_upsert(request, raw_body)
+        self.send_json(response, status, headers)
+
+
+def make_server(host="127.0.0.1", port=DEFAULT_PORT, token=None, verbose=False, **failures):
+    """Build (but do not start) the mock server; failures go to MockCatalog"""
+    catalog = MockCatalog(token=token, **failures)
+    handler = type("BoundMockSquareRequestHandler", (MockSquareRequestHandler,),
+                   {'catalog': catalog, 'verbose': verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.catalog = catalog
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Square Catalog API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token", help="require this bearer token (default: accept any)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay before answering each upsert")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of upserts answered 500, not applied")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of upserts answered 429")
+    parser.add_argument("--lost-rate", type=float, default=0.0, help="share of upserts applied but answered 503")
+    parser.add_argument("--seed", type=int, help="seed for the injected failures")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("MOCK SQUARE CATALOG API")
+    print("=" * 80)
+    server = make_server(args.host, args.port, args.token, args.verbose,
+                         fail_rate=args.fail_rate, throttle_rate=args.throttle_rate, lost_rate=args.lost_rate,
+                         latency_ms=args.latency_ms, seed=args.seed)
+    print(f"Listening on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        counters = server.catalog.counters
+        print(f"\n📊 {counters['requests']} upserts, {counters['upserted']} objects, "
+              f"{counters['failed']} failed, {counters['throttled']} throttled, "
+              f"{counters['lost']} lost, {counters['replayed']} replayed")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Compiled normalization rules for normalize_categories.py
+
+The rules live in normalization_rules.json (or a .yaml file when PyYAML is
+installed): named groups of ordered steps, and per report type the column
+each group normalizes. Every step works on the text of a cell (str(value));
+missing values are never touched. Step types:
+    strip             trim surrounding whitespace
+    map               exact value map
+    map_ci            case-insensitive map; "otherwise": "capitalize"
+                      capitalizes the values it does not match
+    regex             ordered {"pattern", "replace"} rewrites
+    collapse_repeat   "A B A B" -> "A B" for values of at least min_words words
+    canonical_codes   fuzzy_codes.py's variant -> canonical code mapping
+
+A RuleSet compiles each group once into a plan that runs over a column's
+distinct values with vectorized string operations and reports how many rows
+each rule changed. load_rules() notices edits to the file and keeps compiled
+rule sets by content hash.
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import re
+from fuzzy_codes import load_canonical_mapping
+
+try:
+    import yaml
+    HAVE_YAML = True
+except ImportError:
+    HAVE_YAML = False
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent / "normalization_rules.json"
+# Label for non-text values (99213, 12.5) whose text no step changed: the
+# output cell is still text, so the row counts as changed
+COERCE_LABEL = "coerce: number/date stored as text"
+
+_rules_by_digest = {}
+_rules_by_path = {}
+
+
+class RuleError(ValueError):
+    """A rules file that cannot be compiled"""
+
+
+class Step(ABC):
+    """One compiled rule; apply() returns the new values and, per value, the label of the change or None"""
+    default_label = "rule"
+
+    def __init__(self, spec):
+        self.label = spec.get('label', self.default_label)
+
+    def _labelled(self, before, after, label=None):
+        labels = np.full(len(before), None, dtype=object)
+        changed = (before != after).to_numpy(dtype=bool)
+        labels[changed] = self.label if label is None else np.asarray(label, dtype=object)[changed]
+        return after, labels
+
+    @abstractmethod
+    def apply(self, values):
+        """(new values, labels) for a Series of cell texts"""
+
+
+class StripStep(Step):
+    default_label = "trimmed surrounding whitespace"
+
+    def apply(self, values):
+        return self._labelled(values, values.str.strip())
+
+
+class MapStep(Step):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.mapping = {str(k): str(v) for k, v in spec['map'].items()}
+
+    def apply(self, values):
+        after = values.map(self.mapping).fillna(values)
+        labels = values.map(lambda v: f"'{v}' → '{self.mapping.get(v)}'")
+        return self._labelled(values, after, labels)
+
+
+class CaseInsensitiveMapStep(Step):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.mapping = {}
+        self.keys = {}
+        for key, value in spec['map'].items():
+            # The first key wins when two differ only in case
+            self.keys.setdefault(str(key).lower(), str(key))
+            self.mapping.setdefault(str(key).lower(), str(value))
+        self.otherwise = spec.get('otherwise')
+        if self.otherwise not in (None, 'capitalize'):
+            raise RuleError(f"map_ci: unknown 'otherwise' value {self.otherwise!r}")
+
+    def apply(self, values):
+        lowered = values.str.lower()
+        mapped = lowered.map(self.mapping)
+        matched = mapped.notna()
+        fallback = values.str.capitalize() if self.otherwise == 'capitalize' else values
+        after = mapped.where(matched, fallback)
+        labels = lowered.map(lambda v: f"'{self.keys.get(v)}' → '{self.mapping.get(v)}' (any case)")
+        labels = labels.where(matched, "capitalized other values")
+        return self._labelled(values, after, labels)
+
+
+class RegexStep(Step):
+    def __init__(self, spec):
+        try:
+            self.rewrites = [(re.compile(r['pattern']), r.get('replace', '')) for r in spec['rewrites']]
+        except re.error as e:
+            raise RuleError(f"regex: bad pattern: {e}")
+        self.default_label = "; ".join(f"/{p.pattern}/ → '{r}'" for p, r in self.rewrites)
+        super().__init__(spec)
+
+    def apply(self, values):
+        after = values
+        for pattern, replace in self.rewrites:
+            after = after.str.replace(pattern, replace, regex=True)
+        return self._labelled(values, after)
+
+
+class CollapseRepeatStep(Step):
+    default_label = "collapsed repeated text"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.min_words = int(spec.get('min_words', 4))
+
+    def _collapse(self, value):
+        words = value.split()
+        if len(words) >= self.min_words:
+            half = len(words) // 2
+            first_half = ' '.join(words[:half])
+            if first_half == ' '.join(words[half:2 * half]):
+                return first_half
+        return value
+
+    def apply(self, values):
+        return self._labelled(values, values.map(self._collapse))
+
+
+class CanonicalCodesStep(Step):
+    """Reads the mapping at apply time, so regenerating it needs no rules edit"""
+
+    def apply(self, values):
+        mapping = load_canonical_mapping()
+        if not mapping:
+            return values, np.full(len(values), None, dtype=object)
+        after = values.map(mapping).fillna(values)
+        labels = values.map(lambda v: f"'{v}' → '{mapping.get(v)}' (canonical code)")
+        return self._labelled(values, after, labels)
+
+
+STEP_TYPES = {
+    'strip': StripStep,
+    'map': MapStep,
+    'map_ci': CaseInsensitiveMapStep,
+    'regex': RegexStep,
+    'collapse_repeat': CollapseRepeatStep,
+    'canonical_codes': CanonicalCodesStep,
+}
+
+
+class RuleSet:
+    """Compiled rule groups and the columns they apply to"""
+
+    def __init__(self, config, digest="", source=None):
+        self.digest = digest
+        self.source = source
+        self.report_types = config.get('report_types', {})
+        self.groups = {}
+        for name, steps in config.get('groups', {}).items():
+            compiled = []
+            for spec in steps:
+                step_type = STEP_TYPES.get(spec.get('type'))
+                if step_type is None:
+                    raise RuleError(f"group '{name}': unknown step type {spec.get('type')!r}")
+                compiled.append(step_type(spec))
+            self.groups[name] = compiled
+        for report_type, columns in self.report_types.items():
+            for column, group in columns.items():
+                if group not in self.groups:
+                    raise RuleError(f"{report_type} / {column}: no rule group named '{group}'")
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_PATH):
+        path = Path(path)
+        raw = path.read_bytes()
+        if path.suffix in ('.yaml', '.yml'):
+            if not HAVE_YAML:
+                raise RuleError(f"{path.name}: YAML rules need PyYAML (pip install pyyaml)")
+            config = yaml.safe_load(raw)
+        else:
+            config = json.loads(raw)
+        return cls(config, hashlib.sha256(raw).hexdigest(), path)
+
+    @property
+    def version(self):
+        return f"rules-{self.digest[:12]}"
+
+    def columns_for(self, file_path):
+        """{column: group} for the report type named in a file's path"""
+        for report_type, columns in self.report_types.items():
+            if report_type in str(file_path):
+                return columns
+        return {}
+
+    def normalize_values(self, group, values):
+        """
+        Run a group over distinct values.
+
+        Returns the normalized values (missing ones unchanged) and a list of
+        (label, boolean mask over values) for every rule that changed something.
+        Values that only changed type are reported under COERCE_LABEL.
+        """
+        values = pd.Series(values, dtype=object)
+        present = values.notna().to_numpy(dtype=bool)
+        original = pd.Series([str(v) for v in values[present]], dtype=object)
+        text = original
+        hits = {}
+        for step in self.groups[group]:
+            text, labels = step.apply(text)
+            for label in pd.unique(labels[pd.notna(labels)]):
+                mask = np.zeros(len(values), dtype=bool)
+                mask[np.flatnonzero(present)[labels == label]] = True
+                hits[label] = hits[label] | mask if label in hits else mask
+        coerced = (text == original).to_numpy(dtype=bool) & \
+            np.array([not isinstance(v, str) for v in values[present]], dtype=bool)
+        if coerced.any():
+            mask = np.zeros(len(values), dtype=bool)
+            mask[np.flatnonzero(present)[coerced]] = True
+            hits[COERCE_LABEL] = mask
+        result = values.to_numpy(dtype=object).copy()
+        result[present] = text.to_numpy(dtype=object)
+        return result, list(hits.items())
+
+    def normalize_value(self, group, value):
+        """One value through a group (for callers outside the column path)"""
+        return self.normalize_values(group, [value])[0][0]
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """
+    The compiled RuleSet for a rules file, re-read when its mtime changes and
+    recompiled only when its contents hash differently.
+    """
+    path = Path(path)
+    mtime_ns = path.stat().st_mtime_ns
+    cached = _rules_by_path.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()
+    rules = _rules_by_digest.get(digest)
+    if rules is None:
+        rules = RuleSet.from_file(path)
+        _rules_by_digest[rules.digest] = rules
+    _rules_by_path[path] = (mtime_ns, rules)
+    return rules
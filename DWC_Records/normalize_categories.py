@@ -6,177 +6,327 @@ This script normalizes categories across all Excel files:
 1. Fixes misspellings and typos
 2. Standardizes capitalization
 3. Removes duplicate text
-4. Provides fuzzy matching for similar procedure codes (optional)
+4. Maps procedure code variants to canonical codes (optional, see fuzzy_codes.py)
 """
 import pandas as pd
+import numpy as np
 from pathlib import Path
-import re
-from fuzzywuzzy import fuzz, process
 from collections import defaultdict
 import json
-
-# NORMALIZATION MAPPINGS
-# These define how to normalize specific values
-
-TRAN_TYPE_MAPPING = {
-    'patient referrel': 'Patient Referral',
-    'empolyee discount': 'Employee Discount',
-    'None Entered': 'None Entered',
-    'Credit Card': 'Credit Card',
-    'Debit Card': 'Debit Card',
-    'Cash': 'Cash',
-    'Check': 'Check',
-    'Coupon': 'Coupon',
-    'transfer': 'Transfer',
-}
-
-GENDER_MAPPING = {
-    'person': 'Other',  # or 'Unknown' - you can change this
-    'female': 'Female',
-    'male': 'Male',
-}
-
-def normalize_provider(provider_str):
-    """Fix provider names with duplicated text"""
-    if pd.isna(provider_str):
-        return provider_str
-
-    provider = str(provider_str).strip()
-
-    # Remove duplicate text (e.g., "New Patient Clermont New Patient Clermont")
-    words = provider.split()
-    if len(words) >= 4:
-        half = len(words) // 2
-        first_half = ' '.join(words[:half])
-        second_half = ' '.join(words[half:2*half])
-        if first_half == second_half:
-            return first_half
-
-    return provider
-
-def normalize_tran_type(tran_type):
-    """Normalize transaction type"""
-    if pd.isna(tran_type):
-        return tran_type
-
-    tran_str = str(tran_type).strip()
-    return TRAN_TYPE_MAPPING.get(tran_str, tran_str)
-
-def normalize_gender(gender):
-    """Normalize gender values"""
-    if pd.isna(gender):
-        return gender
-
-    gender_str = str(gender).strip().lower()
-    for key, value in GENDER_MAPPING.items():
-        if gender_str == key.lower():
-            return value
-
-    return str(gender).strip().capitalize()
-
-def normalize_procedure_code(code):
-    """Basic normalization for procedure codes"""
-    if pd.isna(code):
-        return code
-
-    code_str = str(code).strip()
-    # Remove extra whitespace
-    code_str = re.sub(r'\s+', ' ', code_str)
-    return code_str
-
-def process_file(file_path, output_dir, changes_log):
-    """Process a single Excel file and apply normalizations"""
+import argparse
+import hashlib
+import os
+import queue
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from workbook_cache import read_workbook, file_digest
+from fuzzy_codes import load_canonical_mapping
+from dataset_io import (OUTPUT_FORMATS, BackgroundExcelWriter, output_path_for,
+                        read_dataset, write_dataset)
+from stage_metrics import FileMetrics, profile_path_for, save_metrics, summarize_stages
+from normalization_rules import load_rules
+
+# Bump whenever the rule engine's behaviour changes so the manifest renormalizes
+# everything; edits to normalization_rules.json are picked up by its digest
+RULE_VERSION = "2"
+MANIFEST_NAME = ".normalization_manifest.json"
+
+def current_rule_version(rules=None):
+    """RULE_VERSION plus digests of the rules file and the canonical code mapping in use"""
+    rules = rules or load_rules()
+    version = f"{RULE_VERSION}+{rules.version}"
+    mapping = load_canonical_mapping()
+    if not mapping:
+        return version
+    digest = hashlib.sha256(json.dumps(mapping, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{version}+codes-{digest[:12]}"
+
+def normalize_column(series, rules, group):
+    """
+    Run a rule group over each distinct value of a column once and map the results back.
+
+    Returns the normalized column, the number of rows whose value changed
+    (counted from the distinct-value mapping instead of a full-column
+    compare) and {rule label: rows it changed}. Missing values are left as
+    they are and never counted as changes.
+    """
+    codes, uniques = pd.factorize(series)
+    normalized, rule_masks = rules.normalize_values(group, uniques)
+
+    changed = np.array([old != new for old, new in zip(uniques, normalized)], dtype=bool)
+    present = codes >= 0
+    occurrences = np.bincount(codes[present], minlength=len(uniques))
+    change_count = int(occurrences[changed].sum())
+    rule_hits = {label: int(occurrences[mask].sum()) for label, mask in rule_masks}
+
+    # Code -1 (missing) indexes the trailing NaN slot
+    lookup = np.empty(len(normalized) + 1, dtype=object)
+    lookup[:-1] = normalized
+    lookup[-1] = np.nan
+    result = pd.Series(lookup[codes], index=series.index, name=series.name).infer_objects()
+    return result, change_count, rule_hits
+
+def normalize_frame(df, file_path, rules=None):
+    """
+    Apply the rules for the file's report type in place.
+
+    Returns ({column: changes}, {column: {rule label: rows changed}}).
+    """
+    rules = rules or load_rules()
+    file_changes = {}
+    rule_hits = {}
+    for column, group in rules.columns_for(file_path).items():
+        if column not in df.columns:
+            continue
+        df[column], change_count, column_hits = normalize_column(df[column], rules, group)
+        if change_count > 0:
+            file_changes[column] = change_count
+        if column_hits:
+            rule_hits[column] = column_hits
+    return file_changes, rule_hits
+
+def rows_digest(df):
+    """Order-sensitive digest of a frame's row contents"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+def merge_changes(*change_dicts):
+    """Sum per-column change counts"""
+    merged = defaultdict(int)
+    for changes in change_dicts:
+        for column, count in changes.items():
+            merged[column] += count
+    return dict(merged)
+
+def merge_rule_hits(*hit_dicts):
+    """Sum {column: {rule label: rows}} dicts"""
+    merged = {}
+    for hits in hit_dicts:
+        for column, labels in (hits or {}).items():
+            merged[column] = merge_changes(merged.get(column, {}), labels)
+    return merged
+
+def manifest_is_current(entry, file_path, output_path):
+    """True when the manifest says this source was already normalized with the current rules"""
+    if not entry or entry.get('rule_version') != current_rule_version() or not output_path.exists():
+        return False
+    stat = file_path.stat()
+    if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    # Touched but possibly identical (e.g. re-copied) - compare contents
+    return entry['size'] == stat.st_size and entry['sha256'] == file_digest(file_path)
+
+def read_stage(file_path, output_path, previous, use_manifest, metrics):
+    """
+    Reader stage: load a source file, or mark it skipped when the manifest
+    says its output is current. For a re-export that only appended rows, the
+    job carries just the new tail plus the existing output.
+    """
+    job = {'file_path': file_path, 'output_path': output_path, 'previous': previous,
+           'skip': False, 'appended': False}
+    if use_manifest and manifest_is_current(previous, file_path, output_path):
+        job['skip'] = True
+        return job
+
+    with metrics.stage('read') as stage:
+        df = read_workbook(file_path)
+        stage.rows = metrics.rows = len(df)
+    with metrics.stage('digest') as stage:
+        job['source_digest'] = rows_digest(df)
+        job['appended'] = (previous is not None and previous.get('rule_version') == current_rule_version()
+                           and output_path.exists() and len(df) > previous['rows']
+                           and rows_digest(df.iloc[:previous['rows']]) == previous['rows_digest'])
+        stage.rows = len(df)
+
+    if job['appended']:
+        # Only the new tail needs normalizing; the head is already on disk
+        with metrics.stage('read') as stage:
+            job['existing'] = read_dataset(output_path)
+            stage.rows += len(job['existing'])
+        df = df.iloc[previous['rows']:].copy()
+    job['df'] = df
+    return job
+
+def transform_stage(job, metrics):
+    """Transformer stage: normalize job['df'] in place and record the changes"""
+    # Change counting is fused into normalize_column, so it is timed here too
+    with metrics.stage('normalize') as stage:
+        # One rule set per file, even if the rules file is edited mid-run
+        rules = load_rules()
+        job['rule_version'] = current_rule_version(rules)
+        changes, rule_hits = normalize_frame(job['df'], job['file_path'], rules)
+        stage.rows = len(job['df'])
+    job['report_changes'] = changes
+    if job['appended']:
+        job['tail_rows'] = len(job['df'])
+        job['df'] = pd.concat([job.pop('existing'), job['df']], ignore_index=True)
+        job['file_changes'] = merge_changes(job['previous']['changes'], changes)
+        job['rule_hits'] = merge_rule_hits(job['previous'].get('rule_hits'), rule_hits)
+    else:
+        job['file_changes'] = changes
+        job['rule_hits'] = rule_hits
+    return job
+
+def write_stage(job, metrics, output_format):
+    """Writer stage: save the normalized frame"""
+    with metrics.stage('write') as stage:
+        write_dataset(job['df'], job['output_path'], output_format)
+        stage.rows = len(job['df'])
+
+def manifest_entry(job, output_format, metrics):
+    """Manifest record for a freshly written output"""
+    with metrics.stage('manifest'):
+        stat = job['file_path'].stat()
+        return {
+            'sha256': file_digest(job['file_path']),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'rule_version': job['rule_version'],
+            'rows': len(job['df']),
+            'rows_digest': job['source_digest'],
+            'output': str(job['output_path']),
+            'format': output_format,
+            'changes': job['file_changes'],
+            'rule_hits': job['rule_hits'],
+        }
+
+def print_job_changes(job):
+    if job['appended']:
+        print(f"  ✓ {job['tail_rows']} appended rows normalized ({job['previous']['rows']} already done)")
+    for column, change_count in job['report_changes'].items():
+        print(f"  ✓ Normalized {change_count} {column} values")
+
+def record_skipped(job, changes_log, rules_log=None):
+    """Refresh a skipped file's manifest stat and carry its changes into the report"""
+    previous = job['previous']
+    stat = job['file_path'].stat()
+    previous.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    if previous['changes']:
+        changes_log[str(job['file_path'])] = dict(previous['changes'])
+    if rules_log is not None and previous.get('rule_hits'):
+        rules_log[str(job['file_path'])] = previous['rule_hits']
+    print(f"  ✓ Unchanged since last run - skipped")
+
+def process_file(file_path, output_dir, changes_log, errors_log=None, manifest=None, metrics=None,
+                 output_format='xlsx', excel_writer=None, rules_log=None):
+    """
+    Process a single Excel file and apply normalizations.
+
+    With a manifest (dict of source path -> entry), files whose content and
+    rule version are unchanged are skipped, and a re-export that only appends
+    rows has just its new tail normalized and merged onto the existing output.
+    The manifest is updated in place. Stage timings go to metrics (a
+    stage_metrics.FileMetrics) when given.
+
+    output_format is one of OUTPUT_FORMATS; with an excel_writer (a
+    dataset_io.BackgroundExcelWriter) a columnar output also gets an Excel
+    copy written in the background. rules_log collects, per file, how many
+    rows each rule changed.
+    """
     print(f"\nProcessing: {file_path.name}")
+    source_key = str(file_path)
+    output_path = output_path_for(file_path, output_dir, output_format)
+    previous = manifest.get(source_key) if manifest is not None else None
+    if metrics is None:
+        metrics = FileMetrics(file_path)
+    metrics.start()
+    status = 'failed'
 
     try:
-        df = pd.read_excel(file_path)
-        original_df = df.copy()
-        file_changes = defaultdict(list)
-
-        # Apply normalizations based on file type
-        if 'Patient Research' in str(file_path):
-            # Normalize Gender
-            if 'Gender' in df.columns:
-                df['Gender'] = df['Gender'].apply(normalize_gender)
-                changed_indices = df[df['Gender'] != original_df['Gender']].index
-                if len(changed_indices) > 0:
-                    file_changes['Gender'] = len(changed_indices)
-                    print(f"  ✓ Normalized {len(changed_indices)} Gender values")
-
-            # Normalize Provider
-            if 'Provider' in df.columns:
-                df['Provider'] = df['Provider'].apply(normalize_provider)
-                changed_indices = df[df['Provider'] != original_df['Provider']].index
-                if len(changed_indices) > 0:
-                    file_changes['Provider'] = len(changed_indices)
-                    print(f"  ✓ Normalized {len(changed_indices)} Provider values")
-
-            # Normalize Procedure
-            if 'Procedure' in df.columns:
-                df['Procedure'] = df['Procedure'].apply(normalize_procedure_code)
-                changed_indices = df[df['Procedure'] != original_df['Procedure']].index
-                if len(changed_indices) > 0:
-                    file_changes['Procedure'] = len(changed_indices)
-                    print(f"  ✓ Normalized {len(changed_indices)} Procedure values")
-
-        elif 'Payment Distribution' in str(file_path):
-            # Normalize Tran Type
-            if 'Tran Type' in df.columns:
-                df['Tran Type'] = df['Tran Type'].apply(normalize_tran_type)
-                changed_indices = df[df['Tran Type'] != original_df['Tran Type']].index
-                if len(changed_indices) > 0:
-                    file_changes['Tran Type'] = len(changed_indices)
-                    print(f"  ✓ Normalized {len(changed_indices)} Tran Type values")
-
-            # Normalize Procedure Code
-            if 'Procedure Code' in df.columns:
-                df['Procedure Code'] = df['Procedure Code'].apply(normalize_procedure_code)
-                changed_indices = df[df['Procedure Code'] != original_df['Procedure Code']].index
-                if len(changed_indices) > 0:
-                    file_changes['Procedure Code'] = len(changed_indices)
-                    print(f"  ✓ Normalized {len(changed_indices)} Procedure Code values")
+        job = read_stage(file_path, output_path, previous, manifest is not None, metrics)
+        if job['skip']:
+            record_skipped(job, changes_log, rules_log)
+            if excel_writer is not None:
+                excel_writer.copy(output_path)
+            status = 'skipped'
+            return True
+
+        transform_stage(job, metrics)
+        print_job_changes(job)
 
         # Save normalized file
-        output_path = output_dir / file_path.name
-        df.to_excel(output_path, index=False)
+        write_stage(job, metrics, output_format)
         print(f"  ✓ Saved to: {output_path}")
+        if excel_writer is not None and output_format != 'xlsx':
+            excel_writer.submit(job['df'], output_path.with_suffix('.xlsx'))
 
         # Log changes
-        if file_changes:
-            changes_log[str(file_path)] = dict(file_changes)
+        if job['file_changes']:
+            changes_log[source_key] = dict(job['file_changes'])
+        if rules_log is not None and job['rule_hits']:
+            rules_log[source_key] = job['rule_hits']
 
+        if manifest is not None:
+            manifest[source_key] = manifest_entry(job, output_format, metrics)
+
+        status = 'appended' if job['appended'] else 'normalized'
         return True
 
     except Exception as e:
         print(f"  ✗ Error: {e}")
+        if errors_log is not None:
+            errors_log[source_key] = f"{type(e).__name__}: {e}"
         return False
 
-def generate_report(changes_log, output_dir):
-    """Generate a summary report of all changes"""
+    finally:
+        metrics.finish(status)
+
+def process_file_isolated(file_path, output_dir, manifest=None, trace_memory=False, profile_dir=None,
+                          output_format='xlsx'):
+    """Run process_file in a worker process and return its logs for merging"""
+    changes_log = {}
+    errors_log = {}
+    rules_log = {}
+    if manifest is not None:
+        manifest = dict(manifest)
+    metrics = FileMetrics(file_path, trace_memory, profile_path_for(profile_dir, file_path))
+    success = process_file(file_path, output_dir, changes_log, errors_log, manifest, metrics, output_format,
+                           rules_log=rules_log)
+    return success, changes_log, errors_log, manifest, metrics.as_dict(), rules_log
+
+def load_manifest(output_dir):
+    """Read the incremental-run manifest, or an empty one"""
+    manifest_path = output_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(manifest, output_dir):
+    """Write the manifest atomically"""
+    manifest_path = output_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def generate_report(changes_log, output_dir, errors_log=None, rules_log=None):
+    """Generate a summary report of all changes and the rules that made them"""
     report_path = output_dir / "NORMALIZATION_REPORT.txt"
+    rules = load_rules()
 
     with open(report_path, 'w') as f:
         f.write("="*80 + "\n")
         f.write("DWC RECORDS - CATEGORY NORMALIZATION REPORT\n")
         f.write("="*80 + "\n\n")
 
-        f.write("APPLIED NORMALIZATIONS:\n\n")
-
-        f.write("1. Transaction Type (Tran Type):\n")
-        for old, new in TRAN_TYPE_MAPPING.items():
-            if old != new:
-                f.write(f"   '{old}' → '{new}'\n")
-
-        f.write("\n2. Gender:\n")
-        for old, new in GENDER_MAPPING.items():
-            if old != new:
-                f.write(f"   '{old}' → '{new}'\n")
-
-        f.write("\n3. Provider:\n")
-        f.write("   Removed duplicate text from provider names\n")
-
-        f.write("\n4. Procedure/Procedure Code:\n")
-        f.write("   Removed extra whitespace and standardized formatting\n")
+        f.write("APPLIED NORMALIZATIONS:\n")
+        f.write(f"Rules: {Path(rules.source).name} (version {current_rule_version(rules)})\n")
+
+        # Rows changed per rule, summed over files, columns in rules-file order
+        rule_hits = merge_rule_hits(*(rules_log or {}).values())
+        columns = list(dict.fromkeys(column for columns in rules.report_types.values() for column in columns))
+        columns += [column for column in rule_hits if column not in columns]
+        for column in columns:
+            if not rule_hits.get(column):
+                continue
+            f.write(f"\n{column}:\n")
+            for label, rows in sorted(rule_hits[column].items(), key=lambda item: (-item[1], item[0])):
+                f.write(f"   {label}: {rows} rows\n")
+        if not rule_hits:
+            f.write("\n   No rule changed any value\n")
 
         f.write("\n" + "="*80 + "\n")
         f.write("CHANGES BY FILE:\n")
@@ -194,16 +344,314 @@ def generate_report(changes_log, output_dir):
         f.write(f"TOTAL CHANGES: {total_changes}\n")
         f.write("="*80 + "\n")
 
+        if errors_log:
+            f.write("\nFAILED FILES (not normalized):\n\n")
+            for file_path, error in errors_log.items():
+                f.write(f"{Path(file_path).name}:\n")
+                f.write(f"  - {error}\n")
+            f.write("\n" + "="*80 + "\n")
+
     print(f"\n📊 Report saved to: {report_path}")
 
+def output_subdir(file_path, output_dir):
+    """Mirror the Patient Research / Payment Distribution split in the output"""
+    if 'Patient Research' in str(file_path):
+        return output_dir / "Patient Research"
+    elif 'Payment Distribution' in str(file_path):
+        return output_dir / "Payment Distribution"
+    return output_dir
+
+def run_serial(excel_files, output_dir, changes_log, errors_log, manifest=None,
+               metrics_log=None, trace_memory=False, profile_dir=None,
+               output_format='xlsx', excel_writer=None, rules_log=None):
+    """Process files one at a time in the current process"""
+    success_count = 0
+    for file_path in excel_files:
+        metrics = FileMetrics(file_path, trace_memory, profile_path_for(profile_dir, file_path))
+        if process_file(file_path, output_subdir(file_path, output_dir), changes_log, errors_log,
+                        manifest, metrics, output_format, excel_writer, rules_log):
+            success_count += 1
+        if metrics_log is not None:
+            metrics_log[str(file_path)] = metrics.as_dict()
+    return success_count
+
+def _run_in_own_process(args):
+    """process_file_isolated in a single-use process; exceptions are returned, not raised"""
+    try:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(process_file_isolated, *args).result()
+    except Exception as e:
+        return e
+
+def run_parallel(excel_files, output_dir, changes_log, errors_log, workers, manifest=None,
+                 metrics_log=None, trace_memory=False, profile_dir=None,
+                 output_format='xlsx', excel_writer=None, rules_log=None):
+    """
+    Fan files out to a process pool.
+
+    Worker logs are merged in input order, so the report is identical to a
+    serial run. Excel copies are made here, from each worker's columnar
+    output, while the pool keeps going.
+
+    A worker that dies outright (killed, out of memory) breaks the whole
+    pool, and every file it had not finished fails with BrokenProcessPool.
+    Those files are retried, each in a process of its own, so only a file
+    that kills its process again is reported as crashed.
+    """
+    tasks = []
+    for file_path in excel_files:
+        file_manifest = None
+        if manifest is not None:
+            file_manifest = {k: v for k, v in manifest.items() if k == str(file_path)}
+        tasks.append((file_path, output_subdir(file_path, output_dir), file_manifest,
+                      trace_memory, profile_dir, output_format))
+
+    outcomes = {}  # task index -> result tuple or exception, until merged
+    merged = 0
+    success_count = 0
+
+    def merge_ready():
+        nonlocal merged, success_count
+        while merged in outcomes:
+            file_path = tasks[merged][0]
+            outcome = outcomes.pop(merged)
+            merged += 1
+            if isinstance(outcome, Exception):
+                print(f"\n  ✗ Worker failed on {file_path.name}: {outcome}")
+                outcome = (False, {}, {str(file_path): f"{type(outcome).__name__}: {outcome}"}, None,
+                           {'file': str(file_path), 'status': 'crashed', 'stages': {}}, {})
+            success, file_changes, file_errors, file_manifest, file_metrics, file_rules = outcome
+            changes_log.update(file_changes)
+            if rules_log is not None:
+                rules_log.update(file_rules)
+            errors_log.update(file_errors)
+            if manifest is not None and file_manifest:
+                manifest.update(file_manifest)
+            if metrics_log is not None:
+                metrics_log[str(file_path)] = file_metrics
+            if success:
+                success_count += 1
+                if excel_writer is not None:
+                    excel_writer.copy(output_path_for(file_path, output_subdir(file_path, output_dir),
+                                                      output_format))
+
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_file_isolated, *task) for task in tasks]
+        for i, future in enumerate(futures):
+            try:
+                outcomes[i] = future.result()
+            except BrokenProcessPool:
+                unfinished.append(i)
+            except Exception as e:
+                outcomes[i] = e
+            merge_ready()
+
+    if unfinished:
+        print(f"\n  ⚠ A worker process died; retrying {len(unfinished)} unfinished files one per process")
+        with ThreadPoolExecutor(max_workers=workers) as retry:
+            for i, outcome in zip(unfinished, retry.map(_run_in_own_process, [tasks[i] for i in unfinished])):
+                outcomes[i] = outcome
+                merge_ready()
+    return success_count
+
+def _pipeline_get(q, producer):
+    """Queue get that notices a stage process dying instead of blocking forever"""
+    while True:
+        try:
+            return q.get(timeout=1)
+        except queue.Empty:
+            if not producer.is_alive():
+                raise RuntimeError(f"pipeline stage '{producer.name}' exited unexpectedly "
+                                   f"(exit code {producer.exitcode})")
+
+def _pipeline_put(q, item, consumer):
+    """Queue put that notices the consuming stage dying instead of blocking on a full queue"""
+    while True:
+        try:
+            q.put(item, timeout=1)
+            return
+        except queue.Full:
+            if not consumer.is_alive():
+                # Items already handed to the queue can never be delivered now;
+                # don't let them hold up interpreter exit
+                q.cancel_join_thread()
+                raise RuntimeError(f"pipeline stage '{consumer.name}' exited unexpectedly "
+                                   f"(exit code {consumer.exitcode})")
+
+def pipeline_reader(tasks, read_queue, trace_memory):
+    """Reader process: parse files in order and hand them to the transformer"""
+    for file_path, output_path, previous, use_manifest in tasks:
+        metrics = FileMetrics(file_path, trace_memory)
+        metrics.start()
+        try:
+            job = read_stage(file_path, output_path, previous, use_manifest, metrics)
+        except Exception as e:
+            job = {'file_path': file_path, 'output_path': output_path, 'previous': previous,
+                   'skip': False, 'error': f"{type(e).__name__}: {e}"}
+        job['metrics'] = metrics
+        read_queue.put(job)
+    read_queue.put(None)
+
+def pipeline_writer(write_queue, result_queue, output_format, use_manifest):
+    """Writer process: save normalized frames and report back small results"""
+    while True:
+        job = write_queue.get()
+        if job is None:
+            break
+        metrics = job.pop('metrics')
+        result = {'file_path': job['file_path'], 'output_path': job['output_path'],
+                  'error': job.get('error'), 'skip': job['skip'], 'entry': None}
+        status = 'skipped' if job['skip'] else 'failed'
+        if not job['skip'] and result['error'] is None:
+            try:
+                write_stage(job, metrics, output_format)
+                if use_manifest:
+                    result['entry'] = manifest_entry(job, output_format, metrics)
+                status = 'appended' if job['appended'] else 'normalized'
+            except Exception as e:
+                result['error'] = f"{type(e).__name__}: {e}"
+        metrics.finish(status)
+        result['metrics'] = metrics.as_dict()
+        result_queue.put(result)
+    result_queue.put(None)
+
+def run_pipelined(excel_files, output_dir, changes_log, errors_log, manifest=None,
+                  metrics_log=None, trace_memory=False, profile_dir=None,
+                  output_format='xlsx', excel_writer=None, rules_log=None, queue_depth=2):
+    """
+    Overlap reading, normalizing and writing across files.
+
+    A reader process parses file N+1 while this process normalizes file N
+    and a writer process saves file N-1. The stages are joined by queues
+    holding at most queue_depth frames each, which caps memory. Files go
+    through in order, so the report matches a serial run.
+    """
+    if profile_dir:
+        raise ValueError("per-file profiling is not available in pipelined mode")
+    use_manifest = manifest is not None
+    tasks = []
+    for file_path in excel_files:
+        output_path = output_path_for(file_path, output_subdir(file_path, output_dir), output_format)
+        previous = manifest.get(str(file_path)) if use_manifest else None
+        tasks.append((file_path, output_path, previous, use_manifest))
+
+    read_queue = multiprocessing.Queue(maxsize=queue_depth)
+    write_queue = multiprocessing.Queue(maxsize=queue_depth)
+    result_queue = multiprocessing.Queue()
+    reader = multiprocessing.Process(target=pipeline_reader, name="reader",
+                                     args=(tasks, read_queue, trace_memory), daemon=True)
+    writer = multiprocessing.Process(target=pipeline_writer, name="writer",
+                                     args=(write_queue, result_queue, output_format, use_manifest),
+                                     daemon=True)
+    reader.start()
+    writer.start()
+
+    jobs = {}
+    try:
+        # Transformer stage
+        while True:
+            job = _pipeline_get(read_queue, reader)
+            if job is None:
+                break
+            print(f"\nProcessing: {job['file_path'].name}")
+            if job['skip']:
+                # Logged when its result comes back, to keep the report in input order
+                skipped_changes, skipped_rules = {}, {}
+                record_skipped(job, skipped_changes, skipped_rules)
+                job['file_changes'] = skipped_changes.get(str(job['file_path']))
+                job['rule_hits'] = skipped_rules.get(str(job['file_path']))
+            elif job.get('error') is None:
+                try:
+                    transform_stage(job, job['metrics'])
+                    print_job_changes(job)
+                except Exception as e:
+                    job['error'] = f"{type(e).__name__}: {e}"
+            if job.get('error'):
+                print(f"  ✗ Error: {job['error']}")
+            elif job['skip'] and use_manifest:
+                manifest[str(job['file_path'])] = job['previous']
+            jobs[str(job['file_path'])] = (job.get('file_changes'), job.get('rule_hits'), job.get('error'))
+            _pipeline_put(write_queue, job, writer)
+        _pipeline_put(write_queue, None, writer)
+
+        success_count = 0
+        while True:
+            result = _pipeline_get(result_queue, writer)
+            if result is None:
+                break
+            source_key = str(result['file_path'])
+            if metrics_log is not None:
+                metrics_log[source_key] = result['metrics']
+            file_changes, rule_hits, earlier_error = jobs[source_key]
+            if result['error']:
+                if earlier_error is None:
+                    print(f"  ✗ Error writing {result['file_path'].name}: {result['error']}")
+                errors_log[source_key] = result['error']
+                continue
+            success_count += 1
+            if file_changes:
+                changes_log[source_key] = dict(file_changes)
+            if rules_log is not None and rule_hits:
+                rules_log[source_key] = rule_hits
+            if not result['skip']:
+                print(f"  ✓ Saved to: {result['output_path']}")
+                if use_manifest:
+                    manifest[source_key] = result['entry']
+            if excel_writer is not None:
+                excel_writer.copy(result['output_path'])
+    finally:
+        reader.join(timeout=5)
+        writer.join(timeout=5)
+    return success_count
+
+def print_stage_summary(metrics_log):
+    """Console breakdown of where the run spent its time"""
+    totals = summarize_stages(metrics_log.values())
+    if not totals:
+        return
+    print("\n⏱  Time by stage (summed over files):")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['seconds']):
+        rate = f"{total['rows_per_second']:,} rows/s" if total['rows_per_second'] else ""
+        print(f"  {name:10} {total['seconds']:9.2f}s  {rate}")
+
 def main():
     """Main function to normalize all files"""
+    parser = argparse.ArgumentParser(description="Normalize categories across DWC Excel files")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (default: 1, serial)")
+    parser.add_argument("--input-dir", default="DWC RECORDS",
+                        help="directory searched recursively for .xlsx files")
+    parser.add_argument("--output-dir", default="DWC RECORDS NORMALIZED",
+                        help="directory for normalized files and the report")
+    parser.add_argument("--full", action="store_true",
+                        help="ignore the manifest and renormalize every file")
+    parser.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="xlsx",
+                        help="format of the normalized files (default: xlsx)")
+    parser.add_argument("--excel-copy", action="store_true",
+                        help="with a columnar --format, also write an .xlsx copy in the background")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record peak traced allocations per stage (slower)")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="write a cProfile dump per file into DIR")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap reading, normalizing and writing of consecutive files")
+    parser.add_argument("--queue-depth", type=int, default=2,
+                        help="files buffered between pipeline stages (default: 2)")
+    args = parser.parse_args()
+    if args.pipeline and args.workers > 1:
+        parser.error("--pipeline and --workers are alternatives; pick one")
+    if args.pipeline and args.profile:
+        parser.error("--profile is per file and needs a serial or --workers run")
+    if args.queue_depth < 1:
+        parser.error("--queue-depth must be at least 1")
+
     print("="*80)
     print("DWC RECORDS - CATEGORY NORMALIZATION")
     print("="*80)
 
     # Find all Excel files
-    dwc_path = Path("DWC RECORDS")
+    dwc_path = Path(args.input_dir)
     excel_files = list(dwc_path.rglob("*.xlsx"))
     # Filter out temp files
     excel_files = [f for f in excel_files if not f.name.startswith('~$')]
@@ -211,7 +659,7 @@ def main():
     print(f"\nFound {len(excel_files)} files to process")
 
     # Create output directory
-    output_dir = Path("DWC RECORDS NORMALIZED")
+    output_dir = Path(args.output_dir)
     output_dir.mkdir(exist_ok=True)
 
     # Recreate subdirectory structure
@@ -220,25 +668,55 @@ def main():
 
     # Process all files
     changes_log = {}
-    success_count = 0
-
-    for file_path in excel_files:
-        # Determine output subdirectory
-        if 'Patient Research' in str(file_path):
-            out_dir = output_dir / "Patient Research"
-        elif 'Payment Distribution' in str(file_path):
-            out_dir = output_dir / "Payment Distribution"
-        else:
-            out_dir = output_dir
-
-        if process_file(file_path, out_dir, changes_log):
-            success_count += 1
+    errors_log = {}
+    manifest = {} if args.full else load_manifest(output_dir)
+    metrics_log = {}
+    rules_log = {}
+    excel_writer = BackgroundExcelWriter() if args.excel_copy and args.format != 'xlsx' else None
+    run_options = {'metrics_log': metrics_log, 'trace_memory': args.trace_memory,
+                   'profile_dir': args.profile, 'output_format': args.format,
+                   'excel_writer': excel_writer, 'rules_log': rules_log}
+    started = time.perf_counter()
+
+    if args.pipeline:
+        print(f"Using a read/normalize/write pipeline (queue depth {args.queue_depth})")
+        success_count = run_pipelined(excel_files, output_dir, changes_log, errors_log, manifest,
+                                      queue_depth=args.queue_depth, **run_options)
+    elif args.workers > 1 and len(excel_files) > 1:
+        print(f"Using {args.workers} worker processes")
+        success_count = run_parallel(excel_files, output_dir, changes_log, errors_log, args.workers,
+                                     manifest, **run_options)
+    else:
+        success_count = run_serial(excel_files, output_dir, changes_log, errors_log, manifest,
+                                   **run_options)
+
+    copy_errors = excel_writer.close() if excel_writer is not None else {}
+    save_manifest(manifest, output_dir)
 
     # Generate report
-    generate_report(changes_log, output_dir)
+    generate_report(changes_log, output_dir, errors_log, rules_log)
+    metrics_path = save_metrics(metrics_log, output_dir, {
+        'workers': args.workers,
+        'pipeline': args.pipeline,
+        'files': len(excel_files),
+        'seconds': round(time.perf_counter() - started, 4),
+        'trace_memory': args.trace_memory,
+        'format': args.format,
+        'rule_version': current_rule_version(),
+    })
+    print_stage_summary(metrics_log)
+    print(f"⏱  Metrics saved to: {metrics_path}")
 
     print("\n" + "="*80)
     print(f"✅ SUCCESS: Processed {success_count}/{len(excel_files)} files")
+    if errors_log:
+        print(f"✗ FAILED: {len(errors_log)} files (see NORMALIZATION_REPORT.txt)")
+        for file_path, error in errors_log.items():
+            print(f"  - {Path(file_path).name}: {error}")
+    if excel_writer is not None:
+        print(f"📄 Excel copies written: {len(excel_writer.written)}")
+    for xlsx_path, error in copy_errors.items():
+        print(f"  ✗ Excel copy failed: {Path(xlsx_path).name}: {error}")
     print(f"📁 Normalized files saved to: {output_dir}")
     print("="*80 + "\n")
 
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Streaming per-(code, year) price statistics for the DWC reports
+
+PriceHistory takes the code/year/amount rows of analyze_for_migration.py's
+collect_procedure_rows one frame at a time and keeps, per procedure code and
+service year, the count, min, max and sum of the positive prices plus a
+QuantileSketch. Memory depends on the number of (code, year) pairs, not on
+the number of rows, and two histories (or two sketches) merge by adding
+counts, so chunks, files and scans can be combined.
+
+QuantileSketch holds exact (price, count) pairs while a key has at most
+MAX_EXACT_VALUES distinct prices - true of almost every DWC code, whose
+prices repeat - and falls back to logarithmic buckets with RELATIVE_ACCURACY
+relative error beyond that, capped at MAX_BUCKETS.
+
+The suggested price for a code is the median of its most recent years,
+walking back from the latest year until at least MIN_SUGGESTION_PRICES
+prices are covered.
+
+Usage:
+    python DWC_Records/price_history.py                        # 02_Normalized
+    python DWC_Records/price_history.py DWC_Records/02_Normalized --output PRICE_HISTORY.xlsx
+    python DWC_Records/price_history.py --code "37.5 P 15"     # one code, year by year
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import argparse
+import math
+from dataset_io import list_datasets
+from frame_loader import iter_frames
+
+DWC_DIR = Path(__file__).resolve().parent
+
+DEFAULT_ROOTS = [DWC_DIR / "02_Normalized"]
+DEFAULT_OUTPUT = DWC_DIR / "PRICE_HISTORY.xlsx"
+
+MAX_EXACT_VALUES = 256
+RELATIVE_ACCURACY = 0.01
+MAX_BUCKETS = 2048
+MIN_SUGGESTION_PRICES = 20
+TABLE_QUANTILES = (('P10', 0.1), ('Median', 0.5), ('P90', 0.9))
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch over positive values.
+
+    Exact value counts up to max_exact distinct values, then log buckets: a
+    value x lands in bucket ceil(log(x) / log(gamma)), so every value in a
+    bucket is within relative_accuracy of the bucket's representative.
+    """
+
+    def __init__(self, max_exact=MAX_EXACT_VALUES, relative_accuracy=RELATIVE_ACCURACY,
+                 max_buckets=MAX_BUCKETS):
+        self.max_exact = max_exact
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.max_buckets = max_buckets
+        self.exact = {}  # value -> count, None once collapsed to buckets
+        self.buckets = {}  # bucket index -> count
+        self.count = 0
+
+    def add(self, values, counts=None):
+        """Add values (with optional repeat counts); non-positive values are ignored"""
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.ones(len(values), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        keep = values > 0
+        values, counts = values[keep], counts[keep]
+        if not len(values):
+            return
+        self.count += int(counts.sum())
+        if self.exact is not None:
+            for value, count in zip(values.tolist(), counts.tolist()):
+                self.exact[value] = self.exact.get(value, 0) + count
+            if len(self.exact) > self.max_exact:
+                self._collapse()
+        else:
+            self._add_buckets(values, counts)
+
+    def _add_buckets(self, values, counts):
+        self._add_indexes(np.ceil(np.log(values) / math.log(self.gamma)).astype(np.int64), counts)
+
+    def _add_indexes(self, indexes, counts):
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        if len(self.buckets) > self.max_buckets:
+            # Fold the lowest buckets together: the upper quantiles keep their accuracy
+            ordered = sorted(self.buckets)
+            keep = ordered[-(self.max_buckets - 1):]
+            folded = sum(self.buckets[i] for i in ordered[:-(self.max_buckets - 1)])
+            self.buckets = {i: self.buckets[i] for i in keep}
+            self.buckets[keep[0]] += folded
+
+    def _collapse(self):
+        exact, self.exact = self.exact, None
+        self._add_buckets(np.fromiter(exact.keys(), dtype=np.float64, count=len(exact)),
+                          np.fromiter(exact.values(), dtype=np.int64, count=len(exact)))
+
+    def merge(self, other):
+        """Add another sketch's counts to this one"""
+        if other.exact is not None:
+            self.add(list(other.exact), list(other.exact.values()))
+            return self
+        if self.exact is not None:
+            self._collapse()
+        self.count += other.count
+        self._add_indexes(np.fromiter(other.buckets.keys(), dtype=np.int64, count=len(other.buckets)),
+                          np.fromiter(other.buckets.values(), dtype=np.int64, count=len(other.buckets)))
+        return self
+
+    def _sorted_counts(self):
+        if self.exact is not None:
+            values = sorted(self.exact)
+            return values, [self.exact[v] for v in values]
+        indexes = sorted(self.buckets)
+        # Representative value of a bucket: within relative_accuracy of everything in it
+        return [2 * self.gamma ** i / (self.gamma + 1) for i in indexes], [self.buckets[i] for i in indexes]
+
+    def quantile(self, q):
+        """Lower q-quantile (0 <= q <= 1), None when empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        values, counts = self._sorted_counts()
+        for value, count in zip(values, counts):
+            seen += count
+            if seen > rank:
+                return value
+        return values[-1]
+
+    @property
+    def is_exact(self):
+        return self.exact is not None
+
+
+class PriceStats:
+    """Count, min, max, sum and quantile sketch of one key's prices"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.sketch = QuantileSketch()
+
+    def add(self, values, counts):
+        """Add distinct prices with their repeat counts"""
+        values = np.asarray(values, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.int64)
+        if not len(values):
+            return
+        self.count += int(counts.sum())
+        self.total += float((values * counts).sum())
+        low, high = float(values.min()), float(values.max())
+        self.minimum = low if self.minimum is None else min(self.minimum, low)
+        self.maximum = high if self.maximum is None else max(self.maximum, high)
+        self.sketch.add(values, counts)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q):
+        value = self.sketch.quantile(q)
+        if value is None:
+            return None
+        # Bucket representatives can fall just outside the observed range
+        return min(max(value, self.minimum), self.maximum)
+
+
+class PriceHistory:
+    """PriceStats per (code, year), fed frame by frame"""
+
+    def __init__(self):
+        self.stats = {}  # (code, year) -> PriceStats
+        self.rows = 0
+
+    def update(self, frame):
+        """Add a frame with code, year and amount columns; only positive amounts with a year count"""
+        amounts = pd.to_numeric(frame['amount'], errors='coerce')
+        keep = (amounts > 0) & frame['year'].notna()
+        if not keep.any():
+            return
+        prices = pd.DataFrame({
+            'code': frame['code'][keep].astype(str).to_numpy(),
+            'year': frame['year'][keep].astype(np.int64).to_numpy(),
+            # Cents, so 39.0 and 39.000000001 are one price
+            'amount': amounts[keep].round(2).to_numpy(dtype=np.float64),
+        })
+        self.rows += len(prices)
+        counts = prices.groupby(['code', 'year', 'amount'], sort=False).size()
+        for (code, year), group in counts.groupby(level=[0, 1], sort=False):
+            stats = self.stats.get((code, year))
+            if stats is None:
+                stats = self.stats[(code, year)] = PriceStats()
+            stats.add(group.index.get_level_values(2).to_numpy(), group.to_numpy())
+
+    def merge(self, other):
+        for key, stats in other.stats.items():
+            self.stats.setdefault(key, PriceStats()).merge(stats)
+        self.rows += other.rows
+        return self
+
+    def years(self, code):
+        """{year: PriceStats} for one code"""
+        return {year: stats for (c, year), stats in sorted(self.stats.items()) if c == code}
+
+    def suggested_price(self, code, min_prices=MIN_SUGGESTION_PRICES):
+        """
+        (price, basis) for a code: the median of its latest years, going back
+        until at least min_prices prices are covered. (None, 'No price') when
+        the code was never charged.
+        """
+        years = self.years(code)
+        if not years:
+            return None, 'No price'
+        merged = PriceStats()
+        for year in sorted(years, reverse=True):
+            merged.merge(years[year])
+            first = year
+            if merged.count >= min_prices:
+                break
+        latest = max(years)
+        span = str(latest) if first == latest else f"{first}-{latest}"
+        return round(merged.quantile(0.5), 2), f"median {span} ({merged.count} prices)"
+
+    def to_frame(self):
+        """The price-history table: one row per code and year"""
+        records = []
+        for (code, year), stats in sorted(self.stats.items()):
+            record = {'Code': code, 'Year': year, 'Prices': stats.count,
+                      'Min': stats.minimum, 'Mean': round(stats.mean, 2)}
+            for column, q in TABLE_QUANTILES:
+                record[column] = round(stats.quantile(q), 2)
+            record['Max'] = stats.maximum
+            record['Exact'] = 'Yes' if stats.sketch.is_exact else 'No'
+            records.append(record)
+        columns = ['Code', 'Year', 'Prices', 'Min', 'Mean'] + [c for c, _ in TABLE_QUANTILES] + ['Max', 'Exact']
+        return pd.DataFrame(records, columns=columns)
+
+    def write(self, output_path):
+        self.to_frame().to_excel(output_path, index=False)
+        return output_path
+
+
+def main():
+    # analyze_for_migration imports this module for its mapping
+    from analyze_for_migration import collect_procedure_rows
+
+    parser = argparse.ArgumentParser(description="Per-code, per-year price statistics for the DWC reports")
+    parser.add_argument("roots", nargs="*", help="directories of datasets (default: 02_Normalized)")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="price-history table to write")
+    parser.add_argument("--code", help="print one code's prices year by year instead of writing the table")
+    parser.add_argument("--memory-budget", type=float, metavar="MB",
+                        help="read files estimated to need more than this in chunks")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("DWC PRICE HISTORY")
+    print("=" * 80)
+    history = PriceHistory()
+    for root in args.roots or DEFAULT_ROOTS:
+        for path in sorted(list_datasets(root)):
+            for df in iter_frames(path, memory_budget_mb=args.memory_budget):
+                frame = collect_procedure_rows(df)
+                if frame is not None:
+                    history.update(frame)
+            print(f"  {path.name}")
+
+    codes = {code for code, _ in history.stats}
+    print(f"\n📊 {history.rows} priced rows, {len(codes)} codes, {len(history.stats)} code-years")
+    if args.code:
+        years = history.years(args.code)
+        if not years:
+            print(f"✗ No prices for '{args.code}'")
+            return
+        print(f"\n{args.code}")
+        print(f"  {'Year':6} {'Prices':>7} {'Min':>9} {'Median':>9} {'Mean':>9} {'Max':>9}")
+        for year, stats in years.items():
+            print(f"  {year:<6} {stats.count:7} {stats.minimum:9.2f} {stats.quantile(0.5):9.2f} "
+                  f"{stats.mean:9.2f} {stats.maximum:9.2f}")
+        price, basis = history.suggested_price(args.code)
+        print(f"\n  Suggested price: ${price:.2f} ({basis})")
+    else:
+        history.write(args.output)
+        print(f"✅ Price history saved to: {args.output}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
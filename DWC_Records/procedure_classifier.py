@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compiled keyword classifier for procedure codes and descriptions
+
+The keyword tables live in procedure_categories.json. Each category's keywords
+are compiled into one alternation regex. Categories are tried in file order,
+so priority (CONSULTATION before INJECTION_SERVICE, ...) is preserved.
+Frame classification runs over the distinct (procedure, description) pairs
+only and broadcasts the results back to every row.
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import json
+import re
+
+DEFAULT_CONFIG_PATH = Path(__file__).resolve().parent / "procedure_categories.json"
+
+# Joins procedure and description for matching; no keyword can span it
+FIELD_SEPARATOR = "\n"
+
+_classifier_cache = {}
+
+
+def _as_text(series):
+    """Vectorized str(value), rendering missing values as 'nan' like str() does"""
+    return series.astype(object).where(series.notna(), 'nan').astype(str)
+
+
+class ProcedureClassifier:
+    """Ordered keyword categories compiled to one regex each"""
+
+    def __init__(self, categories, default_category='UNCATEGORIZED'):
+        self.default_category = default_category
+        self.rules = []
+        for name, keywords in categories:
+            keywords = [k.lower() for k in keywords if k]
+            if not keywords:
+                continue
+            # Longest first so the alternation reports the most specific keyword
+            alternation = '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+            self.rules.append((name, re.compile(alternation)))
+
+    @classmethod
+    def from_config(cls, config_path=DEFAULT_CONFIG_PATH):
+        """Build a classifier from a procedure_categories.json style file"""
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        categories = [(c['name'], c['keywords']) for c in config['categories']]
+        return cls(categories, config.get('default_category', 'UNCATEGORIZED'))
+
+    @property
+    def category_names(self):
+        return [name for name, _ in self.rules] + [self.default_category]
+
+    def classify(self, procedure_str, description_str=""):
+        """Categorize one procedure/description pair"""
+        text = str(procedure_str).lower() + FIELD_SEPARATOR + str(description_str).lower()
+        for name, pattern in self.rules:
+            if pattern.search(text):
+                return name
+        return self.default_category
+
+    def classify_texts(self, texts):
+        """Categorize an array of already-joined, lowercased texts vectorially"""
+        texts = pd.Series(texts, dtype=object)
+        result = np.full(len(texts), self.default_category, dtype=object)
+        unassigned = np.ones(len(texts), dtype=bool)
+        for name, pattern in self.rules:
+            if not unassigned.any():
+                break
+            hits = texts[unassigned].str.contains(pattern, regex=True).to_numpy(dtype=bool)
+            positions = np.flatnonzero(unassigned)[hits]
+            result[positions] = name
+            unassigned[positions] = False
+        return result
+
+    def classify_frame(self, procedures, descriptions=None):
+        """
+        Categorize aligned procedure/description columns.
+
+        Only distinct pairs are matched; results are broadcast back by code.
+        Returns a Series indexed like procedures.
+        """
+        procedures = pd.Series(procedures)
+        if descriptions is None:
+            descriptions = pd.Series('', index=procedures.index)
+        descriptions = pd.Series(np.asarray(descriptions, dtype=object), index=procedures.index)
+
+        combined = _as_text(procedures) + FIELD_SEPARATOR + _as_text(descriptions)
+        codes, uniques = pd.factorize(combined)
+        categories = self.classify_texts([text.lower() for text in uniques])
+        return pd.Series(categories[codes], index=procedures.index, dtype=object)
+
+
+def load_classifier(config_path=DEFAULT_CONFIG_PATH):
+    """Return the classifier for a config file, recompiling only when it changes"""
+    config_path = Path(config_path)
+    mtime_ns = config_path.stat().st_mtime_ns
+    cached = _classifier_cache.get(config_path)
+    if cached is None or cached[0] != mtime_ns:
+        cached = (mtime_ns, ProcedureClassifier.from_config(config_path))
+        _classifier_cache[config_path] = cached
+    return cached[1]
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Export the Square migration mapping to the Square Catalog API
+
+Turns SQUARE_MIGRATION_MAPPING.xlsx into catalog upserts instead of the
+manual / CSV import in MIGRATION_STRATEGY_GUIDE.md (Step 2.2):
+    - one CATEGORY per Suggested Square Category ('Services > Treatments'
+      -> 'Treatments'), created first so items can reference real ids
+    - one ITEM per code with a single variation: SKU = code, price = the
+      Suggested Price (variable pricing when there is none), booking-required
+      codes as appointment services
+    - rows still marked NEEDS REVIEW are left out unless --include-review
+
+Items go out through /v2/catalog/batch-upsert in batches capped by object
+count and body size, several batches in flight at once over a pool of
+keep-alive connections. Every batch carries an idempotency key derived from
+its contents, so a retry after a timeout or 5xx can never create duplicates;
+429 and 5xx responses are retried with exponential backoff (honoring
+Retry-After). The Square ids and versions of everything uploaded are saved
+to a state file after each batch: a rerun after a partial failure sends
+only what is missing or changed, as updates of the existing objects.
+
+mock_square_server.py implements the endpoint locally, with injectable
+latency and failures, so all of this can be exercised offline.
+
+Usage:
+    python DWC_Records/square_export.py --dry-run --output /tmp/square_payloads.json
+    python DWC_Records/mock_square_server.py --fail-rate 0.2 &
+    python DWC_Records/square_export.py --base-url http://127.0.0.1:8766 --token test
+    SQUARE_ACCESS_TOKEN=... python DWC_Records/square_export.py     # Square sandbox
+"""
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+DWC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DWC_DIR.parent))
+
+from dataset_io import read_dataset
+from catalog_service import mapping_records, DEFAULT_MAPPING_PATH
+
+DEFAULT_BASE_URL = "https://connect.squareupsandbox.com"
+SQUARE_VERSION = "2024-10-17"
+UPSERT_PATH = "/v2/catalog/batch-upsert"
+DEFAULT_STATE_PATH = DWC_DIR / ".square_export_state.json"
+
+# Square allows 1,000 objects per batch; smaller batches keep retries cheap
+MAX_BATCH_OBJECTS = 1000
+DEFAULT_BATCH_OBJECTS = 200
+MAX_REQUEST_BYTES = 512 * 1024
+DEFAULT_CONCURRENCY = 4
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 0.5
+REQUEST_TIMEOUT = 30
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_SERVICE_MINUTES = 30
+CURRENCY = "USD"
+REVIEW_CATEGORY = 'NEEDS REVIEW'
+
+
+class SquareError(RuntimeError):
+    """A request Square rejected, or one that kept failing after every retry"""
+
+    def __init__(self, message, status=None, errors=None):
+        super().__init__(message)
+        self.status = status
+        self.errors = errors or []
+
+
+def _temp_id(kind, text):
+    """Client-side id ('#...') for an object Square has not seen yet"""
+    return f"#{kind}-{hashlib.sha1(str(text).encode('utf-8')).hexdigest()[:16]}"
+
+
+def category_name(square_category):
+    """'Services > Treatments' -> 'Treatments'"""
+    return str(square_category).split('>')[-1].strip()
+
+
+def item_fields(record):
+    """What an item's upsert says about a mapping record (ids and versions aside)"""
+    price = record.get('suggested_price')
+    return {
+        'code': record['code'],
+        'name': str(record.get('description') or record['code']).strip() or record['code'],
+        'category': category_name(record['square_category']),
+        'service': bool(record.get('booking_required')),
+        'price_cents': int(round(float(price) * 100)) if price is not None and float(price) > 0 else None,
+    }
+
+
+def fields_digest(fields):
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def category_object(name, known=None):
+    obj = {'type': 'CATEGORY', 'id': known['id'] if known else _temp_id('category', name),
+           'category_data': {'name': name}}
+    if known and known.get('version') is not None:
+        obj['version'] = known['version']
+    return obj
+
+
+def item_object(fields, category_id, known=None):
+    """CatalogObject (ITEM with one ITEM_VARIATION) for item_fields(); known holds existing ids/versions"""
+    known = known or {}
+    item_id = known.get('item_id') or _temp_id('item', fields['code'])
+    variation = {
+        'item_id': item_id,
+        'name': 'Regular',
+        'sku': fields['code'],
+        'pricing_type': 'FIXED_PRICING' if fields['price_cents'] is not None else 'VARIABLE_PRICING',
+    }
+    if fields['price_cents'] is not None:
+        variation['price_money'] = {'amount': fields['price_cents'], 'currency': CURRENCY}
+    if fields['service']:
+        variation['service_duration'] = DEFAULT_SERVICE_MINUTES * 60 * 1000
+        variation['available_for_booking'] = True
+    variation_object = {'type': 'ITEM_VARIATION',
+                        'id': known.get('variation_id') or _temp_id('variation', fields['code']),
+                        'item_variation_data': variation}
+    item_data = {
+        'name': fields['name'],
+        'description': f"DWC code {fields['code']}",
+        'categories': [{'id': category_id}],
+        'product_type': 'APPOINTMENTS_SERVICE' if fields['service'] else 'REGULAR',
+        'variations': [variation_object],
+    }
+    obj = {'type': 'ITEM', 'id': item_id, 'item_data': item_data}
+    if known.get('version') is not None:
+        obj['version'] = known['version']
+    if known.get('variation_version') is not None:
+        variation_object['version'] = known['variation_version']
+    return obj
+
+
+def object_count(obj):
+    """Objects Square counts for one upserted object (an item counts its variations)"""
+    return 1 + len(obj.get('item_data', {}).get('variations', []))
+
+
+def plan_batches(objects, max_objects=DEFAULT_BATCH_OBJECTS, max_bytes=MAX_REQUEST_BYTES):
+    """Split objects into batches under both the object-count and body-size caps"""
+    batches, current, count, size = [], [], 0, 0
+    for obj in objects:
+        n, b = object_count(obj), len(json.dumps(obj))
+        if current and (count + n > max_objects or size + b > max_bytes):
+            batches.append(current)
+            current, count, size = [], 0, 0
+        current.append(obj)
+        count += n
+        size += b
+    if current:
+        batches.append(current)
+    return batches
+
+
+def idempotency_key(objects):
+    """Same objects, same key: a retried batch is recognized by Square as already applied"""
+    digest = hashlib.sha256(json.dumps(objects, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"dwc-{digest[:48]}"
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, handed out one per request"""
+
+    def __init__(self, base_url, size=DEFAULT_CONCURRENCY, timeout=REQUEST_TIMEOUT):
+        url = urlparse(base_url)
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port
+        self.timeout = timeout
+        self.idle = queue.LifoQueue(maxsize=size)
+        self.created = 0
+
+    def _connect(self):
+        self.created += 1
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers dict, body bytes); a connection that errors is dropped, not reused"""
+        try:
+            connection = self.idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            data = response.read()
+            result = response.status, {k.lower(): v for k, v in response.getheaders()}, data
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                self.idle.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+        return result
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SquareCatalogClient:
+    """batch-upsert with retries over a ConnectionPool"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, token=None, pool_size=DEFAULT_CONCURRENCY,
+                 max_attempts=MAX_ATTEMPTS, backoff=BACKOFF_SECONDS):
+        self.pool = ConnectionPool(base_url, pool_size)
+        self.token = token
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _headers(self):
+        return {
+            'Authorization': f"Bearer {self.token}",
+            'Square-Version': SQUARE_VERSION,
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+
+    def batch_upsert(self, objects, key=None):
+        """Upsert one batch; returns Square's response JSON"""
+        body = json.dumps({'idempotency_key': key or idempotency_key(objects),
+                           'batches': [{'objects': objects}]}).encode('utf-8')
+        last_error = None
+        for attempt in range(1, self.max_attempts + 1):
+            with self._lock:
+                self.requests += 1
+                self.retries += attempt > 1
+            retry_after = None
+            try:
+                status, headers, data = self.pool.request('POST', UPSERT_PATH, body, self._headers())
+            except (OSError, http.client.HTTPException) as e:
+                last_error = SquareError(f"{type(e).__name__}: {e}")
+            else:
+                try:
+                    payload = json.loads(data or b'{}')
+                except ValueError:
+                    payload = {}
+                if status == 200:
+                    return payload
+                errors = payload.get('errors', [])
+                detail = '; '.join(f"{e.get('code')}: {e.get('detail')}" for e in errors) or data[:200]
+                last_error = SquareError(f"HTTP {status}: {detail}", status, errors)
+                if status not in RETRYABLE_STATUSES:
+                    raise last_error
+                try:
+                    retry_after = float(headers.get('retry-after'))
+                except (TypeError, ValueError):
+                    retry_after = None
+            if attempt < self.max_attempts:
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                delay = random.uniform(0, self.backoff * 2 ** (attempt - 1))
+                time.sleep(max(delay, retry_after or 0))
+        raise last_error
+
+    def close(self):
+        self.pool.close()
+
+
+class ExportState:
+    """Square ids, versions and content digests of what has been uploaded, saved as JSON"""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = Path(path) if path else None
+        self.categories = {}  # name -> {'id', 'version'}
+        self.items = {}  # code -> {'item_id', 'variation_id', 'version', 'variation_version', 'digest'}
+        if self.path and self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.categories = saved.get('categories', {})
+            self.items = saved.get('items', {})
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'categories': self.categories, 'items': self.items}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def _real_ids(response):
+    """client id -> Square id, and Square id -> version, from a batch-upsert response"""
+    mapping = {m['client_object_id']: m['object_id'] for m in response.get('id_mappings', [])}
+    versions = {}
+    for obj in response.get('objects', []):
+        versions[obj['id']] = obj.get('version')
+        for variation in obj.get('item_data', {}).get('variations', []):
+            versions[variation['id']] = variation.get('version')
+    return mapping, versions
+
+
+def _square_id(mapping, client_id):
+    """The Square id for an object id sent in an upsert; '#' ids must have been mapped"""
+    if not client_id.startswith('#'):
+        return client_id
+    if client_id not in mapping:
+        raise SquareError(f"batch-upsert response has no id mapping for {client_id}")
+    return mapping[client_id]
+
+
+class CatalogExporter:
+    """Plans the upserts for a mapping and sends them concurrently, recording progress in an ExportState"""
+
+    def __init__(self, client, state, batch_objects=DEFAULT_BATCH_OBJECTS, concurrency=DEFAULT_CONCURRENCY,
+                 include_review=False):
+        self.client = client
+        self.state = state
+        self.batch_objects = min(batch_objects, MAX_BATCH_OBJECTS)
+        self.concurrency = concurrency
+        self.include_review = include_review
+        self.failures = []  # (codes, error message)
+        self.uploaded = 0
+        self.unchanged = 0
+
+    def pending(self, records):
+        """item_fields() of records that are new or changed since the last export"""
+        fields = []
+        for record in records:
+            if record.get('code') in (None, '', 'nan'):
+                continue
+            if not self.include_review and record.get('square_category') == REVIEW_CATEGORY:
+                continue
+            item = item_fields(record)
+            known = self.state.items.get(item['code'])
+            if known and known.get('digest') == fields_digest(item):
+                self.unchanged += 1
+                continue
+            fields.append(item)
+        return fields
+
+    def sync_categories(self, names):
+        """Create the categories not in the state yet; one request"""
+        missing = sorted(name for name in set(names) if name not in self.state.categories)
+        if not missing:
+            return
+        response = self.client.batch_upsert([category_object(name) for name in missing])
+        mapping, versions = _real_ids(response)
+        # A '#' id is only the request's placeholder: never keep one as a category's id
+        unmapped = []
+        for name in missing:
+            try:
+                category_id = _square_id(mapping, _temp_id('category', name))
+            except SquareError:
+                unmapped.append(name)
+                continue
+            self.state.categories[name] = {'id': category_id, 'version': versions.get(category_id)}
+        self.state.save()
+        if unmapped:
+            raise SquareError(f"batch-upsert response has no id mapping for categories: {', '.join(unmapped)}")
+
+    def _record_batch(self, batch, response):
+        mapping, versions = _real_ids(response)
+        entries = {}
+        for obj, item in batch:
+            item_id = _square_id(mapping, obj['id'])
+            variation_id = _square_id(mapping, obj['item_data']['variations'][0]['id'])
+            entries[item['code']] = {
+                'item_id': item_id, 'variation_id': variation_id,
+                'version': versions.get(item_id), 'variation_version': versions.get(variation_id),
+                'digest': fields_digest(item),
+            }
+        # Only whole batches are recorded, so a rejected one is retried entirely
+        self.state.items.update(entries)
+        self.uploaded += len(batch)
+        self.state.save()
+
+    def plan(self, records):
+        """The item batches a run would send, as lists of (object, item_fields) pairs"""
+        return self._batches(self.pending(records))
+
+    def _batches(self, fields):
+        objects = []
+        for item in fields:
+            category = self.state.categories.get(item['category']) or {'id': _temp_id('category', item['category'])}
+            objects.append((item_object(item, category['id'], self.state.items.get(item['code'])), item))
+        by_id = {obj['id']: (obj, item) for obj, item in objects}
+        return [[by_id[obj['id']] for obj in batch]
+                for batch in plan_batches([obj for obj, _ in objects], self.batch_objects)]
+
+    def export(self, records, progress=None):
+        """Upload new and changed items; returns the number of batches sent"""
+        fields = self.pending(records)
+        if not fields:
+            return 0
+        self.sync_categories(item['category'] for item in fields)
+        batches = self._batches(fields)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="square-upsert") as executor:
+            futures = {executor.submit(self.client.batch_upsert, [obj for obj, _ in batch]): batch
+                       for batch in batches}
+            # State is only touched here, on the calling thread
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    self._record_batch(batch, future.result())
+                    if progress:
+                        progress(f"  ✓ {len(batch)} items")
+                except SquareError as e:
+                    self.failures.append(([item['code'] for _, item in batch], str(e)))
+                    if progress:
+                        progress(f"  ✗ {len(batch)} items: {e}")
+        return len(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload the Square migration mapping to the Square catalog")
+    parser.add_argument("--mapping", default=str(DEFAULT_MAPPING_PATH), help="mapping workbook (or columnar copy)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL,
+                        help="Square API base URL (default: sandbox; the mock server is http://127.0.0.1:8766)")
+    parser.add_argument("--token", default=os.environ.get("SQUARE_ACCESS_TOKEN"),
+                        help="access token (default: $SQUARE_ACCESS_TOKEN)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_OBJECTS,
+                        help=f"objects per request, at most {MAX_BATCH_OBJECTS}")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="requests in flight at once")
+    parser.add_argument("--state", default=str(DEFAULT_STATE_PATH),
+                        help="progress file that makes reruns resume ('' to keep none)")
+    parser.add_argument("--reset", action="store_true", help="ignore the state file and upload everything")
+    parser.add_argument("--include-review", action="store_true", help="also upload NEEDS REVIEW rows")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan and write payloads, send nothing")
+    parser.add_argument("--output", help="with --dry-run, write the batch payloads here as JSON")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("SQUARE CATALOG EXPORT")
+    print("=" * 80)
+    records = mapping_records(read_dataset(args.mapping))
+    if args.reset and args.state and Path(args.state).exists():
+        Path(args.state).unlink()
+    state = ExportState(args.state or None)
+
+    if args.dry_run:
+        exporter = CatalogExporter(None, state, args.batch_size, args.concurrency, args.include_review)
+        batches = exporter.plan(records)
+        items = sum(len(batch) for batch in batches)
+        print(f"📊 {len(records)} mapping rows: {items} items to upload in {len(batches)} batches, "
+              f"{exporter.unchanged} unchanged since the last export")
+        if args.output:
+            payloads = [{'idempotency_key': idempotency_key([obj for obj, _ in batch]),
+                         'batches': [{'objects': [obj for obj, _ in batch]}]} for batch in batches]
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(payloads, f, indent=2)
+            print(f"✅ Payloads saved to: {args.output}")
+        print("=" * 80)
+        return
+
+    if not args.token:
+        parser.error("an access token is required (--token or SQUARE_ACCESS_TOKEN)")
+    client = SquareCatalogClient(args.base_url, args.token, pool_size=args.concurrency)
+    exporter = CatalogExporter(client, state, args.batch_size, args.concurrency, args.include_review)
+    start = time.perf_counter()
+    try:
+        batches = exporter.export(records, progress=print)
+    except SquareError as e:
+        print(f"✗ Category upsert failed: {e}")
+        sys.exit(1)
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"✅ Uploaded {exporter.uploaded} items in {batches} batches ({elapsed:.2f}s, "
+          f"{client.requests} requests, {client.retries} retries, {client.pool.created} connections)")
+    print(f"  Unchanged since the last export: {exporter.unchanged}")
+    if exporter.failures:
+        failed = sum(len(codes) for codes, _ in exporter.failures)
+        print(f"✗ {failed} items in {len(exporter.failures)} batches failed; rerun to retry just those")
+        for codes, message in exporter.failures:
+            print(f"  {len(codes)} items ({', '.join(codes[:3])}{' ...' if len(codes) > 3 else ''}): {message}")
+    print("=" * 80)
+    if exporter.failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
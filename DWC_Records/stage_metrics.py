@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Per-file, per-stage instrumentation for the DWC pipelines
+
+Each processed file gets a FileMetrics recorder. Code wraps its stages in
+`with metrics.stage('read') as stage:` and sets stage.rows once it knows
+them; the recorder keeps duration, rows/sec and memory per stage:
+    rss_growth_mb   how far the stage raised the process's peak RSS (always);
+                    0 when it stayed below a peak an earlier stage or file
+                    set, so it shows which stage drives the high-water mark.
+                    None where the peak cannot be read (no `resource`
+                    module, e.g. Windows, and no psutil)
+    peak_traced_mb  peak Python/numpy allocations made during the stage
+                    (only with trace_memory - tracemalloc slows the run down
+                    and only runs while a stage does)
+
+Files and runs also record process_peak_rss_mb, the process's high-water
+mark so far. It is cumulative: in a serial run or a pool worker it includes
+every earlier file the process handled.
+
+With a profile_path the whole file is also run under cProfile and the
+stats are dumped there (inspect with `python -m pstats <file>.prof`).
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+METRICS_NAME = "NORMALIZATION_METRICS.json"
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far in MB (it never goes down), or None if unknown"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        # Windows: the peak working set is the equivalent high-water mark
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        return peak / (1024 * 1024) if peak is not None else None
+    return None
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds) if rows and seconds else None
+
+
+class StageRecord:
+    """Measurements of one stage; callers fill in rows"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+        self.seconds = 0.0
+        self.rss_growth_mb = 0.0
+        self.peak_traced_mb = None
+
+    def as_dict(self):
+        record = {
+            'seconds': round(self.seconds, 4),
+            'rows': self.rows,
+            'rows_per_second': _rate(self.rows, self.seconds),
+            'rss_growth_mb': _round(self.rss_growth_mb),
+        }
+        if self.peak_traced_mb is not None:
+            record['peak_traced_mb'] = self.peak_traced_mb
+        return record
+
+
+class FileMetrics:
+    """Stage timings and memory for one file"""
+
+    def __init__(self, file_path, trace_memory=False, profile_path=None):
+        self.file = str(file_path)
+        self.trace_memory = trace_memory
+        self.profile_path = Path(profile_path) if profile_path else None
+        self.stages = {}
+        self.rows = None
+        self.status = None
+        self.seconds = 0.0
+        self._start = None
+        self._profiler = None
+
+    def start(self):
+        if self.profile_path is not None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+
+    def finish(self, status):
+        self.seconds = time.perf_counter() - self._start
+        self.status = status
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile_path.parent.mkdir(parents=True, exist_ok=True)
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage; repeated stages of the same name accumulate"""
+        record = self.stages.setdefault(name, StageRecord(name))
+        started_tracing = False
+        traced_before = 0
+        if self.trace_memory:
+            # Stages of one file can run in different processes (pipelined
+            # runs), so each stage traces in its own process and stops again
+            if tracemalloc.is_tracing():
+                traced_before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                started_tracing = True
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds += time.perf_counter() - start
+            rss_after = peak_rss_mb()
+            if rss_before is None or rss_after is None:
+                record.rss_growth_mb = None
+            elif record.rss_growth_mb is not None:
+                record.rss_growth_mb += rss_after - rss_before
+            if self.trace_memory:
+                peak = (tracemalloc.get_traced_memory()[1] - traced_before) / (1024 * 1024)
+                record.peak_traced_mb = round(max(peak, record.peak_traced_mb or 0), 1)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def as_dict(self):
+        record = {
+            'file': self.file,
+            'status': self.status,
+            'rows': self.rows,
+            'seconds': round(self.seconds, 4),
+            'rows_per_second': _rate(self.rows, self.seconds),
+            'process_peak_rss_mb': _round(peak_rss_mb()),
+            'pid': os.getpid(),
+            'stages': {name: stage.as_dict() for name, stage in self.stages.items()},
+        }
+        if self.profile_path is not None:
+            record['profile'] = str(self.profile_path)
+        return record
+
+
+def profile_path_for(profile_dir, file_path):
+    """Where a file's cProfile dump goes, or None when profiling is off"""
+    if not profile_dir:
+        return None
+    return Path(profile_dir) / f"{Path(file_path).stem}.prof"
+
+
+def summarize_stages(file_records):
+    """Total seconds and rows per stage across files"""
+    totals = {}
+    for record in file_records:
+        for name, stage in record['stages'].items():
+            total = totals.setdefault(name, {'seconds': 0.0, 'rows': 0})
+            total['seconds'] += stage['seconds']
+            total['rows'] += stage['rows'] or 0
+    for total in totals.values():
+        total['seconds'] = round(total['seconds'], 4)
+        total['rows_per_second'] = _rate(total['rows'], total['seconds'])
+    return totals
+
+
+def save_metrics(metrics_log, output_dir, run_info=None, name=METRICS_NAME):
+    """Write per-file metrics plus stage totals as JSON; returns the path"""
+    file_records = list(metrics_log.values())
+    metrics_path = Path(output_dir) / name
+    with open(metrics_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'run': dict(run_info or {}, process_peak_rss_mb=_round(peak_rss_mb())),
+            'stage_totals': summarize_stages(file_records),
+            'files': file_records,
+        }, f, indent=2)
+    return metrics_path
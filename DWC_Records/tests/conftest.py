@@ -0,0 +1,71 @@
+"""
+Shared fixtures for the DWC Records tests
+
+The scripts import each other by module name, so DWC_Records (and the repo
+root, for extract_procedures.py) go on sys.path. The workbook cache is
+pointed at a throwaway directory before any module reads DWC_CACHE_DIR.
+"""
+from pathlib import Path
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+DWC_DIR = Path(__file__).resolve().parent.parent
+for path in (DWC_DIR, DWC_DIR.parent, DWC_DIR / "Utilities"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+_CACHE_ROOT = tempfile.mkdtemp(prefix="dwc_test_cache_")
+os.environ["DWC_CACHE_DIR"] = _CACHE_ROOT
+os.environ["DWC_DAEMON_FILE"] = os.path.join(_CACHE_ROOT, "daemon.json")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_CACHE_ROOT, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Every test starts without cache entries"""
+    from workbook_cache import clear_cache
+    clear_cache()
+    yield
+
+
+def payment_rows(count):
+    """Payment Distribution rows as the export writes them: amounts are often text ('0.00')"""
+    codes = ['D0120', 'D1110', '99213', 'Misc.', '1.5 P 15']
+    rows = []
+    for i in range(count):
+        rows.append([
+            1000 + i % 37,
+            f"Patient {i % 91}",
+            codes[i % len(codes)],
+            f"{1 + i % 12:02d}/{1 + i % 28:02d}/2019",
+            f"{(i % 7) * 12.5:.2f}" if i % 3 else (i % 7) * 12.5,
+            '0.00' if i % 2 else float(i % 5),
+            f"CHK{i % 13}" if i % 4 else None,
+            'Payment' if i % 2 else 'Charge',
+        ])
+    return rows
+
+
+PAYMENT_HEADER = ['Account Number', 'Patient Name', 'Procedure Code', 'Service Date',
+                  'Charge', 'Applied', 'Check #', 'Tran Type']
+
+
+@pytest.fixture
+def payment_workbook(tmp_path):
+    """A small uncached Payment Distribution workbook with text-typed numbers"""
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(PAYMENT_HEADER)
+    for row in payment_rows(3500):
+        sheet.append(row)
+    path = tmp_path / "PaymentDistributionReportJan-1-2019-Jan-1-2020.xlsx"
+    workbook.save(path)
+    return path
@@ -0,0 +1,45 @@
+import json
+import threading
+from http.client import HTTPConnection
+
+import pandas as pd
+import pytest
+
+import catalog_service
+
+
+@pytest.fixture
+def server(tmp_path):
+    mapping = tmp_path / "SQUARE_MIGRATION_MAPPING.parquet"
+    pd.DataFrame({'Current Code': ['99213', 'LIPO 1'], 'Description': ['Office visit', 'Lipo shot'],
+                  'Usage Count': [3, 5], 'Pricing': ['$10.00', 'No price']}).to_parquet(mapping)
+    server = catalog_service.make_server(mapping, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post_batch(server, body):
+    connection = HTTPConnection(*server.server_address)
+    connection.request('POST', '/batch', json.dumps(body))
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    connection.close()
+    return response.status, payload
+
+
+def test_batch_lookup(server):
+    status, payload = post_batch(server, {'codes': ['99213', 'lipo-1', 'nope']})
+    assert status == 200
+    assert payload['results']['99213']['description'] == 'Office visit'
+    assert payload['results']['lipo-1']['code'] == 'LIPO 1'
+    assert payload['results']['nope'] is None
+
+
+@pytest.mark.parametrize("codes", ["99213", 99213, [99213], {'a': 1}, ['99213', None]])
+def test_batch_rejects_codes_that_are_not_a_list_of_strings(server, codes):
+    status, payload = post_batch(server, {'codes': codes})
+    assert status == 400
+    assert 'list of strings' in payload['error']
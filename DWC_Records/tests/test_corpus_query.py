@@ -0,0 +1,42 @@
+import pytest
+
+import corpus_query
+from workbook_cache import read_workbook
+
+FILTERS = [
+    [('Check #', '!=', 'zzz')],
+    [('Check #', '!=', 'CHK1')],
+    [('Check #', 'not in', ('CHK1', 'CHK2'))],
+    [('Check #', 'in', ('CHK1', 'CHK2'))],
+    [('Tran Type', '==', 'Payment'), ('Charge', '>=', 25)],
+    [('Applied', '<', 1)],
+]
+
+
+def run(workbook, filters):
+    query = corpus_query.scan([workbook.parent]).report('Payment Distribution')
+    for column, op, value in filters:
+        query = query.where(column, op, value)
+    return query.collect(compact=False)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pushdown_matches_pandas_filtering(payment_workbook, monkeypatch, filters):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    uncached = run(payment_workbook, filters)
+    monkeypatch.delenv("DWC_NO_CACHE")
+
+    read_workbook(payment_workbook)
+    assert corpus_query._parquet_source(payment_workbook) is not None
+    cached = run(payment_workbook, filters)
+
+    assert len(uncached) > 0
+    assert len(cached) == len(uncached)
+    assert sorted(cached['Account Number']) == sorted(uncached['Account Number'])
+
+
+def test_not_equal_keeps_missing_values(payment_workbook):
+    read_workbook(payment_workbook)
+    rows = run(payment_workbook, [('Check #', '!=', 'zzz')])
+    assert len(rows) == 3500
+    assert rows['Check #'].isna().sum() == 875
@@ -0,0 +1,28 @@
+import pytest
+
+from analyze_for_migration import build_migration_mapping
+from corpus_scanner import ReportAggregator
+
+
+def test_aggregators_must_implement_update_and_finalize():
+    class Incomplete(ReportAggregator):
+        def update(self, df, file_path, report_type):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_migration_mapping_can_be_built_quietly(tmp_path, capsys):
+    procedures = {
+        'wkly': {'description': 'Weekly visit', 'category': 'CONSULTATION', 'prices': [25.0], 'usage_count': 120},
+        'B12': {'description': 'B12 injection', 'category': 'INJECTION_SERVICE', 'prices': [], 'usage_count': 4},
+    }
+    output = tmp_path / "mapping.xlsx"
+    quiet = build_migration_mapping(procedures, output, verbose=False)
+    assert capsys.readouterr().out == ""
+    assert output.exists()
+    assert quiet['Current Code'].tolist() == ['wkly', 'B12']
+
+    build_migration_mapping(procedures, output)
+    assert "FOUND 2 UNIQUE PROCEDURES" in capsys.readouterr().out
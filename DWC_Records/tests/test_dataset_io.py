@@ -0,0 +1,55 @@
+from datetime import datetime
+import os
+
+import pandas as pd
+import pytest
+
+import corpus_query
+import dataset_io
+import frame_loader
+
+
+def mixed_frame():
+    return pd.DataFrame({
+        'Procedure Code': pd.Series([123, '123', 'D0120', None, 45.5, datetime(2020, 1, 2), True], dtype=object),
+        'Charge': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+    })
+
+
+@pytest.mark.parametrize("output_format", ['parquet', 'feather'])
+def test_mixed_columns_round_trip(tmp_path, output_format):
+    df = mixed_frame()
+    path = dataset_io.write_dataset(df, tmp_path / f"Codes.{output_format}")
+
+    assert dataset_io.dataset_header(path) == ['Procedure Code', 'Charge']
+    for columns in (None, ['Procedure Code'], ['Charge']):
+        read = dataset_io.read_dataset(path, columns)
+        expected = df if columns is None else df[columns]
+        assert list(read.columns) == list(expected.columns)
+        for column in expected.columns:
+            assert [(type(v), v) for v in read[column].dropna()] == \
+                [(type(v), v) for v in expected[column].dropna()]
+
+    chunks = list(frame_loader.iter_chunks(path, chunk_rows=3))
+    assert pd.concat(chunks)['Procedure Code'].tolist()[:3] == [123, '123', 'D0120']
+
+
+def test_mixed_parquet_is_not_pushed_down(tmp_path):
+    path = dataset_io.write_dataset(mixed_frame(), tmp_path / "Codes.parquet")
+    assert corpus_query._parquet_source(path) is None
+    plain = dataset_io.write_dataset(pd.DataFrame({'Charge': [1.0]}), tmp_path / "Plain.parquet")
+    assert corpus_query._parquet_source(plain) == plain
+
+
+def test_csv_does_not_shadow_a_newer_workbook(tmp_path):
+    df = pd.DataFrame({'Procedure Code': ['00123', 'D0120']})
+    csv_path = dataset_io.write_dataset(df, tmp_path / "Codes.csv")
+    xlsx_path = dataset_io.write_dataset(df, tmp_path / "Codes.xlsx", remove_stale=False)
+    os.utime(csv_path, ns=(1, 1))
+
+    assert dataset_io.preferred_copy(csv_path) == xlsx_path
+    assert dataset_io.list_datasets(tmp_path) == [xlsx_path]
+    assert dataset_io.read_dataset(csv_path)['Procedure Code'].tolist() == ['00123', 'D0120']
+
+    os.utime(xlsx_path, ns=(0, 0))
+    assert dataset_io.preferred_copy(xlsx_path) == csv_path
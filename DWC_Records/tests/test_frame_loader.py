@@ -0,0 +1,80 @@
+import pandas as pd
+
+import frame_loader
+
+# Well under the fixture's loaded size, so it is read in chunks
+BUDGET_MB = 0.1
+
+
+def test_chunked_read_matches_whole_file(payment_workbook, monkeypatch):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    whole = pd.read_excel(payment_workbook)
+    chunks = list(frame_loader.iter_frames(payment_workbook, memory_budget_mb=BUDGET_MB, compact=False))
+
+    assert len(chunks) > 1
+    chunked = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(chunked, whole, check_dtype=False)
+    assert chunked['Charge'].dtype.kind == 'f'
+    assert chunked['Applied'].dtype.kind == 'f'
+
+
+def test_compacted_chunks_keep_numeric_columns(payment_workbook, monkeypatch):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    whole = frame_loader.load_frame(payment_workbook)
+    report = frame_loader.MemoryReport()
+    chunks = list(frame_loader.iter_frames(payment_workbook, memory_budget_mb=BUDGET_MB, report=report))
+
+    assert report.chunked == [payment_workbook.name]
+    for chunk in chunks:
+        assert chunk['Charge'].dtype.kind in 'iuf'
+    assert sum(chunk['Charge'].sum() for chunk in chunks) == whole['Charge'].sum()
+    assert sum(len(chunk) for chunk in chunks) == len(whole)
+
+
+def test_chunked_read_projects_columns(payment_workbook, monkeypatch):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    columns = ['Account Number', 'Charge']
+    chunked = pd.concat(frame_loader.iter_chunks(payment_workbook, columns, chunk_rows=1000), ignore_index=True)
+    pd.testing.assert_frame_equal(chunked, pd.read_excel(payment_workbook, usecols=columns), check_dtype=False)
+
+
+def write_drifting_workbook(path):
+    """Columns whose cells differ in kind from one chunk to the next"""
+    from datetime import datetime
+    from openpyxl import Workbook
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Procedure Code', 'Service Date', 'Charge', 'Flag', 'Note', 'Mixed'])
+    for i in range(3000):
+        sheet.append([
+            'A1' if i == 2900 else (99213 if i % 3 else None),
+            datetime(2020, 1, 1 + i % 28) if i < 1000 else None,
+            '0.00' if i % 2 else 5,
+            i % 2 == 0 if i < 2000 else None,
+            'late note' if i >= 2500 else None,
+            '5.50' if i < 1500 else ('x' if i % 2 else None),
+        ])
+    workbook.save(path)
+
+
+def test_chunks_get_whole_file_dtypes(tmp_path, monkeypatch):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    path = tmp_path / "Drifting.xlsx"
+    write_drifting_workbook(path)
+
+    whole = pd.read_excel(path)
+    chunks = list(frame_loader.iter_chunks(path, chunk_rows=1000))
+    assert chunks[0]['Procedure Code'].tolist()[1:3] == [99213, 99213]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), whole)
+
+    csv_path = tmp_path / "Drifting.csv"
+    whole.to_csv(csv_path, index=False)
+    chunks = list(frame_loader.iter_chunks(csv_path, chunk_rows=1000))
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), pd.read_csv(csv_path, low_memory=False))
+
+
+def test_whole_numbers_are_not_narrowed_below_int32():
+    small = frame_loader._downcast(pd.Series([100.0, 120.0]))
+    assert small.dtype == 'int32'
+    assert (small + small).tolist() == [200, 240]
+    assert frame_loader._downcast(pd.Series([3e9, 1.0])).dtype == 'int64'
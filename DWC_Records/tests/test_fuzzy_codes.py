@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from fuzzy_codes import CodeIndex, build_canonical_mapping, compact_key, compact_keys, find_merge_candidates
+
+
+@pytest.mark.parametrize("a, b", [
+    ('Misc', 'Misc.'),
+    ('B-12', 'B12'),
+    ('Cholest', 'Cholest.'),
+    ('37.5 P 15', '37.5P15'),
+    ('wkly', ' WKLY '),
+])
+def test_spelling_variants_share_a_key(a, b):
+    assert compact_key(a) == compact_key(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ('1.5 P 15', '15 P 15'),
+    ('37.5 P 15', '375 P 15'),
+    ('2.5', '25'),
+])
+def test_decimal_points_are_kept(a, b):
+    assert compact_key(a) != compact_key(b)
+
+
+def test_compact_key_examples():
+    assert compact_key('1.5 P 15') == '1.5p15'
+    assert compact_key('Cholest.T') == 'cholestt'
+    assert compact_key('B.12') == 'b12'
+    assert compact_key('12.') == '12'
+
+
+def test_decimal_codes_are_not_auto_merged():
+    stats = {code: {'usage_count': n, 'description': ''} for code, n in
+             [('1.5 P 15', 10), ('15 P 15', 3), ('Misc', 8), ('Misc.', 2)]}
+    candidates = find_merge_candidates(stats)
+    mapping = build_canonical_mapping(candidates, stats)
+    assert mapping == {'Misc.': 'Misc'}
+
+
+def test_compact_keys_matches_compact_key():
+    codes = pd.Series(['1.5 P 15', 'Misc.', 'B-12', '37.5 p_15', None, ' wkly ', 'Cholest.T', '12.'])
+    expected = ['' if pd.isna(c) else compact_key(c) for c in codes]
+    assert compact_keys(codes).tolist() == expected
+
+
+def test_identical_keys_of_common_trigrams_are_candidates():
+    # Every trigram of 'D0120' / 'D-0120' is shared by more than MAX_POSTING_SIZE codes
+    codes = {f"D0120{n:04d}": {'usage_count': 1, 'description': ''} for n in range(1200)}
+    codes.update({f"{n:04d}D0120": {'usage_count': 1, 'description': ''} for n in range(1200)})
+    codes['D0120'] = {'usage_count': 5, 'description': ''}
+    codes['D-0120'] = {'usage_count': 1, 'description': ''}
+
+    index = CodeIndex(sorted(codes))
+    i = index.codes.index('D-0120')
+    assert all(len(index.postings[gram]) > index.max_posting_size for gram in index.grams[i])
+    assert index.codes.index('D0120') in set(index.candidates(i))
+    assert [index.codes[j] for _, j in index.lookup('d 0120', limit=2)] == ['D-0120', 'D0120']
+
+    candidates = find_merge_candidates(codes, min_score=100)
+    assert build_canonical_mapping(candidates, codes) == {'D-0120': 'D0120'}
@@ -0,0 +1,155 @@
+"""
+The compiled rules in normalization_rules.json must normalize exactly like
+the hard-coded normalizers normalize_categories.py had before them, which
+are kept here as the reference.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import normalization_rules
+from normalization_rules import RuleError, RuleSet, Step, load_rules
+from normalize_categories import normalize_column, normalize_frame
+
+CANONICAL = {'B-12': 'B12', '37.5 p15': '37.5 P 15'}
+
+TRAN_TYPE_MAPPING = {
+    'patient referrel': 'Patient Referral',
+    'empolyee discount': 'Employee Discount',
+    'None Entered': 'None Entered',
+    'Credit Card': 'Credit Card',
+    'Debit Card': 'Debit Card',
+    'Cash': 'Cash',
+    'Check': 'Check',
+    'Coupon': 'Coupon',
+    'transfer': 'Transfer',
+}
+GENDER_MAPPING = {'person': 'Other', 'female': 'Female', 'male': 'Male'}
+
+
+def legacy_provider(value):
+    if pd.isna(value):
+        return value
+    provider = str(value).strip()
+    words = provider.split()
+    if len(words) >= 4:
+        half = len(words) // 2
+        if ' '.join(words[:half]) == ' '.join(words[half:2 * half]):
+            return ' '.join(words[:half])
+    return provider
+
+
+def legacy_tran_type(value):
+    if pd.isna(value):
+        return value
+    text = str(value).strip()
+    return TRAN_TYPE_MAPPING.get(text, text)
+
+
+def legacy_gender(value):
+    if pd.isna(value):
+        return value
+    lowered = str(value).strip().lower()
+    for key, mapped in GENDER_MAPPING.items():
+        if lowered == key.lower():
+            return mapped
+    return str(value).strip().capitalize()
+
+
+def legacy_procedure_code(value):
+    if pd.isna(value):
+        return value
+    code = re.sub(r'\s+', ' ', str(value).strip())
+    return CANONICAL.get(code, code)
+
+
+CASES = {
+    'gender': (legacy_gender, ['female', 'male', 'person', 'FEMALE', ' Male ', 'Female', 'unknown', 'oTHER',
+                               ' None Entered ', '', None, np.nan]),
+    'tran_type': (legacy_tran_type, ['empolyee discount', 'patient referrel', 'transfer', ' transfer ',
+                                     'Transfer', 'Credit Card', ' None Entered ', 'Empolyee Discount',
+                                     None, 'Coupon']),
+    'provider': (legacy_provider, ['New Patient Clermont New Patient Clermont', 'Dr A Dr A',
+                                   ' Ocoee Ocoee Office Ocoee Ocoee Office ', 'Dr Smith', 'A B A B C',
+                                   None, 'x y z x y z']),
+    'procedure_code': (legacy_procedure_code, ['B-12', ' 37.5   p15 ', '37.5 p15', 'wkly', 99213, 12.5,
+                                               '1.5 P 15', None, '  ']),
+}
+
+
+@pytest.fixture(autouse=True)
+def canonical_mapping(monkeypatch):
+    monkeypatch.setattr(normalization_rules, 'load_canonical_mapping', lambda: CANONICAL)
+
+
+@pytest.mark.parametrize("group", sorted(CASES))
+def test_compiled_rules_match_the_legacy_normalizers(group):
+    legacy, values = CASES[group]
+    series = pd.Series(values * 3, dtype=object)
+    result, change_count, rule_hits = normalize_column(series, load_rules(), group)
+
+    expected = [legacy(v) for v in series]
+    assert [None if pd.isna(v) else v for v in result] == [None if pd.isna(v) else v for v in expected]
+    legacy_changes = sum(1 for old, new in zip(series, expected) if not pd.isna(old) and old != new)
+    assert change_count == legacy_changes
+    assert sum(rule_hits.values()) >= change_count
+
+
+@pytest.mark.parametrize("group", sorted(CASES))
+def test_every_changed_value_has_a_rule_label(group):
+    _, values = CASES[group]
+    uniques = pd.unique(pd.Series(values, dtype=object).dropna())
+    normalized, rule_masks = load_rules().normalize_values(group, uniques)
+    labelled = np.zeros(len(uniques), dtype=bool)
+    for _, mask in rule_masks:
+        labelled |= mask
+    changed = np.array([old != new for old, new in zip(uniques, normalized)], dtype=bool)
+    assert (labelled >= changed).all(), [v for v, c, l in zip(uniques, changed, labelled) if c and not l]
+
+
+def test_type_only_changes_are_labelled_coerce():
+    result, change_count, rule_hits = normalize_column(pd.Series([99213, '99213', 99213], dtype=object),
+                                                       load_rules(), 'procedure_code')
+    assert result.tolist() == ['99213'] * 3
+    assert change_count == 2
+    assert rule_hits == {normalization_rules.COERCE_LABEL: 2}
+
+
+@pytest.mark.parametrize("value, group, expected", [
+    ('female', 'gender', 'Female'),
+    ('male', 'gender', 'Male'),
+    ('person', 'gender', 'Other'),
+    (' None Entered ', 'tran_type', 'None Entered'),
+    ('empolyee discount', 'tran_type', 'Employee Discount'),
+    ('patient referrel', 'tran_type', 'Patient Referral'),
+    ('transfer', 'tran_type', 'Transfer'),
+    ('New Patient Clermont New Patient Clermont', 'provider', 'New Patient Clermont'),
+])
+def test_known_mappings(value, group, expected):
+    assert load_rules().normalize_value(group, value) == expected
+
+
+def test_normalize_frame_uses_the_report_type_columns():
+    df = pd.DataFrame({'Gender': ['female', None], 'Provider': ['Dr A Dr A Dr A Dr A', 'Dr B'],
+                       'Procedure': [' B-12 ', 'wkly'], 'Tran Type': ['transfer', 'transfer']})
+    changes, hits = normalize_frame(df, "DWC_Records/01_Original/Patient Research/x.xlsx")
+    assert df['Gender'].tolist()[0] == 'Female'
+    assert df['Procedure'].tolist() == ['B12', 'wkly']
+    assert df['Provider'].tolist() == ['Dr A Dr A', 'Dr B']
+    assert df['Tran Type'].tolist() == ['transfer', 'transfer']  # not a Patient Research column
+    assert changes == {'Gender': 1, 'Provider': 1, 'Procedure': 1}
+
+
+def test_steps_must_implement_apply():
+    class Incomplete(Step):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete({})
+
+
+def test_unknown_step_type_is_rejected():
+    with pytest.raises(RuleError):
+        RuleSet({'groups': {'g': [{'type': 'uppercase'}]}})
@@ -0,0 +1,50 @@
+from pathlib import Path
+import os
+import shutil
+
+import pytest
+
+import normalize_categories
+from normalize_categories import process_file_isolated, run_parallel
+
+
+def die_on_crash_file(file_path, *args):
+    """Stand-in worker that kills its process outright on files named *crash*"""
+    if 'crash' in Path(file_path).name:
+        os._exit(1)
+    return process_file_isolated(file_path, *args)
+
+
+def test_dead_worker_only_fails_its_own_file(payment_workbook, tmp_path, monkeypatch):
+    monkeypatch.setattr(normalize_categories, 'process_file_isolated', die_on_crash_file)
+    files = []
+    for name in ('a', 'crash', 'b', 'c'):
+        path = tmp_path / "Payment Distribution" / f"{name}_{payment_workbook.name}"
+        path.parent.mkdir(exist_ok=True)
+        shutil.copy(payment_workbook, path)
+        files.append(path)
+
+    (tmp_path / "out" / "Payment Distribution").mkdir(parents=True)
+    changes_log, errors_log, metrics_log = {}, {}, {}
+    success = run_parallel(files, tmp_path / "out", changes_log, errors_log, workers=2,
+                           metrics_log=metrics_log, output_format='parquet')
+
+    assert success == 3
+    assert list(errors_log) == [str(files[1])]
+    assert 'BrokenProcessPool' in errors_log[str(files[1])]
+    assert list(metrics_log) == [str(f) for f in files]
+    assert metrics_log[str(files[1])]['status'] == 'crashed'
+    for path in files[0], files[2], files[3]:
+        assert (tmp_path / "out" / "Payment Distribution" / path.with_suffix('.parquet').name).exists()
+
+
+def writer_that_dies(*args):
+    os._exit(1)
+
+
+def test_pipeline_stops_when_the_writer_dies(payment_workbook, tmp_path, monkeypatch):
+    monkeypatch.setattr(normalize_categories, 'pipeline_writer', writer_that_dies)
+    files = [payment_workbook] * 4
+    with pytest.raises(RuntimeError, match="'writer' exited unexpectedly"):
+        normalize_categories.run_pipelined(files, tmp_path / "out", {}, {}, output_format='parquet',
+                                           queue_depth=1)
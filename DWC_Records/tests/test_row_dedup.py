@@ -0,0 +1,61 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import frame_loader
+from row_dedup import RowDeduplicator, row_hashes
+
+
+def test_numbers_hash_the_same_as_numeric_text():
+    as_text = pd.DataFrame({'Charge': ['0.00', ' 12.50', '1000', 'Misc.'], 'Account Number': ['7', '8', '9', '10']})
+    as_numbers = pd.DataFrame({'Account Number': [7, 8, 9, 10], 'Charge': [0.0, 12.5, 1000.0, 'Misc.']})
+    assert np.array_equal(row_hashes(as_text), row_hashes(as_numbers))
+
+
+def test_text_values_stay_distinct():
+    df = pd.DataFrame({'Procedure Code': ['1.5 P 15', '15 P 15', 'D0120', 'D0120 ', None, '']})
+    hashes = row_hashes(df)
+    assert len(set(hashes[:3])) == 3
+    assert hashes[2] == hashes[3]
+    assert hashes[4] == hashes[5]
+
+
+def test_chunked_copy_is_all_duplicates(payment_workbook, tmp_path, monkeypatch):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    copy = tmp_path / "copy" / payment_workbook.name
+    copy.parent.mkdir()
+    shutil.copy(payment_workbook, copy)
+
+    dedup = RowDeduplicator()
+    for df in frame_loader.iter_frames(payment_workbook):
+        dedup.filter(df, payment_workbook)
+    kept = [dedup.filter(df, copy) for df in frame_loader.iter_frames(copy, memory_budget_mb=0.1)]
+    dedup.finish()
+
+    assert len(kept) > 1
+    assert dedup.rows[str(copy)] == 3500
+    assert sum(len(df) for df in kept) == 0
+
+
+def test_whole_and_chunked_reads_hash_alike(payment_workbook, monkeypatch):
+    monkeypatch.setenv("DWC_NO_CACHE", "1")
+    whole = row_hashes(frame_loader.load_frame(payment_workbook))
+    raw_chunks = frame_loader._xlsx_chunks(payment_workbook, None, 1000)
+    chunked = np.concatenate([row_hashes(df) for df in raw_chunks])
+    assert np.array_equal(np.sort(whole), np.sort(chunked))
+
+
+def test_dates_hash_the_same_as_date_text():
+    from datetime import datetime
+    typed = pd.DataFrame({'Service Date': pd.to_datetime(['2024-01-15', '2024-03-02 10:30:00', None], format='ISO8601'),
+                          'Patient Name': ['A', 'B', 'C']})
+    as_text = pd.DataFrame({'Service Date': ['01/15/2024', '3/2/2024 10:30:00', None],
+                            'Patient Name': ['A', 'B', 'C']})
+    mixed = pd.DataFrame({'Service Date': pd.Series([datetime(2024, 1, 15), '2024-03-02 10:30:00', ''],
+                                                    dtype=object),
+                          'Patient Name': ['A', 'B', 'C']})
+    assert np.array_equal(row_hashes(typed), row_hashes(as_text))
+    assert np.array_equal(row_hashes(typed), row_hashes(mixed))
+    other_day = as_text.assign(**{'Service Date': ['01/16/2024', '3/2/2024 10:30:00', None]})
+    assert row_hashes(other_day)[0] != row_hashes(typed)[0]
@@ -0,0 +1,76 @@
+"""split_excel --by-date: one part per period, with a bounded number of open files"""
+from datetime import datetime
+import builtins
+
+from openpyxl import Workbook, load_workbook
+
+import split_excel
+
+
+def write_unsorted_export(path):
+    """Five years of monthly rows in shuffled order, plus undated rows"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Account Number', 'Service Date', 'Charge'])
+    rows = []
+    for i in range(600):
+        month = (i * 7) % 60
+        day = f"{1 + month % 12:02d}/{1 + i % 28:02d}/{2015 + month // 12}"
+        rows.append([i, day if i % 50 else None, f"{i % 9}.00"])
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+    return rows
+
+
+def read_part(path):
+    workbook = load_workbook(path, read_only=True)
+    values = [list(row) for row in workbook.active.iter_rows(values_only=True)]
+    workbook.close()
+    return values[0], values[1:]
+
+
+def test_month_split_matches_periods_with_few_open_files(tmp_path, monkeypatch):
+    source = tmp_path / "Export.xlsx"
+    rows = write_unsorted_export(source)
+
+    open_files = set()
+    peak = [0]
+
+    class Tracked:
+        def __init__(self, handle):
+            self.handle = handle
+            open_files.add(id(self))
+            peak[0] = max(peak[0], len(open_files))
+
+        def __getattr__(self, name):
+            return getattr(self.handle, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.close()
+
+        def close(self):
+            open_files.discard(id(self))
+            self.handle.close()
+
+    def tracked_open(*args, **kwargs):
+        return Tracked(builtins.open(*args, **kwargs))
+
+    monkeypatch.setattr(split_excel, "MAX_OPEN_SPOOLS", 3)
+    monkeypatch.setattr(split_excel, "open", tracked_open, raising=False)
+    written = split_excel.split_workbook(source, tmp_path / "out", date_column='Service Date', period='month')
+
+    expected = {}
+    for row in rows:
+        expected.setdefault(split_excel.period_key(row[1], 'month'), []).append(row)
+    assert len(written) == len(expected) == 61
+    assert [p.name for p in written] == [f"Exportpart_{n}.xlsx" for n in range(1, 62)]
+    for path, key in zip(written, sorted(expected)):
+        header, part_rows = read_part(path)
+        assert header == ['Account Number', 'Service Date', 'Charge']
+        assert part_rows == expected[key]
+    assert 0 < peak[0] <= 3
+    assert not open_files
@@ -0,0 +1,59 @@
+"""square_export: only ids Square assigned are stored in the export state"""
+import pytest
+
+from mock_square_server import MockCatalog
+from square_export import CatalogExporter, ExportState, SquareError
+
+RECORDS = [
+    {'code': '99213', 'description': 'Office visit', 'square_category': 'Services > Visits',
+     'booking_required': True, 'suggested_price': 85.0},
+    {'code': 'LIPO 1', 'description': 'Lipo shot', 'square_category': 'Injections',
+     'booking_required': False, 'suggested_price': 25.0},
+]
+
+
+class FakeClient:
+    """batch_upsert against an in-memory MockCatalog, optionally dropping the id mappings"""
+
+    def __init__(self, drop_mappings_for=()):
+        self.catalog = MockCatalog()
+        self.drop_mappings_for = drop_mappings_for
+
+    def batch_upsert(self, objects):
+        status, response = self.catalog._apply([{'objects': objects}])
+        assert status == 200
+        types = {obj['type'] for obj in objects}
+        if types & set(self.drop_mappings_for):
+            response = dict(response, id_mappings=[])
+        return response
+
+
+def test_export_records_square_ids():
+    client = FakeClient()
+    state = ExportState(None)
+    CatalogExporter(client, state, concurrency=1).export(RECORDS)
+
+    for entry in state.categories.values():
+        assert not entry['id'].startswith('#')
+        assert entry['id'] in client.catalog.objects
+    for entry in state.items.values():
+        assert entry['item_id'] in client.catalog.objects
+        assert entry['variation_id'] in client.catalog.objects
+
+
+def test_missing_category_mapping_is_an_error_and_not_persisted():
+    state = ExportState(None)
+    exporter = CatalogExporter(FakeClient(drop_mappings_for=('CATEGORY',)), state, concurrency=1)
+    with pytest.raises(SquareError, match="no id mapping"):
+        exporter.export(RECORDS)
+    assert state.categories == {}
+    assert state.items == {}
+
+
+def test_missing_item_mapping_fails_the_batch():
+    state = ExportState(None)
+    exporter = CatalogExporter(FakeClient(drop_mappings_for=('ITEM',)), state, concurrency=1)
+    exporter.export(RECORDS)
+    assert state.items == {}
+    assert exporter.uploaded == 0
+    assert exporter.failures and "no id mapping" in exporter.failures[0][1]
@@ -0,0 +1,58 @@
+import tracemalloc
+
+import stage_metrics
+from stage_metrics import FileMetrics
+
+
+def test_traced_stage_measures_its_own_allocations_and_stops_tracing():
+    metrics = FileMetrics("example.xlsx", trace_memory=True)
+    metrics.start()
+    with metrics.stage('read') as stage:
+        block = bytearray(8 * 1024 * 1024)
+        stage.rows = len(block)
+    del block
+    with metrics.stage('write'):
+        pass
+    metrics.finish('normalized')
+
+    assert not tracemalloc.is_tracing()
+    stages = metrics.as_dict()['stages']
+    assert stages['read']['peak_traced_mb'] >= 8
+    assert stages['write']['peak_traced_mb'] < 1
+    assert stages['read']['rss_growth_mb'] >= 0
+
+
+def test_stage_leaves_outside_tracing_running():
+    tracemalloc.start()
+    try:
+        metrics = FileMetrics("example.xlsx", trace_memory=True)
+        with metrics.stage('read'):
+            pass
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_untraced_run_reports_process_peak_separately():
+    metrics = FileMetrics("example.xlsx")
+    metrics.start()
+    with metrics.stage('read'):
+        pass
+    metrics.finish('normalized')
+    record = metrics.as_dict()
+    assert 'peak_traced_mb' not in record['stages']['read']
+    assert record['process_peak_rss_mb'] > 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_missing_rss_source_reports_none(monkeypatch):
+    monkeypatch.setattr(stage_metrics, "resource", None)
+    monkeypatch.setattr(stage_metrics, "psutil", None, raising=False)
+    metrics = FileMetrics("example.xlsx")
+    metrics.start()
+    with metrics.stage('read'):
+        pass
+    metrics.finish('normalized')
+    record = metrics.as_dict()
+    assert record['stages']['read']['rss_growth_mb'] is None
+    assert record['process_peak_rss_mb'] is None
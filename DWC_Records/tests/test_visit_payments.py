@@ -0,0 +1,45 @@
+import pandas as pd
+
+from visit_payments import VisitPaymentJoin
+
+VISITS = pd.DataFrame({
+    'Account Number': [17014, 17014, 2727],
+    'Date Of Service': ['03/01/2021', '03/01/2021', '03/02/2021'],
+    'Procedure': ['37.5 P 30', 'NI', '1.5 P 15'],
+    'Description': ['Phentermine', 'Injection', 'Phentermine'],
+    'Amount': [99.0, 25.0, 60.0],
+    'Provider': ['Dr A', 'Dr A', 'Dr B'],
+})
+PAYMENTS = pd.DataFrame({
+    'Account Number': ['17014', '17014', '2727', '2727'],
+    'Service Date': ['03/02/2021', '03/01/2021', '03/02/2021', '03/02/2021'],
+    'Procedure Code': ['37.5p30', '1 MONTH', '15 P 15', '1.5 P 15'],
+    'Description': ['', '', '', ''],
+    'Charge': [99.0, 124.0, 60.0, 60.0],
+    'Applied': [0.0, 0.0, 0.0, 0.0],
+    'Tran Type': ['Cash', 'Cash', 'Cash', 'Cash'],
+})
+
+
+def linked(day_fallback):
+    join = VisitPaymentJoin(max_skew_days=3, day_fallback=day_fallback)
+    join.add_visits(VISITS)
+    join.add_payments(PAYMENTS)
+    return join, join.payments[['visit', 'match', 'skew_days']]
+
+
+def test_links_need_the_same_procedure_by_default():
+    join, payments = linked(day_fallback=False)
+    assert payments['visit'].tolist() == [0, -1, -1, 2]
+    assert payments.loc[0, 'skew_days'] == 1
+    assert join.levels == {'procedure': 2}
+    assert join.summary_lines()[0].startswith("🔗 Payments linked to a visit with the same procedure: 2 of 4")
+
+
+def test_day_fallback_is_opt_in_and_reported_separately():
+    join, payments = linked(day_fallback=True)
+    assert payments['visit'].tolist() == [0, 0, 2, 2]
+    assert payments['match'].tolist() == ['procedure', 'visit day', 'visit day', 'procedure']
+    lines = join.summary_lines()
+    assert "same procedure: 2 of 4" in lines[0]
+    assert "procedure ignored): 2 (50.0%)" in lines[1]
@@ -0,0 +1,60 @@
+"""workbook_cache index: concurrent workers keep every record; clear/prune skip directories"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import time
+
+import pandas as pd
+import pytest
+
+import workbook_cache
+
+WORKERS = 4
+
+
+def write_workbooks(directory, count):
+    paths = []
+    for i in range(count):
+        path = directory / f"Report{i}.xlsx"
+        pd.DataFrame({'Code': [f"D{i:04d}"], 'Fee': [i]}).to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def cache_one(path):
+    return len(workbook_cache.read_workbook(path))
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(),
+                    reason="the slowed-down index save is patched into forked workers")
+def test_concurrent_workers_keep_every_index_record(tmp_path, monkeypatch):
+    paths = write_workbooks(tmp_path, 12)
+    save_index = workbook_cache._save_index
+
+    def slow_save(index):
+        # Widen the load-modify-save window so unmerged writers would clobber each other
+        time.sleep(0.05)
+        save_index(index)
+
+    monkeypatch.setattr(workbook_cache, "_save_index", slow_save)
+    with ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context("fork")) as pool:
+        assert list(pool.map(cache_one, paths)) == [1] * len(paths)
+
+    index = workbook_cache._load_index()
+    assert sorted(index) == sorted(str(p.resolve()) for p in paths)
+    for meta in index.values():
+        assert (workbook_cache.CACHE_DIR / meta["entry"]).exists()
+
+
+def test_clear_and_prune_skip_directories(tmp_path):
+    path, = write_workbooks(tmp_path, 1)
+    workbook_cache.read_workbook(path)
+    nested = workbook_cache.CACHE_DIR / "extra"
+    nested.mkdir()
+    (nested / "keep.txt").write_text("x")
+
+    assert workbook_cache.prune_cache() == 0
+    assert str(path.resolve()) in workbook_cache._load_index()
+
+    assert workbook_cache.clear_cache() == 2  # the entry and index.json
+    assert workbook_cache._load_index() == {}
+    assert (nested / "keep.txt").exists()
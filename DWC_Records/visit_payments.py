@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Link Payment Distribution payments to the Patient Research visits they pay for
+
+A payment belongs to a visit when both name the same patient account and
+procedure (compared as fuzzy_codes.compact_key, so '37.5 P 15' and
+'37.5 p15' agree) and their service dates are at most --max-skew days apart.
+Payments are often booked under the program ('1 MONTH') while the visit
+lists what was dispensed ('37.5 P 30', 'NI'). With --day-fallback a payment
+with no such visit is linked to the patient's first visit line of that day
+(match level 'visit day'). That link ignores the procedure, so it is opt-in
+and counted separately in the summary.
+
+The join is a hash join, never a merge of every payment against every
+visit:
+    - build: each visit's (account, procedure) - or just account, for the
+      day fallback - is hashed to 64 bits and its service day added in (key =
+      hash + day * odd constant), and the keys go into a pandas hash index
+    - probe: payments stream through file by file; each chunk is looked up
+      at skew 0, then -1, +1, -2, +2 ... so a payment links to the nearest
+      visit, the earlier one on a tie; only payments the procedure index
+      missed are probed in the day-fallback index
+Work is linear in rows times (2 * max_skew + 1). Several payments may link
+to one visit (card plus coupon, adjustments); visits repeated line for
+line in an export share the first copy's id.
+
+The result is a per-patient timeline (visits and payments in date order,
+payments carrying the id of the visit they pay for) and a per-patient
+summary.
+
+Usage:
+    python DWC_Records/visit_payments.py                              # 02_Normalized
+    python DWC_Records/visit_payments.py --since 2020 --output timelines.xlsx
+    python DWC_Records/visit_payments.py --patient 17014
+    python DWC_Records/visit_payments.py --day-fallback --max-skew 0
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from datetime import timedelta
+from collections import Counter
+import argparse
+from corpus_query import scan, parse_bound
+from fuzzy_codes import compact_keys
+from dataset_io import write_dataset
+
+DWC_DIR = Path(__file__).resolve().parent
+
+DEFAULT_MAX_SKEW_DAYS = 3
+# Parquet: the full timeline can outgrow an Excel sheet
+DEFAULT_OUTPUT = DWC_DIR / "VISIT_PAYMENT_TIMELINES.parquet"
+# Odd, so distinct days give distinct keys for the same (account, procedure)
+DAY_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+EPOCH = pd.Timestamp('1970-01-01')
+
+# Source column -> timeline column
+VISIT_COLUMNS = {
+    'Account Number': 'account',
+    'Date Of Service': 'date',
+    'Procedure': 'code',
+    'Description': 'description',
+    'Amount': 'amount',
+    'Provider': 'detail',
+}
+PAYMENT_COLUMNS = {
+    'Account Number': 'account',
+    'Service Date': 'date',
+    'Procedure Code': 'code',
+    'Description': 'description',
+    'Charge': 'amount',
+    'Applied': 'applied',
+    'Tran Type': 'detail',
+}
+
+
+def account_text(series):
+    """Account numbers as text; 1234 and 1234.0 both become '1234', missing is ''"""
+    numbers = pd.to_numeric(series, errors='coerce')
+    integral = numbers.notna() & (numbers == numbers.round())
+    text = series.astype(object).where(series.notna(), '').astype(str).str.strip()
+    text[integral.to_numpy()] = numbers[integral].astype(np.int64).astype(str).to_numpy()
+    return text
+
+
+def day_numbers(dates):
+    """Timestamps as days since 1970 (NaN for NaT)"""
+    return ((dates - EPOCH) / pd.Timedelta(days=1)).to_numpy(dtype=np.float64)
+
+
+def _tidy(df, columns):
+    """Rename a report frame's columns to the timeline's; missing ones are left empty"""
+    out = pd.DataFrame(index=range(len(df)))
+    for source, target in columns.items():
+        out[target] = df[source].to_numpy() if source in df.columns else np.nan
+    out['account'] = account_text(out['account']).to_numpy()
+    out['date'] = pd.to_datetime(out['date'], format='%m/%d/%Y', errors='coerce')
+    out['day'] = day_numbers(out['date'])
+    return out
+
+
+def base_keys(accounts, codes=None):
+    """64-bit hash of (account, procedure key) per row, or of the account alone"""
+    columns = {'account': np.asarray(accounts)}
+    if codes is not None:
+        columns['code'] = compact_keys(pd.Series(codes)).to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame(columns), index=False).to_numpy(dtype=np.uint64)
+
+
+def day_keys(base, days):
+    """Join keys for a day offset: base + day * DAY_MULTIPLIER (wrapping)"""
+    return base + days.astype(np.int64).astype(np.uint64) * DAY_MULTIPLIER
+
+
+def _account_order(accounts):
+    """Numeric accounts in numeric order ('2727' before '17014'), any others after them"""
+    return pd.to_numeric(accounts, errors='coerce').fillna(np.inf)
+
+
+def _timeline_order(series):
+    if series.name == 'account':
+        return _account_order(series)
+    if series.name == 'kind':
+        return series.map({'visit': 0, 'payment': 1})
+    return series
+
+
+class VisitIndex:
+    """Hash index from (account[, procedure], service day) to a visit id"""
+
+    def __init__(self, keys, visit_ids):
+        # First visit per key: an identical later line is the same visit, and
+        # the fallback links a day's payments to the day's first visit line
+        first = ~pd.Index(keys).duplicated()
+        self.index = pd.Index(keys[first])
+        self.visit_ids = visit_ids[first]
+        self.duplicates = int((~first).sum())
+
+    def probe(self, base, days, max_skew_days):
+        """(visit id or -1, skew in days) per probe row, nearest day first"""
+        visit = np.full(len(base), -1, dtype=np.int64)
+        skew = np.zeros(len(base), dtype=np.int64)
+        pending = np.flatnonzero(~np.isnan(days))
+        for offset in [0] + [sign * d for d in range(1, max_skew_days + 1) for sign in (-1, 1)]:
+            if not len(pending):
+                break
+            positions = self.index.get_indexer(day_keys(base[pending], days[pending] + offset))
+            hit = positions >= 0
+            visit[pending[hit]] = self.visit_ids[positions[hit]]
+            # Positive when the payment's service date is after the visit's
+            skew[pending[hit]] = -offset
+            pending = pending[~hit]
+        return visit, skew
+
+
+class VisitPaymentJoin:
+    """
+    Collect visits, build the index, then stream payments through it.
+
+    add_visits() for every visit frame, then add_payments() per payment
+    frame (the index is built on the first call); timelines() and
+    patient_summary() give the results.
+    """
+
+    def __init__(self, max_skew_days=DEFAULT_MAX_SKEW_DAYS, day_fallback=False):
+        self.max_skew_days = max_skew_days
+        self.day_fallback = day_fallback
+        self.visit_frames = []
+        self.payment_frames = []
+        self.visits = None
+        self.index = None
+        self.day_index = None
+        self.skews = Counter()
+        self.levels = Counter()
+
+    def add_visits(self, df):
+        if self.index is not None:
+            raise RuntimeError("Visits must all be added before the first payment")
+        self.visit_frames.append(_tidy(df, VISIT_COLUMNS))
+
+    def build(self):
+        visits = (pd.concat(self.visit_frames, ignore_index=True) if self.visit_frames
+                  else _tidy(pd.DataFrame(), VISIT_COLUMNS))
+        self.visit_frames = []
+        visits['visit'] = np.arange(len(visits), dtype=np.int64)
+        visits['base'] = base_keys(visits['account'], visits['code'])
+        dated = ~np.isnan(visits['day'].to_numpy())
+        days, ids = visits['day'].to_numpy()[dated], visits['visit'].to_numpy()[dated]
+        self.index = VisitIndex(day_keys(visits['base'].to_numpy()[dated], days), ids)
+        if self.day_fallback:
+            self.day_index = VisitIndex(day_keys(base_keys(visits['account'])[dated], days), ids)
+        self.visits = visits
+
+    def add_payments(self, df):
+        """Link one frame of payments to visits; returns how many of its rows found one"""
+        if self.index is None:
+            self.build()
+        payments = _tidy(df, PAYMENT_COLUMNS)
+        days = payments['day'].to_numpy()
+        visit, skew = self.index.probe(base_keys(payments['account'], payments['code']),
+                                       days, self.max_skew_days)
+        match = np.where(visit >= 0, 'procedure', '').astype(object)
+        missed = np.flatnonzero(visit < 0)
+        if self.day_index is not None and len(missed):
+            day_visit, day_skew = self.day_index.probe(base_keys(payments['account'].to_numpy()[missed]),
+                                                       days[missed], self.max_skew_days)
+            hit = day_visit >= 0
+            visit[missed[hit]] = day_visit[hit]
+            skew[missed[hit]] = day_skew[hit]
+            match[missed[hit]] = 'visit day'
+        payments['visit'] = visit
+        payments['skew_days'] = np.where(visit >= 0, skew, 0)
+        payments['match'] = match
+        self.skews.update(skew[visit >= 0].tolist())
+        self.levels.update(match[visit >= 0].tolist())
+        self.payment_frames.append(payments)
+        return int((visit >= 0).sum())
+
+    @property
+    def payments(self):
+        if len(self.payment_frames) > 1:
+            self.payment_frames = [pd.concat(self.payment_frames, ignore_index=True)]
+        return self.payment_frames[0] if self.payment_frames else _tidy(pd.DataFrame(), PAYMENT_COLUMNS)
+
+    def timelines(self, account=None):
+        """Visits and payments per patient in date order (visits before payments on a day)"""
+        if self.index is None:
+            self.build()
+        visits = self.visits.assign(kind='visit', applied=np.nan, skew_days=np.nan, match='')
+        payments = self.payments.assign(kind='payment')
+        linked = payments['visit'] >= 0
+        payments['visit'] = payments['visit'].where(linked)
+        payments['skew_days'] = payments['skew_days'].where(linked)
+        columns = ['account', 'date', 'kind', 'code', 'description', 'amount', 'applied', 'detail',
+                   'visit', 'match', 'skew_days']
+        timeline = pd.concat([visits[columns], payments[columns]], ignore_index=True)
+        if account is not None:
+            timeline = timeline[timeline['account'] == str(account).strip()]
+        timeline = timeline.sort_values(['account', 'date', 'kind', 'visit'], kind='stable', key=_timeline_order)
+        timeline['date'] = timeline['date'].dt.strftime('%Y-%m-%d')
+        return timeline.rename(columns={
+            'account': 'Account Number', 'date': 'Service Date', 'kind': 'Kind', 'code': 'Procedure',
+            'description': 'Description', 'amount': 'Amount', 'applied': 'Applied', 'detail': 'Provider / Tran Type',
+            'visit': 'Visit', 'match': 'Match', 'skew_days': 'Skew Days'}).reset_index(drop=True)
+
+    def patient_summary(self):
+        """One row per account: visits, payments, how many link up, amounts and active dates"""
+        payments = self.payments
+        visits = self.visits
+        paid_visits = set(payments.loc[payments['visit'] >= 0, 'visit'].tolist())
+        visits_per = visits.groupby('account').agg(
+            visits=('visit', 'size'), billed=('amount', 'sum'),
+            first_visit=('date', 'min'), last_visit=('date', 'max'))
+        visits_per['paid_visits'] = (visits.assign(paid=visits['visit'].isin(paid_visits))
+                                     .groupby('account')['paid'].sum())
+        payments_per = payments.assign(linked=payments['visit'] >= 0).groupby('account').agg(
+            payments=('linked', 'size'), linked_payments=('linked', 'sum'),
+            charged=('amount', 'sum'), applied=('applied', 'sum'))
+        summary = visits_per.join(payments_per, how='outer')
+        counts = ['visits', 'paid_visits', 'payments', 'linked_payments']
+        summary[counts] = summary[counts].fillna(0).astype(np.int64)
+        for column in ('first_visit', 'last_visit'):
+            summary[column] = summary[column].dt.strftime('%Y-%m-%d')
+        summary = summary.reset_index().rename(columns={
+            'account': 'Account Number', 'visits': 'Visits', 'billed': 'Billed', 'first_visit': 'First Visit',
+            'last_visit': 'Last Visit', 'paid_visits': 'Paid Visits', 'payments': 'Payments',
+            'linked_payments': 'Linked Payments', 'charged': 'Charged', 'applied': 'Applied'})
+        return summary.sort_values('Account Number', kind='stable', key=_account_order).reset_index(drop=True)
+
+    def summary_lines(self):
+        payments = self.payments
+        paid = payments.loc[payments['visit'] >= 0, 'visit'].nunique()
+        by_procedure = self.levels['procedure']
+
+        def share(count):
+            return f"{100 * count / len(payments) if len(payments) else 0:.1f}%"
+
+        lines = [f"🔗 Payments linked to a visit with the same procedure: {by_procedure} of {len(payments)} "
+                 f"({share(by_procedure)})"]
+        if self.day_fallback:
+            by_day = self.levels['visit day']
+            lines.append(f"🔗 Linked only to the patient's visit that day (--day-fallback, procedure ignored): "
+                         f"{by_day} ({share(by_day)})")
+        lines.append(f"  Visits with at least one payment: {paid} of {len(self.visits)}"
+                     f" ({self.index.duplicates} repeated visit lines share an id)")
+        if self.skews:
+            spread = ', '.join(f"{days:+d}d: {count}" for days, count in sorted(self.skews.items()))
+            lines.append(f"  Date skew (payment minus visit): {spread}")
+        return lines
+
+    def print_summary(self):
+        for line in self.summary_lines():
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Link payments to visits and build per-patient timelines")
+    parser.add_argument("--root", action="append", help="directory of datasets (repeatable; default: 02_Normalized)")
+    parser.add_argument("--since", help="first service date: YYYY, YYYY-MM or YYYY-MM-DD")
+    parser.add_argument("--until", help="last service date: YYYY, YYYY-MM or YYYY-MM-DD")
+    parser.add_argument("--max-skew", type=int, default=DEFAULT_MAX_SKEW_DAYS,
+                        help=f"days a payment's service date may differ from its visit's (default {DEFAULT_MAX_SKEW_DAYS})")
+    parser.add_argument("--day-fallback", action="store_true",
+                        help="link payments without a same-procedure visit to the patient's visit that day")
+    parser.add_argument("--patient", help="print one account's timeline instead of writing files")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT),
+                        help="timeline table (.xlsx, .parquet, .feather or .csv); the summary goes next to it")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("DWC VISIT / PAYMENT JOIN")
+    print("=" * 80)
+    query = scan(args.root)
+    since, until = parse_bound(args.since), parse_bound(args.until, end=True)
+    # Visits just outside the range can still be what an in-range payment paid for
+    skew = timedelta(days=args.max_skew)
+    visits = query.report('Patient Research').between(since and since - skew, until and until + skew)
+    payments = query.report('Payment Distribution').between(since, until)
+    if args.patient:
+        # Account numbers load as numbers or text depending on the export
+        accounts = [args.patient, int(args.patient)] if args.patient.isdigit() else [args.patient]
+        visits = visits.where('Account Number', 'in', accounts)
+        payments = payments.where('Account Number', 'in', accounts)
+
+    join = VisitPaymentJoin(max_skew_days=args.max_skew, day_fallback=args.day_fallback)
+    for corpus_file, df in visits.select(*VISIT_COLUMNS).iter_frames(compact=False):
+        join.add_visits(df)
+        print(f"  Visits:   {corpus_file.path.name} ({len(df)} rows)")
+    join.build()
+    for corpus_file, df in payments.select(*PAYMENT_COLUMNS).iter_frames(compact=False):
+        linked = join.add_payments(df)
+        print(f"  Payments: {corpus_file.path.name} ({linked} of {len(df)} linked)")
+
+    print()
+    join.print_summary()
+    if args.patient:
+        timeline = join.timelines(args.patient)
+        print(f"\nAccount {args.patient}: {len(timeline)} entries\n")
+        print(timeline.drop(columns=['Account Number']).to_string(index=False))
+    else:
+        output = Path(args.output)
+        summary_path = output.with_name(f"{output.stem}_SUMMARY{output.suffix}")
+        write_dataset(join.timelines(), output)
+        write_dataset(join.patient_summary(), summary_path)
+        print(f"\n✅ Timelines saved to: {output}")
+        print(f"✅ Per-patient summary saved to: {summary_path}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
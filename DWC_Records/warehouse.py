@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Embedded SQLite warehouse for the DWC record corpus
+
+Loads Patient Research rows into a `visits` table and Payment Distribution
+rows into a `payments` table, indexed on procedure code, service date,
+provider and patient account, so questions about the data are answered by
+a query instead of a rescan of every workbook.
+
+Loading is incremental: each dataset's content hash is kept in `sources`,
+unchanged files are skipped and a changed file's rows are replaced.
+Dates are stored as ISO text (YYYY-MM-DD).
+
+By default only 02_Normalized is loaded: 01_Original holds the same visits
+again, and loading both would double every count. extract_procedures.py
+reads both folders, so `reports` only reproduces its text reports exactly
+from a warehouse loaded with both roots (kept in a separate --db);
+from the default warehouse they list the normalized codes and procedures.
+
+Usage:
+    python DWC_Records/warehouse.py load                       # 02_Normalized
+    python DWC_Records/warehouse.py --db all.sqlite load --root DWC_Records/01_Original --root DWC_Records/02_Normalized
+    python DWC_Records/warehouse.py query usage wkly --year 2012
+    python DWC_Records/warehouse.py query prices "37.5 P 15"
+    python DWC_Records/warehouse.py sql "SELECT provider, COUNT(*) FROM visits GROUP BY provider"
+    python DWC_Records/warehouse.py reports --output-dir DWC_Records/Documentation
+"""
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+
+DWC_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(DWC_DIR.parent))
+
+from workbook_cache import file_digest
+from dataset_io import list_datasets
+from frame_loader import iter_frames
+from corpus_scanner import detect_report_type
+from extract_procedures import write_procedure_codes_report, write_procedure_list_report
+
+DEFAULT_DB_PATH = DWC_DIR / "dwc_warehouse.sqlite"
+DEFAULT_ROOTS = [DWC_DIR / "02_Normalized"]
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source_id   INTEGER PRIMARY KEY,
+    path        TEXT UNIQUE NOT NULL,
+    report_type TEXT NOT NULL,
+    sha256      TEXT NOT NULL,
+    rows        INTEGER NOT NULL,
+    loaded_at   TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS visits (
+    source_id      INTEGER NOT NULL REFERENCES sources(source_id),
+    account_number TEXT,
+    first_name     TEXT,
+    last_name      TEXT,
+    gender         TEXT,
+    date_of_birth  TEXT,
+    age            REAL,
+    city           TEXT,
+    state          TEXT,
+    zip_code       TEXT,
+    procedure      TEXT,
+    description    TEXT,
+    service_date   TEXT,
+    amount         REAL,
+    provider       TEXT,
+    location       TEXT
+);
+CREATE TABLE IF NOT EXISTS payments (
+    source_id      INTEGER NOT NULL REFERENCES sources(source_id),
+    account_number TEXT,
+    patient_name   TEXT,
+    procedure_code TEXT,
+    service_date   TEXT,
+    charge         REAL,
+    applied        REAL,
+    pay_date       TEXT,
+    check_number   TEXT,
+    description    TEXT,
+    payment_type   TEXT,
+    carrier_name   TEXT,
+    tran_type      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_visits_procedure ON visits(procedure);
+CREATE INDEX IF NOT EXISTS idx_visits_service_date ON visits(service_date);
+CREATE INDEX IF NOT EXISTS idx_visits_provider ON visits(provider);
+CREATE INDEX IF NOT EXISTS idx_visits_account ON visits(account_number);
+CREATE INDEX IF NOT EXISTS idx_visits_source ON visits(source_id);
+CREATE INDEX IF NOT EXISTS idx_payments_procedure ON payments(procedure_code);
+CREATE INDEX IF NOT EXISTS idx_payments_service_date ON payments(service_date);
+CREATE INDEX IF NOT EXISTS idx_payments_account ON payments(account_number);
+CREATE INDEX IF NOT EXISTS idx_payments_source ON payments(source_id);
+"""
+
+# Source column -> (table column, kind); kind picks the conversion below
+TABLE_COLUMNS = {
+    'Patient Research': ('visits', {
+        'Account Number': ('account_number', 'id'),
+        'First Name': ('first_name', 'text'),
+        'Last Name': ('last_name', 'text'),
+        'Gender': ('gender', 'text'),
+        'Date Of Birth': ('date_of_birth', 'date'),
+        'Age': ('age', 'number'),
+        'City': ('city', 'text'),
+        'State': ('state', 'text'),
+        'ZipCode': ('zip_code', 'id'),
+        'Procedure': ('procedure', 'text'),
+        'Description': ('description', 'text'),
+        'Date Of Service': ('service_date', 'date'),
+        'Amount': ('amount', 'number'),
+        'Provider': ('provider', 'text'),
+        'Location': ('location', 'text'),
+    }),
+    'Payment Distribution': ('payments', {
+        'Account Number': ('account_number', 'id'),
+        'Patient Name': ('patient_name', 'text'),
+        # Kept exactly as str(value) so 'Procedure codes.txt' can be rebuilt from here
+        'Procedure Code': ('procedure_code', 'raw'),
+        'Service Date': ('service_date', 'date'),
+        'Charge': ('charge', 'number'),
+        'Applied': ('applied', 'number'),
+        'Pay Date': ('pay_date', 'date'),
+        'Check #': ('check_number', 'id'),
+        'Description': ('description', 'text'),
+        'Type': ('payment_type', 'text'),
+        'Carrier Name': ('carrier_name', 'text'),
+        'Tran Type': ('tran_type', 'text'),
+    }),
+}
+
+# name -> (description, SQL); :code, :year and :limit are bound from the CLI
+REPORT_QUERIES = {
+    'codes': (
+        "Distinct Payment Distribution procedure codes",
+        "SELECT DISTINCT procedure_code FROM payments WHERE procedure_code IS NOT NULL "
+        "ORDER BY procedure_code"),
+    'procedures': (
+        "Procedures and their distinct descriptions",
+        "SELECT procedure, COUNT(DISTINCT description) AS descriptions, "
+        "group_concat(DISTINCT description) AS description_list "
+        "FROM visits WHERE procedure IS NOT NULL GROUP BY procedure ORDER BY procedure"),
+    'usage': (
+        "Visits and payments per year for a code (optionally one --year)",
+        "SELECT year, SUM(kind = 'visit') AS visits, SUM(kind = 'payment') AS payments FROM ("
+        "  SELECT substr(service_date, 1, 4) AS year, 'visit' AS kind FROM visits "
+        "  WHERE procedure = :code"
+        "  UNION ALL"
+        "  SELECT substr(service_date, 1, 4), 'payment' FROM payments WHERE procedure_code = :code"
+        ") WHERE :year IS NULL OR year = :year GROUP BY year ORDER BY year"),
+    'prices': (
+        "Prices a code was sold at, most frequent first",
+        "SELECT price, COUNT(*) AS times, MIN(service_date) AS first_seen, MAX(service_date) AS last_seen "
+        "FROM (SELECT amount AS price, service_date FROM visits WHERE procedure = :code AND amount > 0"
+        "      UNION ALL"
+        "      SELECT charge, service_date FROM payments WHERE procedure_code = :code AND charge > 0) "
+        "WHERE :year IS NULL OR substr(service_date, 1, 4) = :year "
+        "GROUP BY price ORDER BY times DESC, price"),
+    'top-codes': (
+        "Most used procedure codes (visits)",
+        "SELECT procedure, COUNT(*) AS visits, ROUND(SUM(amount), 2) AS billed FROM visits "
+        "WHERE procedure IS NOT NULL AND (:year IS NULL OR substr(service_date, 1, 4) = :year) "
+        "GROUP BY procedure ORDER BY visits DESC LIMIT :limit"),
+    'providers': (
+        "Visits per provider per year",
+        "SELECT provider, substr(service_date, 1, 4) AS year, COUNT(*) AS visits FROM visits "
+        "WHERE :year IS NULL OR substr(service_date, 1, 4) = :year "
+        "GROUP BY provider, year ORDER BY provider, year"),
+    'patient': (
+        "Visit and payment timeline for one account (pass the account as the code)",
+        "SELECT service_date, 'visit' AS kind, procedure AS code, description, amount, provider AS detail "
+        "FROM visits WHERE account_number = :code "
+        "UNION ALL "
+        "SELECT service_date, 'payment', procedure_code, description, applied, tran_type "
+        "FROM payments WHERE account_number = :code "
+        "ORDER BY service_date, kind"),
+}
+
+
+def connect(db_path=DEFAULT_DB_PATH, read_only=False):
+    """Open the warehouse (read-only connections cannot create it)"""
+    db_path = Path(db_path)
+    if read_only:
+        if not db_path.exists():
+            raise FileNotFoundError(f"No warehouse at {db_path} - run 'warehouse.py load' first")
+        return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return conn
+
+
+def _id_text(value):
+    """Account/zip/check numbers as text; 1234.0 (a float column with gaps) is '1234'"""
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _convert(series, kind):
+    """Column values as SQLite-ready Python objects (None for missing)"""
+    if kind == 'number':
+        values = pd.to_numeric(series, errors='coerce')
+    elif kind == 'date':
+        values = pd.to_datetime(series, format='%m/%d/%Y', errors='coerce').dt.strftime('%Y-%m-%d')
+    elif kind == 'id':
+        values = series.astype(object).map(_id_text)
+    elif kind == 'raw':
+        values = series.astype(object).map(lambda v: str(v) if pd.notna(v) else None)
+    else:
+        values = series.astype(object).map(lambda v: str(v).strip() if pd.notna(v) else None)
+    return values.astype(object).where(values.notna(), None)
+
+
+def frame_to_table(df, report_type):
+    """Map a DWC frame onto its warehouse table; returns (table, frame)"""
+    table, columns = TABLE_COLUMNS[report_type]
+    out = pd.DataFrame(index=df.index)
+    for source_column, (table_column, kind) in columns.items():
+        if source_column in df.columns:
+            out[table_column] = _convert(df[source_column], kind)
+        else:
+            out[table_column] = None
+    return table, out
+
+
+def _under(path, roots):
+    return any(Path(root).resolve() in Path(path).resolve().parents for root in roots)
+
+
+def _load_source(conn, path, key, digest, previous_id=None, memory_budget_mb=None):
+    """
+    Replace one dataset's rows, inserting chunk by chunk when it is over the
+    memory budget; returns (report_type, table, rows), or None for an unknown layout.
+    """
+    source_id, rows = None, 0
+    for df in iter_frames(path, memory_budget_mb=memory_budget_mb):
+        if source_id is None:
+            report_type = detect_report_type(df)
+            if report_type is None:
+                return None
+            if previous_id is not None:
+                _delete_source(conn, previous_id)
+            source_id = conn.execute(
+                "INSERT INTO sources (path, report_type, sha256, rows, loaded_at) VALUES (?, ?, ?, 0, ?)",
+                (key, report_type, digest, datetime.now().isoformat(timespec='seconds'))).lastrowid
+        table, frame = frame_to_table(df, report_type)
+        frame.insert(0, 'source_id', source_id)
+        placeholders = ", ".join("?" * len(frame.columns))
+        conn.executemany(f"INSERT INTO {table} ({', '.join(frame.columns)}) VALUES ({placeholders})",
+                         frame.itertuples(index=False, name=None))
+        rows += len(frame)
+    if source_id is None:
+        return None
+    conn.execute("UPDATE sources SET rows = ? WHERE source_id = ?", (rows, source_id))
+    return report_type, table, rows
+
+
+def load_corpus(conn, roots, full=False, memory_budget_mb=None):
+    """
+    Load every dataset under roots; returns {'loaded', 'skipped', 'removed', 'rows'}.
+
+    Sources under roots that are no longer present are removed. Files over
+    memory_budget_mb are read and inserted in chunks.
+    """
+    stats = {'loaded': 0, 'skipped': 0, 'removed': 0, 'rows': 0}
+    known = {path: (source_id, sha256) for source_id, path, sha256
+             in conn.execute("SELECT source_id, path, sha256 FROM sources")}
+    seen = set()
+
+    for root in roots:
+        for path in list_datasets(root):
+            key = str(path.resolve())
+            seen.add(key)
+            digest = file_digest(path)
+            if not full and key in known and known[key][1] == digest:
+                stats['skipped'] += 1
+                continue
+
+            print(f"Loading: {path.name}")
+            try:
+                with conn:
+                    loaded = _load_source(conn, path, key, digest, known.get(key, (None,))[0], memory_budget_mb)
+            except Exception as e:
+                print(f"  Error loading {path.name}: {e}")
+                continue
+            if loaded is None:
+                print(f"  Skipping {path.name}: unrecognized report layout")
+                continue
+            report_type, table, rows = loaded
+            print(f"  ✓ {rows} {report_type} rows -> {table}")
+            stats['loaded'] += 1
+            stats['rows'] += rows
+
+    with conn:
+        for key, (source_id, _) in known.items():
+            if key not in seen and _under(key, roots):
+                _delete_source(conn, source_id)
+                stats['removed'] += 1
+    if stats['loaded'] or stats['removed']:
+        conn.execute("ANALYZE")
+    return stats
+
+
+def _delete_source(conn, source_id):
+    conn.execute("DELETE FROM visits WHERE source_id = ?", (source_id,))
+    conn.execute("DELETE FROM payments WHERE source_id = ?", (source_id,))
+    conn.execute("DELETE FROM sources WHERE source_id = ?", (source_id,))
+
+
+def run_query(conn, sql, params=None):
+    """Execute a query; returns (column names, rows, elapsed ms)"""
+    start = time.perf_counter()
+    cursor = conn.execute(sql, params or {})
+    rows = cursor.fetchall()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    columns = [d[0] for d in cursor.description] if cursor.description else []
+    return columns, rows, elapsed_ms
+
+
+def run_report(conn, name, code=None, year=None, limit=25):
+    """Run one of REPORT_QUERIES"""
+    _, sql = REPORT_QUERIES[name]
+    return run_query(conn, sql, {'code': code, 'year': str(year) if year else None, 'limit': limit})
+
+
+def procedure_codes(conn):
+    """The code list behind 'Procedure codes.txt'"""
+    return [row[0] for row in conn.execute(REPORT_QUERIES['codes'][1])]
+
+
+def procedure_pairs(conn):
+    """{procedure: set(descriptions)} as built by extract_procedures.py"""
+    pairs = {}
+    for procedure, description in conn.execute(
+            "SELECT DISTINCT procedure, description FROM visits WHERE procedure IS NOT NULL"):
+        descriptions = pairs.setdefault(procedure, set())
+        if description:
+            descriptions.add(description)
+    return pairs
+
+
+def print_rows(columns, rows, as_csv=False):
+    if as_csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return
+    texts = [["" if v is None else str(v) for v in row] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in texts]) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in texts:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and query the DWC record warehouse")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="load normalized data (incremental)")
+    load.add_argument("--root", action="append",
+                      help="directory to load recursively (repeatable; default: 02_Normalized)")
+    load.add_argument("--full", action="store_true", help="reload every file")
+    load.add_argument("--memory-budget", type=float, metavar="MB",
+                      help="read and insert files estimated to need more than this in chunks")
+
+    query = commands.add_parser("query", help="run a named report query")
+    query.add_argument("name", choices=sorted(REPORT_QUERIES))
+    query.add_argument("code", nargs="?", help="procedure code (or account number for 'patient')")
+    query.add_argument("--year", type=int)
+    query.add_argument("--limit", type=int, default=25)
+    query.add_argument("--csv", action="store_true", help="print CSV instead of a table")
+
+    sql = commands.add_parser("sql", help="run a read-only SQL statement")
+    sql.add_argument("statement")
+    sql.add_argument("--csv", action="store_true")
+
+    reports = commands.add_parser("reports", help="write the extract_procedures text reports from the warehouse")
+    reports.add_argument("--output-dir", default=str(DWC_DIR / "Documentation"))
+
+    commands.add_parser("info", help="show what is loaded")
+    args = parser.parse_args()
+
+    if args.command == "load":
+        print("=" * 80)
+        print("DWC WAREHOUSE LOAD")
+        print("=" * 80)
+        conn = connect(args.db)
+        stats = load_corpus(conn, args.root or DEFAULT_ROOTS, full=args.full,
+                            memory_budget_mb=args.memory_budget)
+        conn.close()
+        print(f"\n✅ Loaded {stats['loaded']} files ({stats['rows']} rows), "
+              f"skipped {stats['skipped']} unchanged, removed {stats['removed']}")
+        print(f"📁 Warehouse: {args.db}")
+        return
+
+    conn = connect(args.db, read_only=True)
+    if args.command == "query":
+        if args.name in ('usage', 'prices', 'patient') and not args.code:
+            parser.error(f"'{args.name}' needs a code")
+        columns, rows, elapsed_ms = run_report(conn, args.name, args.code, args.year, args.limit)
+        print_rows(columns, rows, args.csv)
+        if not args.csv:
+            print(f"\n({len(rows)} rows in {elapsed_ms:.1f} ms)")
+    elif args.command == "sql":
+        columns, rows, elapsed_ms = run_query(conn, args.statement)
+        print_rows(columns, rows, args.csv)
+        if not args.csv:
+            print(f"\n({len(rows)} rows in {elapsed_ms:.1f} ms)")
+    elif args.command == "reports":
+        output_dir = Path(args.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        codes = procedure_codes(conn)
+        pairs = procedure_pairs(conn)
+        write_procedure_codes_report(codes, output_dir / "Procedure codes.txt")
+        write_procedure_list_report(pairs, output_dir / "Procedure List for normalization.txt")
+        print(f"✅ Wrote {len(codes)} codes and {len(pairs)} procedures to {output_dir}")
+        originals = [DWC_DIR / "01_Original"]
+        if not any(_under(path, originals) for path, in conn.execute("SELECT path FROM sources")):
+            print("ℹ No 01_Original files are loaded; extract_procedures.py also reads them, so its "
+                  "reports can list more. Load both roots into a separate --db to match it exactly.")
+    else:
+        for report_type, (table, _) in TABLE_COLUMNS.items():
+            files, rows = conn.execute("SELECT COUNT(*), COALESCE(SUM(rows), 0) FROM sources "
+                                       "WHERE report_type = ?", (report_type,)).fetchone()
+            print(f"{report_type:22} {table:9} {files:4} files {rows:10} rows")
+        print(f"\nWarehouse: {args.db}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Shared read layer for DWC Records workbooks
+
+Parsing .xlsx files with openpyxl dominates the run time of every DWC script.
+This module converts each workbook once to a columnar file (Parquet when
+pyarrow is available, pickle otherwise), keyed by the SHA-256 of the source
+file's contents, and serves all later reads from that cache.
+
+Cache layout (DWC_Records/.cache/workbooks/ by default, override with the
+DWC_CACHE_DIR environment variable):
+    <sha256>.parquet   - converted workbook
+    index.json         - source path -> digest, size, mtime_ns, entry name
+    index.lock         - held while a process updates index.json, so
+                         concurrent workers merge their records
+
+Entries are evicted as soon as their source file changes. Set DWC_NO_CACHE=1
+to bypass the cache entirely.
+"""
+import pandas as pd
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import sys
+from openpyxl import load_workbook
+from memory_cache import memoize
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+    HAVE_PYARROW = True
+except ImportError:
+    HAVE_PYARROW = False
+
+try:
+    import python_calamine  # noqa: F401
+    # Rust-based reader: ~10x faster than openpyxl for column projections.
+    # openpyxl has no such shortcut - iter_rows(min_col=, max_col=) still
+    # parses every cell of each row (5.7s vs 5.8s for a whole 47k-row sheet)
+    PROJECTION_ENGINE = "calamine"
+except ImportError:
+    PROJECTION_ENGINE = None
+
+CACHE_DIR = Path(os.environ.get(
+    "DWC_CACHE_DIR", Path(__file__).resolve().parent / ".cache" / "workbooks"))
+INDEX_NAME = "index.json"
+LOCK_NAME = "index.lock"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def cache_enabled():
+    """Return False when the cache has been disabled via DWC_NO_CACHE"""
+    return os.environ.get("DWC_NO_CACHE", "") not in ("1", "true", "yes")
+
+
+def file_digest(file_path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _load_index():
+    index_path = CACHE_DIR / INDEX_NAME
+    if not index_path.exists():
+        return {}
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # A corrupt index only costs us a re-hash, never wrong data
+        return {}
+
+
+def _save_index(index):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = CACHE_DIR / f"{INDEX_NAME}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, CACHE_DIR / INDEX_NAME)
+
+
+@contextmanager
+def _index_lock():
+    """Hold the cache's index lock across a load-modify-save of the index"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_DIR / LOCK_NAME, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ~10 seconds
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _entry_in_use(index, entry_name, exclude_key):
+    return any(meta.get("entry") == entry_name
+               for key, meta in index.items() if key != exclude_key)
+
+
+def _evict(index, source_key):
+    """Drop a source's index record and delete its entry if nothing else uses it"""
+    meta = index.pop(source_key, None)
+    if not meta:
+        return
+    if not _entry_in_use(index, meta.get("entry"), source_key):
+        entry_path = CACHE_DIR / meta["entry"]
+        if entry_path.exists():
+            entry_path.unlink()
+
+
+def _write_entry(df, digest):
+    """Write a converted workbook to the cache and return the entry file name"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if HAVE_PYARROW:
+        entry_name = f"{digest}.parquet"
+        tmp_path = CACHE_DIR / f"{entry_name}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, CACHE_DIR / entry_name)
+            return entry_name
+        except (TypeError, ValueError, pyarrow.lib.ArrowException):
+            # Mixed-type object columns (e.g. numeric and text procedure codes)
+            # cannot be stored in Parquet without changing values, so keep the
+            # exact frame as a pickle instead
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    entry_name = f"{digest}.pkl"
+    tmp_path = CACHE_DIR / f"{entry_name}.{os.getpid()}.tmp"
+    df.to_pickle(tmp_path)
+    os.replace(tmp_path, CACHE_DIR / entry_name)
+    return entry_name
+
+
+def _read_entry(entry_path, columns=None):
+    if entry_path.suffix == ".parquet":
+        return pd.read_parquet(entry_path, columns=columns)
+    df = pd.read_pickle(entry_path)
+    return df[columns] if columns is not None else df
+
+
+def read_workbook(file_path, columns=None, use_cache=True):
+    """
+    Read the first sheet of a workbook as a DataFrame, via the columnar cache.
+
+    Drop-in replacement for pd.read_excel(file_path). If columns is given, only
+    those columns are returned (projected from the cache without a re-parse).
+    Inside the dwc daemon, repeated reads come from memory (memory_cache.py).
+    """
+    file_path = Path(file_path)
+    if not (use_cache and cache_enabled()):
+        return pd.read_excel(file_path, usecols=columns)
+    key = ('workbook', str(file_path.resolve()), tuple(columns) if columns is not None else None)
+    return memoize(key, [file_path], lambda: _read_workbook(file_path, columns))
+
+
+def _read_workbook(file_path, columns=None):
+    source_key = str(file_path.resolve())
+    stat = file_path.stat()
+    index = _load_index()
+    meta = index.get(source_key)
+
+    # Fast path: unchanged size and mtime means unchanged content
+    if meta and meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        entry_path = CACHE_DIR / meta["entry"]
+        if entry_path.exists():
+            return _read_entry(entry_path, columns)
+
+    digest = file_digest(file_path)
+
+    # Content-addressed: a touched file or an identical copy reuses the entry
+    entry_name = next((m["entry"] for m in index.values()
+                       if m["digest"] == digest and (CACHE_DIR / m["entry"]).exists()),
+                      None)
+    if entry_name is None:
+        df = pd.read_excel(file_path)
+        entry_name = _write_entry(df, digest)
+        if columns is not None:
+            df = df[columns]
+    else:
+        df = _read_entry(CACHE_DIR / entry_name, columns)
+
+    # Reload under the lock so records written by other processes meanwhile survive
+    with _index_lock():
+        index = _load_index()
+        meta = index.get(source_key)
+        if meta and meta["digest"] != digest:
+            # Source file changed - its old conversion is stale
+            _evict(index, source_key)
+        index[source_key] = {
+            "digest": digest,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "entry": entry_name,
+        }
+        _save_index(index)
+    return df
+
+
+class ColumnResolutionError(ValueError):
+    """A requested column is missing from a workbook's header row"""
+
+
+def _clean_header(name):
+    return re.sub(r'\s+', ' ', str(name)).strip().casefold()
+
+
+def _is_blank_header(name):
+    return name is None or str(name).strip() == "" or str(name).startswith("Unnamed:")
+
+
+def _column_letter(position):
+    letters = ""
+    position += 1
+    while position:
+        position, remainder = divmod(position - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def resolve_columns(header, specs, source="workbook"):
+    """
+    Map column specs to positions in a header row.
+
+    Each spec is a column name or a (name, position) tuple. Names match
+    case- and whitespace-insensitively. The position is only used as a
+    fallback when the header cell there is blank (a headerless export);
+    if it names some other column the layout has shifted and
+    ColumnResolutionError is raised rather than extracting the wrong data.
+    """
+    header = list(header)
+    lookup = {}
+    for i, name in enumerate(header):
+        if not _is_blank_header(name):
+            lookup.setdefault(_clean_header(name), i)
+
+    positions = []
+    for spec in specs:
+        name, position = spec if isinstance(spec, tuple) else (spec, None)
+        if _clean_header(name) in lookup:
+            positions.append(lookup[_clean_header(name)])
+        elif position is not None and position < len(header) and _is_blank_header(header[position]):
+            positions.append(position)
+        else:
+            expected = f"'{name}'" + (f" (column {_column_letter(position)})" if position is not None else "")
+            found = "" if position is None or position >= len(header) else \
+                f"; column {_column_letter(position)} is '{header[position]}'"
+            raise ColumnResolutionError(
+                f"{source}: expected column {expected} not found{found}. "
+                f"Header: {[h for h in header if not _is_blank_header(h)]}")
+    return positions
+
+
+def select_columns(df, specs, source="frame"):
+    """Project an in-memory frame to specs, renamed to the requested names"""
+    positions = resolve_columns(df.columns, specs, source)
+    names = [spec[0] if isinstance(spec, tuple) else spec for spec in specs]
+    projected = df.iloc[:, positions]
+    projected.columns = names
+    return projected
+
+
+def fresh_entry(file_path):
+    """The cache entry for an unchanged source (size+mtime), or None"""
+    meta = _load_index().get(str(Path(file_path).resolve()))
+    if not meta:
+        return None
+    stat = Path(file_path).stat()
+    entry_path = CACHE_DIR / meta["entry"]
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns and entry_path.exists():
+        return entry_path
+    return None
+
+
+def read_header(file_path):
+    """Header row of a workbook's first sheet, without parsing the data rows"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        first_row = next(workbook.worksheets[0].iter_rows(max_row=1, values_only=True), ())
+    finally:
+        workbook.close()
+    return list(first_row)
+
+
+def read_columns(file_path, specs, use_cache=True):
+    """
+    Read only the requested columns of a workbook, resolved by header name.
+
+    specs are column names or (name, position) tuples as for resolve_columns.
+    A fresh cache entry is projected directly. Otherwise the .xlsx is read
+    with usecols (this does not populate the cache - read_workbook or
+    `workbook_cache.py warm` does). Only python-calamine, when installed,
+    skips the other columns: openpyxl parses every cell of each row even
+    when asked for a column range, so without calamine an uncached
+    projection costs as much as a full parse and only the frame is smaller.
+    Columns come back under the requested names, in the requested order.
+    """
+    file_path = Path(file_path)
+    if use_cache and cache_enabled():
+        key = ('columns', str(file_path.resolve()), tuple(specs))
+        return memoize(key, [file_path], lambda: _read_columns(file_path, specs, True))
+    return _read_columns(file_path, specs, False)
+
+
+def _read_columns(file_path, specs, use_cache):
+    names = [spec[0] if isinstance(spec, tuple) else spec for spec in specs]
+
+    entry_path = fresh_entry(file_path) if use_cache and cache_enabled() else None
+    if entry_path is not None:
+        if entry_path.suffix == ".parquet":
+            header = pq.read_schema(entry_path).names
+        else:
+            header = list(pd.read_pickle(entry_path).columns)
+        positions = resolve_columns(header, specs, file_path.name)
+        df = _read_entry(entry_path, [header[i] for i in positions])
+    else:
+        positions = resolve_columns(read_header(file_path), specs, file_path.name)
+        df = pd.read_excel(file_path, usecols=sorted(set(positions)), engine=PROJECTION_ENGINE)
+        # usecols returns columns in sheet order; map back to the request order
+        order = sorted(set(positions))
+        df = df.iloc[:, [order.index(i) for i in positions]]
+
+    df.columns = names
+    return df
+
+
+def prune_cache():
+    """Evict entries whose source files no longer exist or have changed"""
+    with _index_lock():
+        return _prune_cache()
+
+
+def _prune_cache():
+    index = _load_index()
+    removed = 0
+    for source_key in list(index):
+        source = Path(source_key)
+        meta = index[source_key]
+        if not source.exists():
+            _evict(index, source_key)
+            removed += 1
+            continue
+        stat = source.stat()
+        if meta["size"] != stat.st_size or meta["mtime_ns"] != stat.st_mtime_ns:
+            if file_digest(source) != meta["digest"]:
+                _evict(index, source_key)
+                removed += 1
+
+    # Orphaned entry files (e.g. left behind by an interrupted run); .json
+    # files are indexes, including corpus_query.py's date ranges
+    referenced = {meta["entry"] for meta in index.values()} | {LOCK_NAME}
+    if CACHE_DIR.exists():
+        for entry_path in CACHE_DIR.iterdir():
+            if entry_path.is_dir():
+                continue
+            if entry_path.suffix != ".json" and entry_path.name not in referenced:
+                entry_path.unlink()
+                removed += 1
+
+    _save_index(index)
+    return removed
+
+
+def clear_cache():
+    """Delete every cache entry and the index"""
+    removed = 0
+    if not CACHE_DIR.exists():
+        return removed
+    with _index_lock():
+        for entry_path in CACHE_DIR.iterdir():
+            # Other processes may be waiting on the lock file; subdirectories
+            # are not cache entries
+            if entry_path.is_dir() or entry_path.name == LOCK_NAME:
+                continue
+            entry_path.unlink()
+            removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if command == "prune":
+        print(f"Removed {prune_cache()} stale cache entries")
+    elif command == "clear":
+        print(f"Removed {clear_cache()} cache files")
+    elif command == "warm":
+        # Convert every workbook under the given directories (default: DWC_Records)
+        roots = sys.argv[2:] or [Path(__file__).resolve().parent]
+        for root in roots:
+            for file_path in sorted(Path(root).rglob("*.xlsx")):
+                if file_path.name.startswith('~$'):
+                    continue
+                print(f"Caching: {file_path.name}")
+                read_workbook(file_path)
+    else:
+        index = _load_index()
+        size = sum(p.stat().st_size for p in CACHE_DIR.iterdir() if p.is_file()) if CACHE_DIR.exists() else 0
+        print(f"Cache directory: {CACHE_DIR}")
+        print(f"Cached workbooks: {len(index)}")
+        print(f"Cache size: {size / 1024 / 1024:.1f} MB")
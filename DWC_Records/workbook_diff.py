@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Block-hash diff between the Original and Normalized workbooks
+
+NORMALIZATION_REPORT.txt says how many values normalize_categories.py
+changed per column; this verifies what actually differs between each
+01_Original dataset and its 02_Normalized counterpart (paired by file name),
+without a cell-by-cell comparison:
+    1. each file gets a signature: per column, one hash per block of
+       BLOCK_ROWS rows (cell hashes folded position-weighted, numbers hashed
+       as float64 so 39 and 39.0 match)
+    2. equal block hashes -> those rows of that column are identical
+    3. only mismatched blocks are drilled into: their column is read back
+       and the rows whose cell hashes differ are the changed cells
+Signatures are small and saved next to the workbook cache
+(block_hashes.json), so an unchanged file - every Original - is not read
+or hashed again on later runs. Changed cells are reported per column with
+their most common old -> new transitions and example rows (Excel row
+numbers), alongside added/removed columns, dtype changes and row-count
+differences.
+
+Usage:
+    python DWC_Records/workbook_diff.py
+    python DWC_Records/workbook_diff.py DWC_Records/01_Original DWC_Records/02_Normalized --output /tmp/diff.txt
+    python DWC_Records/workbook_diff.py --examples 10 --block-rows 1024
+"""
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import argparse
+import json
+import os
+import time
+from dataset_io import list_datasets, read_dataset
+from workbook_cache import CACHE_DIR
+
+DWC_DIR = Path(__file__).resolve().parent
+
+DEFAULT_ORIGINAL_ROOT = DWC_DIR / "01_Original"
+DEFAULT_NORMALIZED_ROOT = DWC_DIR / "02_Normalized"
+DEFAULT_OUTPUT = DWC_DIR / "Documentation" / "NORMALIZATION_DIFF.txt"
+SIGNATURES_PATH = CACHE_DIR / "block_hashes.json"
+
+BLOCK_ROWS = 4096
+MAX_EXAMPLES = 5
+MAX_TRANSITIONS = 10
+# Hash of a missing text value
+MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def cell_hashes(series):
+    """One uint64 hash per cell; a value hashes the same in any file, dtype or row"""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.util.hash_pandas_object(series.astype('float64'), index=False).to_numpy()
+    # Hash each distinct value once: report columns repeat their values heavily
+    codes, uniques = pd.factorize(series)
+    lookup = np.append(pd.util.hash_pandas_object(pd.Series(uniques, dtype=object), index=False).to_numpy(),
+                       MISSING_HASH)
+    return lookup[codes]
+
+
+def block_hashes(hashes, block_rows=BLOCK_ROWS):
+    """Fold cell hashes into one hash per block of rows (position-weighted, so moved rows differ)"""
+    if not len(hashes):
+        return np.zeros(0, dtype=np.uint64)
+    weights = np.arange(len(hashes), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    # uint64 arithmetic wraps, which is what a hash wants
+    return np.add.reduceat(hashes * weights, np.arange(0, len(hashes), block_rows))
+
+
+def _stamp(path):
+    stat = Path(path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _load_signatures():
+    try:
+        with open(SIGNATURES_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_signatures(signatures):
+    SIGNATURES_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = SIGNATURES_PATH.with_name(f"{SIGNATURES_PATH.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(signatures, f, sort_keys=True)
+    os.replace(tmp_path, SIGNATURES_PATH)
+
+
+class FrameSignature:
+    """Row count, dtypes and per-column block hashes of a dataset"""
+
+    def __init__(self, rows, block_rows, dtypes, blocks):
+        self.rows = rows
+        self.block_rows = block_rows
+        self.dtypes = dtypes
+        self.blocks = blocks  # column -> uint64 array, one hash per block
+
+    @classmethod
+    def from_frame(cls, df, block_rows=BLOCK_ROWS):
+        return cls(len(df), block_rows, {column: str(dtype) for column, dtype in df.dtypes.items()},
+                   {column: block_hashes(cell_hashes(df[column]), block_rows) for column in df.columns})
+
+    def to_json(self, stamp):
+        return {'stamp': stamp, 'rows': self.rows, 'block_rows': self.block_rows, 'dtypes': self.dtypes,
+                'columns': list(self.blocks),
+                'blocks': [[int(h) for h in self.blocks[column]] for column in self.blocks]}
+
+    @classmethod
+    def from_json(cls, saved):
+        blocks = {column: np.array(hashes, dtype=np.uint64)
+                  for column, hashes in zip(saved['columns'], saved['blocks'])}
+        return cls(saved['rows'], saved['block_rows'], saved['dtypes'], blocks)
+
+
+class SignatureStore:
+    """Signatures by file, reused while a file's size and mtime are unchanged"""
+
+    def __init__(self, block_rows=BLOCK_ROWS, persist=True):
+        self.block_rows = block_rows
+        self.persist = persist
+        self.saved = _load_signatures() if persist else {}
+        self.hashed = 0
+        self.reused = 0
+        self.changed = False
+
+    def signature(self, path):
+        key = str(Path(path).resolve())
+        stamp = _stamp(path)
+        saved = self.saved.get(key)
+        if saved and saved['stamp'] == stamp and saved['block_rows'] == self.block_rows:
+            self.reused += 1
+            return FrameSignature.from_json(saved)
+        signature = FrameSignature.from_frame(read_dataset(path), self.block_rows)
+        self.saved[key] = signature.to_json(stamp)
+        self.hashed += 1
+        self.changed = True
+        return signature
+
+    def save(self):
+        if self.persist and self.changed:
+            _save_signatures({key: saved for key, saved in self.saved.items() if Path(key).exists()})
+
+
+def _as_text(values):
+    return values.astype(object).where(values.notna(), '<blank>').astype(str)
+
+
+class ColumnDiff:
+    """Changed cells of one column: count, top transitions and examples"""
+
+    def __init__(self, column, rows, old, new, max_examples=MAX_EXAMPLES):
+        self.column = column
+        self.changes = len(rows)
+        pairs = pd.DataFrame({'old': _as_text(old), 'new': _as_text(new)})
+        counts = pairs.value_counts(sort=True)
+        self.transitions = [(o, n, int(c)) for (o, n), c in counts.head(MAX_TRANSITIONS).items()]
+        self.distinct_transitions = len(counts)
+        # Excel row: header is row 1
+        self.examples = [(int(r) + 2, o, n) for r, o, n in
+                         zip(rows[:max_examples], pairs['old'][:max_examples], pairs['new'][:max_examples])]
+
+
+class FileDiff:
+    """Differences between one original dataset and its normalized copy"""
+
+    def __init__(self, name, original_path, normalized_path):
+        self.name = name
+        self.original_path = original_path
+        self.normalized_path = normalized_path
+        self.original_rows = 0
+        self.normalized_rows = 0
+        self.added_columns = []
+        self.removed_columns = []
+        self.dtype_changes = {}  # column -> (old dtype, new dtype)
+        self.columns = []  # ColumnDiff, changed columns only
+        self.identical_columns = 0
+        self.blocks_checked = 0
+        self.blocks_drilled = 0
+
+    @property
+    def cell_changes(self):
+        return sum(c.changes for c in self.columns)
+
+    @property
+    def identical(self):
+        return not (self.columns or self.added_columns or self.removed_columns or
+                    self.original_rows != self.normalized_rows)
+
+
+def mismatched_blocks(old_sig, new_sig, column):
+    """Block numbers of a column whose rows may differ (within the rows both files have)"""
+    common_rows = min(old_sig.rows, new_sig.rows)
+    # Blocks compare by hash while both sides have all of their rows; a
+    # trailing partial block (row counts differ) is always drilled
+    if old_sig.rows == new_sig.rows:
+        hashed = len(old_sig.blocks[column])
+    else:
+        hashed = common_rows // old_sig.block_rows
+    blocks = np.flatnonzero(old_sig.blocks[column][:hashed] != new_sig.blocks[column][:hashed]).tolist()
+    if hashed * old_sig.block_rows < common_rows:
+        blocks.append(hashed)
+    return blocks
+
+
+def diff_files(name, original_path, normalized_path, store=None, max_examples=MAX_EXAMPLES):
+    """Compare two datasets by block hashes, drilling down only into mismatched blocks"""
+    store = store or SignatureStore(persist=False)
+    result = FileDiff(name, original_path, normalized_path)
+    old_sig, new_sig = store.signature(original_path), store.signature(normalized_path)
+    result.original_rows, result.normalized_rows = old_sig.rows, new_sig.rows
+    result.removed_columns = [c for c in old_sig.blocks if c not in new_sig.blocks]
+    result.added_columns = [c for c in new_sig.blocks if c not in old_sig.blocks]
+
+    drill = {}
+    for column in [c for c in old_sig.blocks if c in new_sig.blocks]:
+        if old_sig.dtypes[column] != new_sig.dtypes[column]:
+            result.dtype_changes[column] = (old_sig.dtypes[column], new_sig.dtypes[column])
+        result.blocks_checked += len(old_sig.blocks[column])
+        blocks = mismatched_blocks(old_sig, new_sig, column)
+        if blocks:
+            drill[column] = blocks
+            result.blocks_drilled += len(blocks)
+        else:
+            result.identical_columns += 1
+    if not drill:
+        return result
+
+    # Only the mismatched columns are read back, and only their mismatched blocks hashed
+    old_df = read_dataset(original_path, list(drill))
+    new_df = read_dataset(normalized_path, list(drill))
+    common_rows = min(old_sig.rows, new_sig.rows)
+    for column, blocks in drill.items():
+        candidates = np.concatenate([np.arange(block * store.block_rows,
+                                               min((block + 1) * store.block_rows, common_rows))
+                                     for block in blocks])
+        differ = cell_hashes(old_df[column].iloc[candidates]) != cell_hashes(new_df[column].iloc[candidates])
+        rows = candidates[differ]
+        if not len(rows):
+            result.identical_columns += 1
+            continue
+        result.columns.append(ColumnDiff(column, rows, old_df[column].iloc[rows].reset_index(drop=True),
+                                         new_df[column].iloc[rows].reset_index(drop=True), max_examples))
+    return result
+
+
+def pair_datasets(original_root, normalized_root):
+    """[(name, original path or None, normalized path or None)] paired by file name"""
+    originals = {path.stem: path for path in list_datasets(original_root)}
+    normalized = {path.stem: path for path in list_datasets(normalized_root)}
+    return [(name, originals.get(name), normalized.get(name)) for name in sorted(set(originals) | set(normalized))]
+
+
+def report_lines(diffs, unpaired):
+    """The diff report as text lines"""
+    lines = ["=" * 80, "DWC RECORDS - ORIGINAL vs NORMALIZED DIFF", "=" * 80, ""]
+    for diff in diffs:
+        lines.append(f"{diff.name}:")
+        if diff.identical:
+            lines.append(f"  identical ({diff.original_rows} rows)")
+            lines.append("")
+            continue
+        rows = str(diff.original_rows) if diff.original_rows == diff.normalized_rows else \
+            f"{diff.original_rows} -> {diff.normalized_rows} ({diff.normalized_rows - diff.original_rows:+d})"
+        lines.append(f"  Rows: {rows}; {diff.identical_columns} columns identical; "
+                     f"{diff.blocks_drilled} of {diff.blocks_checked} column blocks drilled")
+        for column in diff.removed_columns:
+            lines.append(f"  - Column removed: {column}")
+        for column in diff.added_columns:
+            lines.append(f"  - Column added: {column}")
+        for column, (old, new) in diff.dtype_changes.items():
+            lines.append(f"  - {column}: dtype {old} -> {new}")
+        for column in diff.columns:
+            lines.append(f"  - {column.column}: {column.changes} changes "
+                         f"({column.distinct_transitions} distinct old -> new)")
+            for old, new, count in column.transitions:
+                lines.append(f"      {old!r} -> {new!r}: {count}")
+            if column.distinct_transitions > len(column.transitions):
+                lines.append(f"      ... and {column.distinct_transitions - len(column.transitions)} more")
+            lines.append("      e.g. " + "; ".join(f"row {row}: {old!r} -> {new!r}"
+                                                   for row, old, new in column.examples))
+        lines.append("")
+    if unpaired:
+        lines.append("NOT COMPARED (no counterpart):")
+        for name, side in unpaired:
+            lines.append(f"  {name}: only in {side}")
+        lines.append("")
+
+    lines.append("=" * 80)
+    lines.append(f"FILES: {len(diffs)} compared, {sum(d.identical for d in diffs)} identical")
+    lines.append(f"TOTAL CELL CHANGES: {sum(d.cell_changes for d in diffs)}")
+    lines.append("=" * 80)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify what changed between the Original and Normalized datasets")
+    parser.add_argument("original_root", nargs="?", default=str(DEFAULT_ORIGINAL_ROOT))
+    parser.add_argument("normalized_root", nargs="?", default=str(DEFAULT_NORMALIZED_ROOT))
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="report file to write")
+    parser.add_argument("--block-rows", type=int, default=BLOCK_ROWS, help="rows per hashed block")
+    parser.add_argument("--examples", type=int, default=MAX_EXAMPLES, help="example rows per changed column")
+    parser.add_argument("--no-save", action="store_true", help="hash every file, do not save signatures")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("ORIGINAL vs NORMALIZED DIFF")
+    print("=" * 80)
+    start = time.perf_counter()
+    store = SignatureStore(args.block_rows, persist=not args.no_save)
+    diffs, unpaired = [], []
+    for name, original, normalized in pair_datasets(args.original_root, args.normalized_root):
+        if original is None or normalized is None:
+            unpaired.append((name, 'original' if normalized is None else 'normalized'))
+            continue
+        try:
+            diff = diff_files(name, original, normalized, store, args.examples)
+        except Exception as e:
+            print(f"  ✗ {name}: {e}")
+            continue
+        diffs.append(diff)
+        summary = "identical" if diff.identical else \
+            f"{diff.cell_changes} cells changed in {len(diff.columns)} columns"
+        print(f"  {'✓' if diff.identical else '≠'} {name}: {summary}")
+
+    store.save()
+
+    lines = report_lines(diffs, unpaired)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"\n📊 {len(diffs)} files compared in {time.perf_counter() - start:.2f}s, "
+          f"{sum(d.cell_changes for d in diffs)} cells changed "
+          f"({store.hashed} files hashed, {store.reused} signatures reused)")
+    print(f"✅ Report saved to: {args.output}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
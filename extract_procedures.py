@@ -8,35 +8,74 @@ import os
 from pathlib import Path
 from collections import defaultdict
 import re
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "DWC_Records"))
+from workbook_cache import select_columns
+from dataset_io import list_datasets, read_dataset_columns
+
+PAYMENT_PATHS = [
+    "DWC_Records/01_Original/Payment_Distribution",
+    "DWC_Records/02_Normalized/Payment_Distribution"
+]
+
+PATIENT_PATHS = [
+    "DWC_Records/01_Original/Patient_Research",
+    "DWC_Records/02_Normalized/Patient_Research"
+]
+
+# Columns resolved by header name; the position is only a fallback for headerless exports
+CODE_COLUMN = ('Procedure Code', 2)        # Column C
+PROCEDURE_COLUMN = ('Procedure', 14)       # Column O
+DESCRIPTION_COLUMN = ('Description', 15)   # Column P
+
+CODES_REPORT_PATH = "DWC_Records/Documentation/Procedure codes.txt"
+PROCEDURE_LIST_PATH = "DWC_Records/Documentation/Procedure List for normalization.txt"
+
+def codes_from_frame(df):
+    """Return the distinct non-null Procedure Codes (Column C) of one Payment Distribution frame."""
+    col_c = select_columns(df, [CODE_COLUMN])[CODE_COLUMN[0]]
+    return set(col_c.dropna().astype(str).unique())
+
+def add_procedure_pairs(df, procedure_pairs):
+    """Merge the Procedure/Description pairs (Columns O and P) of one frame into procedure_pairs.
+
+    Returns the number of non-null procedures in the frame.
+    """
+    columns = select_columns(df, [PROCEDURE_COLUMN, DESCRIPTION_COLUMN])
+    col_o = columns[PROCEDURE_COLUMN[0]]    # Column O (Procedure)
+    col_p = columns[DESCRIPTION_COLUMN[0]]  # Column P (Description)
+
+    # Only distinct pairs need to be visited
+    pairs = pd.DataFrame({'proc': col_o, 'desc': col_p}).dropna(subset=['proc']).drop_duplicates()
+    for proc, desc in zip(pairs['proc'], pairs['desc']):
+        proc_str = str(proc).strip()
+        desc_str = str(desc).strip() if pd.notna(desc) else ""
+
+        if proc_str not in procedure_pairs:
+            procedure_pairs[proc_str] = set()
+        if desc_str:
+            procedure_pairs[proc_str].add(desc_str)
+
+    return int(col_o.notna().sum())
 
 def extract_procedure_codes():
     """Extract distinct Procedure Codes from Payment Distribution files (Column C)."""
     procedure_codes = set()
 
-    # Paths to check
-    paths = [
-        "DWC_Records/01_Original/Payment_Distribution",
-        "DWC_Records/02_Normalized/Payment_Distribution"
-    ]
-
-    for path in paths:
+    for path in PAYMENT_PATHS:
         if not os.path.exists(path):
             continue
 
-        for file in Path(path).glob("*.xlsx"):
+        for file in list_datasets(path, recursive=False):
             print(f"Processing payment file: {file.name}")
             try:
-                # Read Excel file
-                df = pd.read_excel(file)
-
-                # Column C should be index 2 (0-based)
-                # Get column name (might be "Procedure Code" or similar)
-                if len(df.columns) > 2:
-                    col_c = df.iloc[:, 2]  # Column C (index 2)
-                    # Add non-null values to set
-                    codes = col_c.dropna().astype(str).unique()
-                    procedure_codes.update(codes)
-                    print(f"  Found {len(codes)} unique codes in this file")
+                # Read only the Procedure Code column
+                df = read_dataset_columns(file, [CODE_COLUMN])
+
+                codes = codes_from_frame(df)
+                procedure_codes.update(codes)
+                print(f"  Found {len(codes)} unique codes in this file")
             except Exception as e:
                 print(f"  Error processing {file.name}: {e}")
 
@@ -46,39 +85,18 @@ def extract_procedures_and_descriptions():
     """Extract distinct Procedure and Description pairs from Patient Research files (Columns O and P)."""
     procedure_pairs = {}  # {procedure: set(descriptions)}
 
-    # Paths to check
-    paths = [
-        "DWC_Records/01_Original/Patient_Research",
-        "DWC_Records/02_Normalized/Patient_Research"
-    ]
-
-    for path in paths:
+    for path in PATIENT_PATHS:
         if not os.path.exists(path):
             continue
 
-        for file in Path(path).glob("*.xlsx"):
+        for file in list_datasets(path, recursive=False):
             print(f"Processing patient file: {file.name}")
             try:
-                # Read Excel file
-                df = pd.read_excel(file)
-
-                # Column O is index 14, Column P is index 15 (0-based)
-                if len(df.columns) > 15:
-                    col_o = df.iloc[:, 14]  # Column O (Procedure)
-                    col_p = df.iloc[:, 15]  # Column P (Description)
-
-                    # Combine into pairs
-                    for proc, desc in zip(col_o, col_p):
-                        if pd.notna(proc):
-                            proc_str = str(proc).strip()
-                            desc_str = str(desc).strip() if pd.notna(desc) else ""
-
-                            if proc_str not in procedure_pairs:
-                                procedure_pairs[proc_str] = set()
-                            if desc_str:
-                                procedure_pairs[proc_str].add(desc_str)
-
-                    print(f"  Found {len(col_o.dropna())} procedures in this file")
+                # Read only the Procedure and Description columns
+                df = read_dataset_columns(file, [PROCEDURE_COLUMN, DESCRIPTION_COLUMN])
+
+                found = add_procedure_pairs(df, procedure_pairs)
+                print(f"  Found {found} procedures in this file")
             except Exception as e:
                 print(f"  Error processing {file.name}: {e}")
 
@@ -106,24 +124,11 @@ def group_procedure_codes(codes):
 
     return grouped
 
-def main():
-    print("=" * 80)
-    print("EXTRACTING PROCEDURE CODES FROM PAYMENT DISTRIBUTION FILES")
-    print("=" * 80)
-    procedure_codes = extract_procedure_codes()
-    print(f"\nTotal distinct procedure codes: {len(procedure_codes)}\n")
-
-    print("=" * 80)
-    print("EXTRACTING PROCEDURES AND DESCRIPTIONS FROM PATIENT RESEARCH FILES")
-    print("=" * 80)
-    procedure_pairs = extract_procedures_and_descriptions()
-    print(f"\nTotal distinct procedures: {len(procedure_pairs)}\n")
-
-    # Create Procedure codes file with grouping
-    print("Creating 'Procedure codes.txt'...")
+def write_procedure_codes_report(procedure_codes, output_path=CODES_REPORT_PATH):
+    """Write 'Procedure codes.txt' with codes grouped by prefix."""
     grouped_codes = group_procedure_codes(procedure_codes)
 
-    with open("DWC_Records/Documentation/Procedure codes.txt", "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8") as f:
         f.write("=" * 80 + "\n")
         f.write("DISTINCT PROCEDURE CODES FROM PAYMENT DISTRIBUTION REPORTS\n")
         f.write("Extracted from Column C of all Payment Distribution Excel files\n")
@@ -138,12 +143,9 @@ def main():
             for code in sorted(grouped_codes[group_name]):
                 f.write(f"  {code}\n")
 
-    print(f"  Written {len(procedure_codes)} codes to file\n")
-
-    # Create Procedure List for normalization file
-    print("Creating 'Procedure List for normalization.txt'...")
-
-    with open("DWC_Records/Documentation/Procedure List for normalization.txt", "w", encoding="utf-8") as f:
+def write_procedure_list_report(procedure_pairs, output_path=PROCEDURE_LIST_PATH):
+    """Write 'Procedure List for normalization.txt' flagging procedures with several descriptions."""
+    with open(output_path, "w", encoding="utf-8") as f:
         f.write("=" * 80 + "\n")
         f.write("DISTINCT PROCEDURES AND DESCRIPTIONS FROM PATIENT RESEARCH REPORTS\n")
         f.write("Extracted from Columns O (Procedure) and P (Description)\n")
@@ -168,14 +170,35 @@ def main():
                 for i, desc in enumerate(sorted(descriptions), 1):
                     f.write(f"  [{i}] {desc}\n")
 
+def main():
+    print("=" * 80)
+    print("EXTRACTING PROCEDURE CODES FROM PAYMENT DISTRIBUTION FILES")
+    print("=" * 80)
+    procedure_codes = extract_procedure_codes()
+    print(f"\nTotal distinct procedure codes: {len(procedure_codes)}\n")
+
+    print("=" * 80)
+    print("EXTRACTING PROCEDURES AND DESCRIPTIONS FROM PATIENT RESEARCH FILES")
+    print("=" * 80)
+    procedure_pairs = extract_procedures_and_descriptions()
+    print(f"\nTotal distinct procedures: {len(procedure_pairs)}\n")
+
+    # Create Procedure codes file with grouping
+    print("Creating 'Procedure codes.txt'...")
+    write_procedure_codes_report(procedure_codes)
+    print(f"  Written {len(procedure_codes)} codes to file\n")
+
+    # Create Procedure List for normalization file
+    print("Creating 'Procedure List for normalization.txt'...")
+    write_procedure_list_report(procedure_pairs)
     print(f"  Written {len(procedure_pairs)} procedures to file\n")
 
     print("=" * 80)
     print("EXTRACTION COMPLETE!")
     print("=" * 80)
     print(f"Files created:")
-    print(f"  - DWC_Records/Documentation/Procedure codes.txt")
-    print(f"  - DWC_Records/Documentation/Procedure List for normalization.txt")
+    print(f"  - {CODES_REPORT_PATH}")
+    print(f"  - {PROCEDURE_LIST_PATH}")
 
 if __name__ == "__main__":
     main()